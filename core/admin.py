@@ -1,34 +1,216 @@
 # core/admin.py
+import json
+from datetime import date, timedelta
 
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Almacen, ProductosVendidos
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import DecimalField, ExpressionWrapper, F, Max, Min, QuerySet
+from django.utils.functional import cached_property
+from .models import User, Almacen, LineaReserva, MovimientoStock, ProductosVendidos, Reserva, Tienda
+
+
+# ========== TABLAS GRANDES ==========
+def _conteo_estimado(queryset):
+    """Filas estimadas por PostgreSQL (estadísticas o plan), o None."""
+    conexion = connections[queryset.db]
+    if conexion.vendor != 'postgresql':
+        return None
+    with conexion.cursor() as cursor:
+        if not queryset.query.where:
+            # Sin filtros: las estadísticas de la tabla (ANALYZE / autovacuum)
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            fila = cursor.fetchone()
+            return fila[0] if fila and fila[0] >= 0 else None
+        # Con filtros: la estimación del planificador, sin ejecutar la consulta
+        sql, params = queryset.order_by().query.sql_with_params()
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class PaginadorEstimado(Paginator):
+    """Paginador sin COUNT(*) exacto cuando el resultado es grande.
+
+    Por debajo de ``ADMIN_CONTEO_EXACTO_HASTA`` filas estimadas se cuenta
+    de verdad; por encima se muestra la estimación (las últimas páginas
+    pueden no cuadrar exactamente).
+    """
+
+    @cached_property
+    def count(self):
+        estimado = _conteo_estimado(self.object_list)
+        if estimado is None or estimado < settings.ADMIN_CONTEO_EXACTO_HASTA:
+            return super().count
+        return estimado
+
+
+def filtro_cacheado(campo, titulo, origen=None):
+    """list_filter con los valores distintos de ``campo`` guardados en caché.
+
+    ``origen``: modelo pequeño del que leer los valores (p. ej. las categorías
+    del catálogo para las líneas de venta) en vez de la tabla filtrada.
+    """
+
+    class FiltroCacheado(admin.SimpleListFilter):
+        title = titulo
+        parameter_name = campo
+
+        def lookups(self, request, model_admin):
+            modelo = origen or model_admin.model
+            clave = f'admin_filtro_{modelo._meta.label_lower}_{campo}'
+            valores = cache.get(clave)
+            if valores is None:
+                valores = list(modelo.objects.order_by(campo).values_list(campo, flat=True).distinct())
+                cache.set(clave, valores, settings.ADMIN_FILTROS_SEGUNDOS)
+            return [(valor, valor) for valor in valores]
+
+        def queryset(self, request, queryset):
+            if self.value():
+                return queryset.filter(**{campo: self.value()})
+            return queryset
+
+    return FiltroCacheado
+
+
+class FechasPorRango(QuerySet):
+    """``dates()`` a partir de MIN/MAX en vez de SELECT DISTINCT date_trunc(...).
+
+    Es lo que pide ``date_hierarchy`` para los años, los meses y los días:
+    el DISTINCT recorre la tabla entera (o el año entero) y el MIN/MAX sale
+    de los extremos del índice de la fecha. Se listan todos los periodos
+    entre la primera y la última fecha, aunque alguno no tenga filas.
+    """
+
+    def dates(self, field_name, kind, order='ASC'):
+        rango = self.order_by().aggregate(primera=Min(field_name), ultima=Max(field_name))
+        primera, ultima = rango['primera'], rango['ultima']
+        if primera is None:
+            return []
+        if kind == 'year':
+            fechas = [date(anio, 1, 1) for anio in range(primera.year, ultima.year + 1)]
+        elif kind == 'month':
+            meses = range(primera.year * 12 + primera.month - 1, ultima.year * 12 + ultima.month)
+            fechas = [date(mes // 12, mes % 12 + 1, 1) for mes in meses]
+        else:
+            fechas = [primera + timedelta(days=i) for i in range((ultima - primera).days + 1)]
+        return fechas[::-1] if order == 'DESC' else fechas
+
+
+class AdminTablaGrande(admin.ModelAdmin):
+    paginator = PaginadorEstimado
+    show_full_result_count = False  # sin el segundo COUNT(*) de la tabla entera
 
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     # Añadimos 'rol' a las vistas
-    list_display = ('username', 'rol', 'is_staff', 'is_superuser')
-    list_filter = ('rol', 'is_staff', 'is_superuser')
+    list_display = ('username', 'rol', 'tienda', 'is_staff', 'is_superuser')
+    list_filter = ('rol', 'tienda', 'is_staff', 'is_superuser')
     
     # Añadir 'rol' en los formularios
     fieldsets = UserAdmin.fieldsets + (
-        ('Información adicional', {'fields': ('rol',)}),
+        ('Información adicional', {'fields': ('rol', 'tienda')}),
     )
     
     add_fieldsets = UserAdmin.add_fieldsets + (
-        ('Información adicional', {'fields': ('rol',)}),
+        ('Información adicional', {'fields': ('rol', 'tienda')}),
     )
 
 
+@admin.register(Tienda)
+class TiendaAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'direccion', 'activa']
+    list_filter = ['activa']
+    search_fields = ['nombre']
+
+
 @admin.register(Almacen)
-class AlmacenAdmin(admin.ModelAdmin):
-    list_display = ['nombreproducto', 'categoria', 'stock', 'fechavencimiento', 'precio']
-    list_filter = ['categoria', 'tipoproducto']
+class AlmacenAdmin(AdminTablaGrande):
+    list_display = ['nombreproducto', 'tienda', 'categoria', 'stock_real', 'fechavencimiento', 'precio']
+    list_filter = [
+        'tienda', filtro_cacheado('categoria', 'categoría'), filtro_cacheado('tipoproducto', 'tipo de producto'),
+    ]
+    list_select_related = ['tienda']
     search_fields = ['nombreproducto']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).con_stock()
+
+    def get_readonly_fields(self, request, obj=None):
+        # ✅ Tras el alta el stock solo cambia con movimientos (PATCH update-stock)
+        return ['stock'] if obj else []
+
+    @admin.display(description='Stock', ordering='stock_actual')
+    def stock_real(self, obj):
+        return obj.stock_actual
+
 
 @admin.register(ProductosVendidos)
-class ProductosVendidosAdmin(admin.ModelAdmin):
-    list_display = ['nombreproducto', 'cantidad', 'precio_unitario', 'total', 'fechaventa']
-    list_filter = ['fechaventa', 'categoria']
\ No newline at end of file
+class ProductosVendidosAdmin(AdminTablaGrande):
+    list_display = ['nombreproducto', 'tienda', 'cantidad', 'precio_unitario', 'total_linea', 'fechaventa']
+    # ✅ Categorías del catálogo (Almacen, pequeño e indexado por tienda y categoría):
+    # sin DISTINCT sobre las líneas de venta al caducar la caché
+    list_filter = ['tienda', filtro_cacheado('categoria', 'categoría', Almacen)]
+    list_select_related = ['tienda']
+    # ✅ Navegación por año/mes/día: rangos sobre el índice de fechaventa, y los
+    # años y meses del menú salen de MIN/MAX (FechasPorRango)
+    date_hierarchy = 'fechaventa'
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        queryset = FechasPorRango(queryset.model, queryset.query.chain())
+        return queryset.annotate(total_linea=ExpressionWrapper(
+            F('precio_unitario') * F('cantidad'), output_field=DecimalField(max_digits=12, decimal_places=2),
+        ))
+
+    @admin.display(description='Total', ordering='total_linea')
+    def total_linea(self, obj):
+        return obj.total_linea
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(AdminTablaGrande):
+    list_display = ['producto', 'tienda', 'tipo', 'cantidad', 'aplicado', 'usuario', 'fecha']
+    list_filter = ['tienda', 'tipo', 'aplicado']
+    list_select_related = ['producto', 'tienda', 'usuario']
+    raw_id_fields = ['producto', 'usuario']
+
+    # Libro de solo inserción: no se edita ni se borra a mano
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def has_add_permission(self, request):
+        return False
+
+
+class LineaReservaInline(admin.TabularInline):
+    model = LineaReserva
+    fields = readonly_fields = ['producto', 'cantidad']
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Reserva)
+class ReservaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tienda', 'usuario', 'estado', 'fechacreacion', 'expira']
+    list_filter = ['tienda', 'estado']
+    raw_id_fields = ['usuario']
+    readonly_fields = ['estado']  # cambia con la API y expirar_reservas (mueven stock)
+    inlines = [LineaReservaInline]
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,180 @@
+# core/analitica.py
+"""Agregados de ventas desde el archivo columnar de meses cerrados.
+
+``manage.py archivar_ventas`` exporta cada mes cerrado de
+``ProductosVendidos`` a ``ARCHIVO_VENTAS_DIR/YYYY-MM/``: un ``.npy`` por
+columna (día, tienda, producto, categoría, artículo, cantidad, importe en
+céntimos) y diccionarios JSON para las columnas de texto (categoría y
+artículo = nombre + categoría se guardan como códigos enteros).
+
+Los ficheros se abren con ``mmap_mode='r'`` y se recorren con operaciones
+vectorizadas de NumPy. Lo que no está archivado (el mes en curso, o meses
+aún sin exportar) se pide a la base de datos, igual que los meses cuyo
+archivo ya no coincide con ella (``core.archivo``) hasta que
+``archivar_ventas`` los vuelve a exportar.
+"""
+import json
+import threading
+
+import numpy as np
+from django.db.models import F, Q, Sum
+
+from .archivo import directorio, inicio_mes, mes_siguiente, meses_vigentes, nombre_mes
+from .models import ProductosVendidos
+
+COLUMNAS = {
+    'dia': np.uint8,
+    'tienda': np.int32,
+    'producto': np.int64,  # -1: producto borrado
+    'categoria': np.int32,
+    'articulo': np.int32,
+    'cantidad': np.int32,
+    'importe': np.int64,  # céntimos (precio_unitario × cantidad)
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class MesArchivado:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.meta = json.loads((ruta / 'meta.json').read_text(encoding='utf-8'))
+        self.categorias = self.meta['categorias']
+        self.articulos = self.meta['articulos']  # [nombreproducto, categoria]
+        self.columnas = {
+            nombre: np.load(ruta / f'{nombre}.npy', mmap_mode='r') for nombre in COLUMNAS
+        }
+
+    def __getitem__(self, columna):
+        return self.columnas[columna]
+
+    def filtro(self, tienda_id, desde, hasta, categoria=None):
+        """Máscara de filas de la tienda y días [desde, hasta) dentro del mes."""
+        mes = inicio_mes(desde)
+        dia_desde = (desde - mes).days + 1
+        dia_hasta = (hasta - mes).days + 1
+        dia = self['dia']
+        mascara = (dia >= dia_desde) & (dia < dia_hasta)
+        if tienda_id is not None:
+            mascara &= self['tienda'] == tienda_id
+        if categoria is not None:
+            if categoria not in self.categorias:
+                return np.zeros(len(dia), dtype=bool)
+            mascara &= self['categoria'] == self.categorias.index(categoria)
+        return mascara
+
+
+def mes_archivado(mes):
+    """El mes archivado (o None). Se recarga si se volvió a exportar."""
+    ruta = directorio() / nombre_mes(mes)
+    try:
+        marca = (ruta / 'meta.json').stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _cache_lock:
+        actual = _cache.get(ruta)
+        if actual is None or actual[0] != marca:
+            actual = (marca, MesArchivado(ruta))
+            _cache[ruta] = actual
+        return actual[1]
+
+
+def tramos(desde, hasta, meses=None):
+    """Divide [desde, hasta) en (archivados, pendientes).
+
+    archivados: [(MesArchivado, desde, hasta)], un tramo por mes cerrado,
+    archivado y al día (``meses``, por defecto ``meses_vigentes``).
+    pendientes: tramos [desde, hasta) contiguos que se leen de la base de
+    datos (mes en curso, meses sin archivar o cambiados desde entonces).
+    """
+    archivados, pendientes = [], []
+    cursor = desde
+    for mes in meses_vigentes(desde, hasta) if meses is None else meses:
+        archivo = mes_archivado(mes)
+        if archivo is None:
+            continue
+        d, h = max(mes, desde), min(mes_siguiente(mes), hasta)
+        if cursor < d:
+            pendientes.append((cursor, d))
+        archivados.append((archivo, d, h))
+        cursor = h
+    if cursor < hasta:
+        pendientes.append((cursor, hasta))
+    return archivados, pendientes
+
+
+def _ventas_bd(tienda_id, pendientes, categoria=None):
+    ventas = ProductosVendidos.objects.filter(
+        Q(*[Q(fechaventa__gte=d, fechaventa__lt=h) for d, h in pendientes], _connector=Q.OR)
+    )
+    if tienda_id is not None:
+        ventas = ventas.filter(tienda_id=tienda_id)
+    if categoria:
+        ventas = ventas.filter(categoria=categoria)
+    return ventas.order_by()
+
+
+def totales_por_articulo(tienda_id, desde, hasta, categoria=None, meses=None):
+    """{(categoria, nombreproducto): [unidades, importe en céntimos]} en [desde, hasta)."""
+    archivados, pendientes = tramos(desde, hasta, meses)
+    totales = {}
+
+    for mes, d, h in archivados:
+        mascara = mes.filtro(tienda_id, d, h, categoria)
+        articulo = mes['articulo'][mascara]
+        n = len(mes.articulos)
+        unidades = np.bincount(articulo, mes['cantidad'][mascara], minlength=n)
+        importe = np.bincount(articulo, mes['importe'][mascara], minlength=n)
+        for codigo in np.flatnonzero(unidades):
+            nombre, cat = mes.articulos[codigo]
+            fila = totales.setdefault((cat, nombre), [0, 0])
+            fila[0] += int(unidades[codigo])
+            fila[1] += int(round(importe[codigo]))
+
+    if pendientes:
+        filas = (
+            _ventas_bd(tienda_id, pendientes, categoria)
+            .values('categoria', 'nombreproducto')
+            .annotate(unidades=Sum('cantidad'), ingresos=Sum(F('precio_unitario') * F('cantidad')))
+        )
+        for f in filas:
+            fila = totales.setdefault((f['categoria'], f['nombreproducto']), [0, 0])
+            fila[0] += f['unidades']
+            fila[1] += round(f['ingresos'] * 100)
+    return totales
+
+
+def ventas_diarias(tienda_id, desde, hasta):
+    """Arrays (producto_id, día desde ``desde``, cantidad) sumados por producto y día."""
+    archivados, pendientes = tramos(desde, hasta)
+    base = desde.toordinal()
+    productos, dias, cantidades = [], [], []
+
+    for mes, d, h in archivados:
+        mascara = mes.filtro(tienda_id, d, h) & (mes['producto'] >= 0)
+        productos.append(np.asarray(mes['producto'][mascara]))
+        dias.append(mes['dia'][mascara].astype(np.int64) + (inicio_mes(d).toordinal() - 1 - base))
+        cantidades.append(mes['cantidad'][mascara].astype(np.float64))
+
+    if pendientes:
+        filas = list(
+            _ventas_bd(tienda_id, pendientes).filter(producto__isnull=False)
+            .values('producto_id', 'fechaventa')
+            .annotate(total=Sum('cantidad'))
+            .values_list('producto_id', 'fechaventa', 'total')
+        )
+        n = len(filas)
+        productos.append(np.fromiter((f[0] for f in filas), dtype=np.int64, count=n))
+        dias.append(np.fromiter((f[1].toordinal() - base for f in filas), dtype=np.int64, count=n))
+        cantidades.append(np.fromiter((f[2] for f in filas), dtype=np.float64, count=n))
+
+    if not productos:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.float64)
+    producto = np.concatenate(productos)
+    dia = np.concatenate(dias)
+    cantidad = np.concatenate(cantidades)
+
+    # El archivo guarda líneas: se suman por (producto, día) como hace el GROUP BY
+    claves, inversa = np.unique(np.stack([producto, dia]), axis=1, return_inverse=True)
+    return claves[0], claves[1], np.bincount(inversa.ravel(), cantidad, minlength=claves.shape[1])
@@ -0,0 +1,98 @@
+# core/archivo.py
+"""Qué meses cerrados de ventas están archivados y siguen al día (sin NumPy).
+
+El manifiesto de cada mes (``meta.json``, escrito por ``archivar_ventas``)
+guarda la huella de lo exportado: filas, máxima id, suma de ids, de tiendas,
+de productos, de unidades y de importes. Antes de leer un mes del archivo se
+compara con la misma huella calculada en la base de datos; si no coincide
+(ventas sincronizadas con fecha de ese mes, borradas o cambiadas desde el
+admin) el mes se lee de la base de datos hasta que se vuelva a exportar.
+
+Lo usan ``core.analitica`` (los datos, con NumPy) y ``core.reportes``, que
+así solo importa NumPy si el periodo toca meses archivados.
+"""
+import json
+import threading
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from .models import ProductosVendidos
+
+_huellas = {}
+_huellas_lock = threading.Lock()
+
+
+def directorio():
+    return Path(settings.ARCHIVO_VENTAS_DIR)
+
+
+def inicio_mes(dia):
+    return dia.replace(day=1)
+
+
+def mes_siguiente(dia):
+    return date(dia.year + dia.month // 12, dia.month % 12 + 1, 1)
+
+
+def nombre_mes(dia):
+    return f"{dia.year:04d}-{dia.month:02d}"
+
+
+def meses_archivados():
+    """Primer día de cada mes con archivo completo (meta.json escrito)."""
+    meses = []
+    if not directorio().is_dir():
+        return meses
+    for ruta in directorio().iterdir():
+        try:
+            anio, mes = (int(x) for x in ruta.name.split('-'))
+            if (ruta / 'meta.json').exists():
+                meses.append(date(anio, mes, 1))
+        except ValueError:
+            continue
+    return sorted(meses)
+
+
+def huella_bd(mes):
+    """Huella de las ventas del mes en la base de datos (None si no hay ninguna)."""
+    datos = ProductosVendidos.objects.filter(
+        fechaventa__gte=mes, fechaventa__lt=mes_siguiente(mes)
+    ).order_by().aggregate(
+        filas=Count('id'), max_id=Max('id'), ids=Sum('id'), tiendas=Sum('tienda_id'),
+        productos=Sum('producto_id'), unidades=Sum('cantidad'),
+        importe=Sum(F('precio_unitario') * F('cantidad')),
+    )
+    if not datos['filas']:
+        return None
+    datos['productos'] = datos['productos'] or 0
+    datos['importe'] = int(round(datos['importe'] * 100))  # céntimos, como el archivo
+    return datos
+
+
+def huella_archivo(mes):
+    """Huella guardada en el manifiesto del mes (None si no está o es antiguo)."""
+    ruta = directorio() / nombre_mes(mes) / 'meta.json'
+    try:
+        marca = ruta.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _huellas_lock:
+        actual = _huellas.get(ruta)
+        if actual is None or actual[0] != marca:
+            actual = (marca, json.loads(ruta.read_text(encoding='utf-8')).get('huella'))
+            _huellas[ruta] = actual
+        return actual[1]
+
+
+def meses_vigentes(desde, hasta):
+    """Meses cerrados y archivados que tocan [desde, hasta) y coinciden con la BD."""
+    cerrado = inicio_mes(timezone.localdate())
+    return [
+        mes for mes in meses_archivados()
+        if inicio_mes(desde) <= mes < hasta and mes < cerrado
+        and huella_archivo(mes) is not None and huella_archivo(mes) == huella_bd(mes)
+    ]
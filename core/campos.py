@@ -0,0 +1,104 @@
+# core/campos.py
+"""Selección de campos (?fields=) para los listados.
+
+Cada listado declara un mapa ``campo de salida -> (columnas, extractor)``.
+Solo se piden a la base de datos las columnas de los campos solicitados
+(``values()``) y la respuesta contiene únicamente esos campos.
+"""
+from .models import Almacen
+
+
+class CamposInvalidos(ValueError):
+    pass
+
+
+def campos_solicitados(request, mapa):
+    """Devuelve los campos pedidos en ?fields=, o todos si no se indica."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(mapa)
+
+    campos = []
+    for campo in raw.split(','):
+        campo = campo.strip()
+        if campo and campo not in campos:
+            campos.append(campo)
+
+    invalidos = [c for c in campos if c not in mapa]
+    if invalidos or not campos:
+        raise CamposInvalidos(
+            f"Campos inválidos: {', '.join(invalidos) or '(vacío)'}. "
+            f"Disponibles: {', '.join(mapa)}"
+        )
+    return campos
+
+
+def columnas_para(campos, mapa):
+    """Columnas de la tabla necesarias para construir los campos pedidos."""
+    columnas = []
+    for campo in campos:
+        for columna in mapa[campo][0]:
+            if columna not in columnas:
+                columnas.append(columna)
+    return columnas or ['id']
+
+
+def filas(queryset, campos, mapa):
+    """Ejecuta el queryset con solo las columnas necesarias y arma los dicts."""
+    extractores = [(campo, mapa[campo][1]) for campo in campos]
+    return [
+        {campo: extraer(fila) for campo, extraer in extractores}
+        for fila in queryset.values(*columnas_para(campos, mapa))
+    ]
+
+
+def _imagen_url(nombre):
+    # Igual que FieldFile.url, sin instanciar el modelo
+    if not nombre:
+        return None
+    return Almacen._meta.get_field('imagen').storage.url(nombre)
+
+
+# ========== MAPAS POR LISTADO ==========
+CAMPOS_PRODUCTO = {
+    'id': (('id',), lambda f: f['id']),
+    'nombreproducto': (('nombreproducto',), lambda f: f['nombreproducto']),
+    'tipoproducto': (('tipoproducto',), lambda f: f['tipoproducto']),
+    'categoria': (('categoria',), lambda f: f['categoria']),
+    'fechavencimiento': (
+        ('fechavencimiento',),
+        lambda f: f['fechavencimiento'].isoformat() if f['fechavencimiento'] else None,
+    ),
+    'precio': (('precio',), lambda f: float(f['precio']) if f['precio'] else 0.0),
+    # Stock y versión reales: el queryset debe venir de Almacen.objects.con_stock()
+    'stock': (('stock_actual',), lambda f: f['stock_actual']),
+    'imagen': (('imagen',), lambda f: _imagen_url(f['imagen'])),
+    'version': (('version_actual',), lambda f: f['version_actual']),
+    'tienda': (('tienda_id',), lambda f: f['tienda_id']),
+}
+
+CAMPOS_VENTA = {
+    'id': (('id',), lambda f: f['id']),
+    'producto': (('id',), lambda f: f['id']),  # Usamos el ID como identificador
+    'producto_nombre': (('nombreproducto',), lambda f: f['nombreproducto']),
+    'categoria': (('categoria',), lambda f: f['categoria']),
+    'tipoproducto': (('tipoproducto',), lambda f: f['tipoproducto']),
+    'cantidad': (('cantidad',), lambda f: f['cantidad']),
+    'precio_unitario': (('precio_unitario',), lambda f: float(f['precio_unitario'])),
+    'precio_total': (
+        ('precio_unitario', 'cantidad'),
+        lambda f: float(f['precio_unitario']) * f['cantidad'],
+    ),
+    'fecha': (('fechaventa',), lambda f: f['fechaventa'].isoformat()),
+    'usuario': ((), lambda f: 'Sistema'),  # El modelo no tiene usuario
+    'tienda': (('tienda_id',), lambda f: f['tienda_id']),
+}
+
+CAMPOS_USUARIO = {
+    'id': (('id',), lambda f: f['id']),
+    'username': (('username',), lambda f: f['username']),
+    'email': (('email',), lambda f: f['email']),
+    'rol': (('rol',), lambda f: f['rol']),
+    'is_active': (('is_active',), lambda f: f['is_active']),
+    'tienda': (('tienda_id',), lambda f: f['tienda_id']),
+}
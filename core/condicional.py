@@ -0,0 +1,46 @@
+# core/condicional.py
+"""GET condicional (ETag / Last-Modified) para los listados.
+
+El validador sale de una consulta agregada barata sobre el mismo queryset
+del listado (máximo de versión o fecha y número de filas), no del cuerpo:
+si el cliente ya tiene esa versión se responde 304 sin leer ni serializar
+las filas. La ETag incluye la URL completa (?fields=, filtros, página) y la
+tienda del usuario, porque la representación depende de ellas.
+
+Para tablas que ya llevan un contador de cambios (las ventas, con
+``core.reportes.version_ventas``) ``etiqueta`` compone la ETag con él.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def validador(request, queryset, campo_version, campo_fecha=None):
+    """(etag, last_modified en segundos o None) del queryset."""
+    agregados = {'version': Max(campo_version), 'filas': Count('pk')}
+    if campo_fecha:
+        agregados['fecha'] = Max(campo_fecha)
+    datos = queryset.order_by().aggregate(**agregados)
+    fecha = datos.get('fecha')
+    return etiqueta(request, datos['version'], datos['filas']), int(fecha.timestamp()) if fecha else None
+
+
+def etiqueta(request, *version):
+    """ETag de la representación de ``request`` con la ``version`` de los datos."""
+    clave = '|'.join(str(p) for p in (*version, request.user.tienda_id, request.get_full_path()))
+    return '"%s"' % hashlib.sha256(clave.encode()).hexdigest()[:32]
+
+
+def responder(request, etag, last_modified, generar):
+    """304 si el cliente está al día; si no, ``generar()`` con los validadores."""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = generar()
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Depende del token: solo caché del cliente, revalidando siempre
+    response['Cache-Control'] = 'private, no-cache'
+    return response
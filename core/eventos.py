@@ -0,0 +1,172 @@
+# core/eventos.py
+"""Difusión de cambios de stock/precio a los clientes (Server-Sent Events).
+
+Las vistas que modifican productos llaman a ``publicar_cambios_producto``;
+el stream ``/api/eventos/`` (vista async, requiere ASGI) reenvía cada evento
+a las cajas conectadas, que así dejan de consultar ``listar_productos``.
+
+El broker se elige con ``EVENTOS_BROKER``:
+
+* ``core.eventos.BrokerEnMemoria`` (por defecto): un solo proceso.
+* ``core.eventos.BrokerRedis``: varios procesos/servidores; necesita el
+  paquete ``redis`` y ``EVENTOS_BROKER_OPCIONES = {'url': 'redis://...'}``.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Suscripcion:
+    def __init__(self, broker, max_pendientes):
+        self._broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=max_pendientes)
+
+    def encolar(self, evento):
+        # Se ejecuta en el loop del suscriptor. Cliente lento: se descarta el más antiguo
+        if self.cola.full():
+            self.cola.get_nowait()
+        self.cola.put_nowait(evento)
+
+    async def recibir(self, timeout):
+        """Siguiente evento, o None si pasan ``timeout`` segundos sin eventos."""
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def cerrar(self):
+        self._broker.quitar(self)
+
+
+class BrokerEnMemoria:
+    """Reparte eventos entre los suscriptores del proceso actual."""
+
+    def __init__(self, max_pendientes=100):
+        self.max_pendientes = max_pendientes
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+
+    def publicar(self, evento):
+        # Puede llamarse desde cualquier hilo (las vistas sync corren en un threadpool)
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.encolar, evento)
+            except RuntimeError:
+                # Loop cerrado: la suscripción quedó huérfana
+                self.quitar(suscripcion)
+
+    def suscribir(self):
+        """Debe llamarse desde código async (usa el loop en ejecución)."""
+        suscripcion = Suscripcion(self, self.max_pendientes)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def quitar(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+
+class BrokerRedis:
+    """Publica en un canal de Redis; cada proceso tiene un único oyente que
+    reparte los mensajes entre sus suscriptores locales."""
+
+    def __init__(self, url='redis://localhost:6379/0', canal='ventas:eventos', max_pendientes=100):
+        import redis  # dependencia opcional
+
+        self.url = url
+        self.canal = canal
+        self._redis = redis.Redis.from_url(url)
+        self._local = BrokerEnMemoria(max_pendientes)
+        self._oyente = None
+
+    def publicar(self, evento):
+        self._redis.publish(self.canal, json.dumps(evento))
+
+    def suscribir(self):
+        if self._oyente is None or self._oyente.done():
+            self._oyente = asyncio.get_running_loop().create_task(self._escuchar())
+        return self._local.suscribir()
+
+    def quitar(self, suscripcion):
+        self._local.quitar(suscripcion)
+
+    async def _escuchar(self):
+        from redis import asyncio as aioredis
+
+        while True:
+            try:
+                cliente = aioredis.Redis.from_url(self.url)
+                async with cliente.pubsub() as pubsub:
+                    await pubsub.subscribe(self.canal)
+                    async for mensaje in pubsub.listen():
+                        if mensaje['type'] == 'message':
+                            self._local.publicar(json.loads(mensaje['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Oyente de eventos Redis desconectado: {str(e)}")
+                await asyncio.sleep(1)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                clase = import_string(getattr(settings, 'EVENTOS_BROKER', 'core.eventos.BrokerEnMemoria'))
+                _broker = clase(**getattr(settings, 'EVENTOS_BROKER_OPCIONES', {}))
+    return _broker
+
+
+def publicar_cambios_producto(productos):
+    """Difunde stock/precio de los productos tras el commit de la transacción.
+
+    Se emite un evento por tienda; el stream filtra por la tienda del cliente.
+    """
+    eventos = {}
+    for p in productos:
+        evento = eventos.setdefault(p.tienda_id, {'tipo': 'productos', 'tienda': p.tienda_id, 'productos': []})
+        evento['productos'].append({
+            'id': p.id,
+            'stock': p.stock,
+            'precio': float(p.precio),
+            'version': p.version,
+        })
+    if not eventos:
+        return
+
+    def enviar():
+        try:
+            broker = get_broker()
+            for evento in eventos.values():
+                broker.publicar(evento)
+        except Exception as e:
+            # Nunca romper una venta por no poder notificar
+            logger.error(f"Error al publicar evento: {str(e)}")
+
+    transaction.on_commit(enviar)
+
+
+def formato_sse(evento):
+    version = max((p['version'] for p in evento.get('productos', [])), default=None)
+    lineas = [f"event: {evento['tipo']}"]
+    if version is not None:
+        # El cliente puede reanudar con /api/almacen/sync/?since=<Last-Event-ID>
+        lineas.append(f"id: {version}")
+    lineas.append(f"data: {json.dumps(evento)}")
+    return '\n'.join(lineas) + '\n\n'
@@ -0,0 +1,133 @@
+import json
+import os
+import shutil
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from core.analitica import COLUMNAS
+from core.archivo import directorio, huella_bd, huella_archivo, inicio_mes, mes_siguiente, nombre_mes
+from core.models import ProductosVendidos
+
+
+def _mes(valor):
+    try:
+        anio, mes = (int(x) for x in valor.split('-'))
+        return date(anio, mes, 1)
+    except ValueError:
+        raise CommandError(f"Mes inválido: {valor} (use YYYY-MM)")
+
+
+class Command(BaseCommand):
+    help = 'Exporta los meses cerrados de ventas al archivo columnar (core/analitica.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer mes (YYYY-MM); por defecto, el de la venta más antigua')
+        parser.add_argument('--hasta', help='Último mes (YYYY-MM); por defecto, el mes pasado')
+        parser.add_argument('--rehacer', action='store_true', help='Reexportar aunque el archivo esté al día')
+        parser.add_argument('--lote', type=int, default=50000, help='Filas leídas por viaje a la BD')
+
+    def handle(self, *args, **options):
+        cerrado = inicio_mes(timezone.localdate())
+        hasta = _mes(options['hasta']) if options['hasta'] else inicio_mes(cerrado - timedelta(days=1))
+        if hasta >= cerrado:
+            raise CommandError('Solo se archivan meses cerrados (anteriores al actual)')
+        if options['desde']:
+            mes = _mes(options['desde'])
+        else:
+            primera = ProductosVendidos.objects.aggregate(f=Min('fechaventa'))['f']
+            if primera is None:
+                self.stdout.write('Sin ventas que archivar')
+                return
+            mes = inicio_mes(primera)
+
+        directorio().mkdir(parents=True, exist_ok=True)
+        while mes <= hasta:
+            self.archivar(mes, options)
+            mes = mes_siguiente(mes)
+
+    def archivar(self, mes, options):
+        ventas = ProductosVendidos.objects.filter(fechaventa__gte=mes, fechaventa__lt=mes_siguiente(mes)).order_by()
+        estado = huella_bd(mes)
+        destino = directorio() / nombre_mes(mes)
+
+        if (destino / 'meta.json').exists() and not options['rehacer']:
+            if huella_archivo(mes) == estado:
+                self.stdout.write(f"{nombre_mes(mes)}: al día ({estado['filas']} filas)")
+                return
+            # Llegaron ventas con fecha de este mes (p. ej. cestas sin conexión), se
+            # borraron o se cambiaron: hasta rehacerlo, los lectores van a la BD
+            self.stdout.write(f"{nombre_mes(mes)}: cambió desde la exportación, se rehace")
+        if estado is None:
+            shutil.rmtree(destino, ignore_errors=True)
+            return
+
+        inicio = time.perf_counter()
+        categorias, articulos = {}, {}
+        huella = dict.fromkeys(('filas', 'ids', 'tiendas', 'productos', 'unidades', 'importe'), 0)
+        huella['max_id'] = None
+        trozos = {nombre: [] for nombre in COLUMNAS}
+        lote = {nombre: [] for nombre in COLUMNAS}
+
+        def volcar():
+            for nombre, valores in lote.items():
+                trozos[nombre].append(np.array(valores, dtype=COLUMNAS[nombre]))
+                valores.clear()
+
+        filas = ventas.values_list(
+            'id', 'fechaventa', 'tienda_id', 'producto_id', 'categoria', 'nombreproducto',
+            'cantidad', 'precio_unitario',
+        ).iterator(chunk_size=options['lote'])
+        for id_, fecha, tienda, producto, categoria, nombre, cantidad, precio in filas:
+            importe = int(precio * 100) * cantidad
+            huella['filas'] += 1
+            huella['max_id'] = id_ if huella['max_id'] is None else max(huella['max_id'], id_)
+            huella['ids'] += id_
+            huella['tiendas'] += tienda
+            huella['productos'] += producto or 0
+            huella['unidades'] += cantidad
+            huella['importe'] += importe
+            codigo_categoria = categorias.setdefault(categoria, len(categorias))
+            lote['dia'].append(fecha.day)
+            lote['tienda'].append(tienda)
+            lote['producto'].append(-1 if producto is None else producto)
+            lote['categoria'].append(codigo_categoria)
+            lote['articulo'].append(articulos.setdefault((nombre, categoria), len(articulos)))
+            lote['cantidad'].append(cantidad)
+            lote['importe'].append(importe)
+            if len(lote['dia']) >= options['lote']:
+                volcar()
+        volcar()
+
+        # Se escribe en un directorio temporal y se sustituye al final: los
+        # lectores nunca ven un mes a medio escribir
+        temporal = directorio() / f".{nombre_mes(mes)}.{os.getpid()}"
+        shutil.rmtree(temporal, ignore_errors=True)
+        temporal.mkdir()
+        for nombre, partes in trozos.items():
+            np.save(temporal / f'{nombre}.npy', np.concatenate(partes))
+        (temporal / 'meta.json').write_text(json.dumps({
+            'mes': nombre_mes(mes),
+            # Huella de lo realmente exportado (core/archivo.py): si difiere de la BD
+            # los lectores van a la BD y la próxima ejecución rehace el mes
+            'huella': huella,
+            'exportado': timezone.now().isoformat(),
+            'categorias': list(categorias),
+            'articulos': [list(clave) for clave in articulos],
+        }), encoding='utf-8')
+
+        viejo = directorio() / f".{nombre_mes(mes)}.viejo.{os.getpid()}"
+        if destino.exists():
+            os.rename(destino, viejo)
+        os.rename(temporal, destino)
+        shutil.rmtree(viejo, ignore_errors=True)
+
+        tamano = sum(f.stat().st_size for f in destino.iterdir())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {nombre_mes(mes)}: {huella['filas']} filas, {tamano / 1024 / 1024:.1f} MB "
+            f"en {time.perf_counter() - inicio:.1f}s"
+        ))
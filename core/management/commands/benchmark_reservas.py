@@ -0,0 +1,128 @@
+import random
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.models import Almacen, ProductosVendidos, Tienda, User
+from core.reportes import invalidar_reportes
+from core.reservas import reservar
+from core.routers import fijar_primaria
+from core.ventas import VentaRechazada, registrar_venta
+
+
+class Command(BaseCommand):
+    help = 'Venta relámpago: carritos que compiten por pocos productos, con y sin reserva'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--carritos', type=int, default=2000, help='Carritos por modo')
+        parser.add_argument('--hilos', type=int, default=8, help='Clientes concurrentes')
+        parser.add_argument('--productos', type=int, default=5, help='Productos en oferta (filas disputadas)')
+        parser.add_argument('--stock', type=int, default=500, help='Unidades por producto')
+        parser.add_argument('--lineas', type=int, default=2, help='Productos por carrito')
+        parser.add_argument('--pausa-ms', type=float, default=20, help='Del carrito al pago (el cliente paga)')
+        parser.add_argument('--modos', default='directo,reserva')
+
+    def handle(self, *args, **options):
+        fijar_primaria()
+        modos = [m.strip() for m in options['modos'].split(',') if m.strip()]
+        if set(modos) - {'directo', 'reserva'}:
+            raise CommandError('Modos válidos: directo, reserva')
+        if options['lineas'] > options['productos']:
+            raise CommandError('--lineas no puede ser mayor que --productos')
+
+        # Todo en una tienda de prueba que se borra al terminar
+        marca = time.time_ns()
+        tienda = Tienda.objects.create(nombre=f'benchmark-{marca}', activa=False)
+        usuario = User.objects.create_user(f'benchmark-{marca}', rol='usuario', tienda=tienda)
+        try:
+            for modo in modos:
+                for i in range(options['productos']):
+                    # create(): el stock inicial entra en el libro de movimientos
+                    Almacen.objects.create(
+                        tienda=tienda, nombreproducto=f'oferta-{i}', tipoproducto='bench',
+                        categoria='bench', precio=1, stock=options['stock'],
+                    )
+                self.medir(modo, tienda, usuario, options)
+                self.limpiar(tienda)
+        finally:
+            self.limpiar(tienda)
+            usuario.delete()
+            tienda.delete()
+
+    def limpiar(self, tienda):
+        ProductosVendidos.objects.filter(tienda=tienda).delete()
+        invalidar_reportes(tienda.id)
+        tienda.reservas.all().delete()
+        Almacen.objects.filter(tienda=tienda).delete()
+
+    def medir(self, modo, tienda, usuario, options):
+        productos = Almacen.objects.filter(tienda=tienda)
+        ids = list(productos.values_list('id', flat=True))
+        por_hilo = options['carritos'] // options['hilos']
+        pausa = options['pausa_ms'] / 1000
+        cuenta = {'vendidos': 0, 'rechazo_carrito': 0, 'rechazo_pago': 0}
+        latencias, errores = [], []
+        lock = threading.Lock()
+
+        def cliente():
+            fijar_primaria()  # el estado del router es por hilo
+            propias, fallos, local = [], [], dict.fromkeys(cuenta, 0)
+            for _ in range(por_hilo):
+                items = [{'producto_id': i, 'cantidad': 1} for i in random.sample(ids, options['lineas'])]
+                reserva = None
+                try:
+                    if modo == 'reserva':
+                        reserva = reservar(productos, items, usuario).id
+                except VentaRechazada:
+                    local['rechazo_carrito'] += 1
+                    continue
+                except Exception as e:
+                    fallos.append(str(e))
+                    continue
+                time.sleep(pausa)
+                t = time.perf_counter()
+                try:
+                    registrar_venta(productos, items, modo='sincrona', usuario=usuario, reserva=reserva)
+                    local['vendidos'] += 1
+                except VentaRechazada:
+                    local['rechazo_pago'] += 1
+                except Exception as e:
+                    fallos.append(str(e))
+                propias.append(time.perf_counter() - t)
+            connection.close()
+            with lock:
+                latencias.extend(propias)
+                errores.extend(fallos)
+                for clave, valor in local.items():
+                    cuenta[clave] += valor
+
+        hilos = [threading.Thread(target=cliente) for _ in range(options['hilos'])]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        total = time.perf_counter() - inicio
+
+        restantes = list(productos.con_stock().values_list('stock_actual', flat=True))
+        restante = sum(restantes)
+        latencias.sort()
+        n = len(latencias)
+        self.stdout.write(f"\n[{modo}] {por_hilo * options['hilos']} carritos, {options['hilos']} hilos, "
+                          f"{options['productos']} productos x {options['stock']} uds")
+        self.stdout.write(f"  Vendidos:           {cuenta['vendidos']} ({cuenta['vendidos'] / total:.0f}/s)")
+        self.stdout.write(f"  Rechazo al carrito: {cuenta['rechazo_carrito']}")
+        self.stdout.write(f"  Rechazo al pagar:   {cuenta['rechazo_pago']}")
+        if n:
+            self.stdout.write(
+                f"  Pago:               p50 {statistics.median(latencias) * 1000:.1f} ms, "
+                f"p95 {latencias[min(n - 1, int(n * 0.95))] * 1000:.1f} ms"
+            )
+        self.stdout.write(f"  Stock restante:     {restante}")
+        if errores:
+            self.stdout.write(self.style.WARNING(f"  {len(errores)} errores (p. ej. {errores[0]})"))
+        if min(restantes) < 0:
+            raise CommandError(f"[{modo}] stock negativo tras el benchmark: {restantes}")
@@ -0,0 +1,106 @@
+import random
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.models import Almacen, ProductosVendidos, Tienda
+from core.reportes import invalidar_reportes
+from core.routers import fijar_primaria
+from core.ventas import get_diario, registrar_venta
+
+
+class Command(BaseCommand):
+    help = 'Compara ventas/segundo con ingesta síncrona y con diario (VENTAS_INGESTA)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventas', type=int, default=2000, help='Ventas por modo')
+        parser.add_argument('--hilos', type=int, default=4, help='Cajas concurrentes')
+        parser.add_argument('--lineas', type=int, default=3, help='Productos por venta')
+        parser.add_argument('--productos', type=int, default=200, help='Tamaño del catálogo de prueba')
+        parser.add_argument('--modos', default='sincrona,diario')
+
+    def handle(self, *args, **options):
+        fijar_primaria()
+        modos = [m.strip() for m in options['modos'].split(',') if m.strip()]
+        if set(modos) - {'sincrona', 'diario'}:
+            raise CommandError('Modos válidos: sincrona, diario')
+
+        # Catálogo aislado en una tienda de prueba que se borra al terminar
+        tienda = Tienda.objects.create(nombre=f'benchmark-{time.time_ns()}', activa=False)
+        try:
+            for modo in modos:
+                Almacen.objects.bulk_create([
+                    Almacen(
+                        tienda=tienda, nombreproducto=f'bench-{i}', tipoproducto='bench',
+                        categoria='bench', precio=1, stock=10 ** 9,
+                    )
+                    for i in range(options['productos'])
+                ])
+                self.medir(modo, tienda, options)
+                ProductosVendidos.objects.filter(tienda=tienda).delete()
+                invalidar_reportes(tienda.id)
+                Almacen.objects.filter(tienda=tienda).delete()
+        finally:
+            ProductosVendidos.objects.filter(tienda=tienda).delete()
+            invalidar_reportes(tienda.id)
+            Almacen.objects.filter(tienda=tienda).delete()
+            tienda.delete()
+
+    def medir(self, modo, tienda, options):
+        productos = Almacen.objects.filter(tienda=tienda)
+        ids = list(productos.values_list('id', flat=True))
+        por_hilo = options['ventas'] // options['hilos']
+        latencias = []
+        errores = []
+        lock = threading.Lock()
+
+        def caja():
+            fijar_primaria()  # el estado del router es por hilo
+            propias, fallos = [], []
+            for _ in range(por_hilo):
+                items = [{'producto_id': i, 'cantidad': 1} for i in random.sample(ids, options['lineas'])]
+                t = time.perf_counter()
+                try:
+                    registrar_venta(productos, items, modo=modo)
+                    propias.append(time.perf_counter() - t)
+                except Exception as e:
+                    fallos.append(str(e))
+            connection.close()
+            with lock:
+                latencias.extend(propias)
+                errores.extend(fallos)
+
+        if modo == 'diario':
+            get_diario()  # el arranque del hilo no cuenta
+
+        hilos = [threading.Thread(target=caja) for _ in range(options['hilos'])]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        respuesta = time.perf_counter() - inicio
+
+        # Sostenido: hasta que todas las líneas están en la base de datos
+        esperadas = len(latencias) * options['lineas']
+        while ProductosVendidos.objects.filter(tienda=tienda).count() < esperadas:
+            if modo != 'diario':
+                break
+            time.sleep(0.05)
+        total = time.perf_counter() - inicio
+
+        latencias.sort()
+        ok = len(latencias)
+        self.stdout.write(f"\n[{modo}] {ok} ventas, {options['hilos']} hilos, {options['lineas']} líneas/venta")
+        if ok:
+            self.stdout.write(f"  Respuesta:  {ok / respuesta:8.0f} ventas/s")
+            self.stdout.write(f"  Sostenido:  {ok / total:8.0f} ventas/s (líneas en BD tras {total:.2f}s)")
+            self.stdout.write(
+                f"  Latencia:   p50 {statistics.median(latencias) * 1000:.1f} ms, "
+                f"p95 {latencias[min(ok - 1, int(ok * 0.95))] * 1000:.1f} ms"
+            )
+        if errores:
+            self.stdout.write(self.style.WARNING(f"  {len(errores)} errores (p. ej. {errores[0]})"))
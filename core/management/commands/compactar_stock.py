@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.routers import fijar_primaria
+from core.stock import compactar
+
+
+class Command(BaseCommand):
+    help = 'Suma los movimientos de stock pendientes a Almacen.stock (core/stock.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help='Movimientos por transacción')
+        parser.add_argument('--bucle', action='store_true', help='No terminar: compactar cada --intervalo segundos')
+        parser.add_argument('--intervalo', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        fijar_primaria()
+        while True:
+            total = 0
+            inicio = time.perf_counter()
+            while True:
+                hechos = compactar(options['lote'])
+                total += hechos
+                if hechos < options['lote']:
+                    break
+            if total or not options['bucle']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ {total} movimientos compactados en {time.perf_counter() - inicio:.2f}s"
+                ))
+            if not options['bucle']:
+                return
+            close_old_connections()
+            time.sleep(options['intervalo'])
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.reservas import expirar
+from core.routers import fijar_primaria
+
+
+class Command(BaseCommand):
+    help = 'Libera en bloque el stock de las reservas de carrito caducadas (core/reservas.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Reservas por transacción')
+        parser.add_argument('--bucle', action='store_true', help='No terminar: barrer cada --intervalo segundos')
+        parser.add_argument('--intervalo', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        fijar_primaria()
+        while True:
+            total = 0
+            while True:
+                liberadas = expirar(options['lote'])
+                total += liberadas
+                if liberadas < options['lote']:
+                    break
+            if total or not options['bucle']:
+                self.stdout.write(self.style.SUCCESS(f"✅ {total} reservas expiradas"))
+            if not options['bucle']:
+                return
+            close_old_connections()
+            time.sleep(options['intervalo'])
@@ -0,0 +1,107 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Se ejecuta en un proceso nuevo: así se mide un arranque en frío real
+SONDA = r'''
+import json, time
+t0 = time.perf_counter()
+from django.apps import AppConfig
+tiempos = {}
+_importar = AppConfig.import_models
+def import_models(self):
+    t = time.perf_counter()
+    _importar(self)
+    tiempos.setdefault(self.label, {})['modelos_ms'] = (time.perf_counter() - t) * 1000
+    ready = self.ready
+    def medir_ready():
+        t = time.perf_counter()
+        ready()
+        tiempos[self.label]['ready_ms'] = (time.perf_counter() - t) * 1000
+    self.ready = medir_ready
+AppConfig.import_models = import_models
+import django
+django.setup()
+t1 = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+t2 = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (t1 - t0) * 1000,
+    'urls_ms': (t2 - t1) * 1000,
+    'total_ms': (t2 - t0) * 1000,
+    'apps': tiempos,
+}))
+'''
+
+
+def importtime(stderr):
+    """Parsea la salida de -X importtime: {módulo: (propio_us, acumulado_us)}."""
+    modulos = {}
+    for linea in stderr.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        try:
+            propio, acumulado, nombre = linea[len('import time:'):].split('|')
+            modulos[nombre.strip()] = (int(propio), int(acumulado))
+        except ValueError:
+            continue
+    return modulos
+
+
+class Command(BaseCommand):
+    help = 'Mide el arranque en frío (imports por módulo, apps y URLs) y lo compara con un presupuesto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help='Módulos más lentos a mostrar')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Arranques a medir (se usa la mediana)')
+        parser.add_argument('--presupuesto-ms', type=float, default=None,
+                            help='Falla si el arranque supera este tiempo (por defecto ARRANQUE_PRESUPUESTO_MS)')
+
+    def arrancar(self):
+        entorno = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'ventas_backend.settings'))
+        proceso = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SONDA],
+            capture_output=True, text=True, env=entorno, cwd=settings.BASE_DIR,
+        )
+        if proceso.returncode != 0:
+            raise CommandError(f"El arranque falló:\n{proceso.stderr[-2000:]}")
+        salida = proceso.stdout.strip().splitlines()[-1]
+        return json.loads(salida), importtime(proceso.stderr)
+
+    def handle(self, *args, **options):
+        corridas = [self.arrancar() for _ in range(max(options['repeticiones'], 1))]
+        totales = [r['total_ms'] for r, _ in corridas]
+        mediana = statistics.median(totales)
+        resultado, modulos = min(corridas, key=lambda c: abs(c[0]['total_ms'] - mediana))
+
+        self.stdout.write(f"django.setup(): {resultado['setup_ms']:.0f} ms")
+        self.stdout.write(f"Carga de URLs:  {resultado['urls_ms']:.0f} ms")
+        self.stdout.write(f"Total (mediana de {len(totales)}): {mediana:.0f} ms")
+
+        self.stdout.write('\nApps (import de modelos / ready):')
+        for label, t in sorted(resultado['apps'].items(),
+                               key=lambda x: -(x[1].get('modelos_ms', 0) + x[1].get('ready_ms', 0))):
+            self.stdout.write(
+                f"  {label:<20} {t.get('modelos_ms', 0):8.1f} ms {t.get('ready_ms', 0):8.1f} ms"
+            )
+
+        self.stdout.write("\nMódulos más lentos (acumulado / propio):")
+        top = sorted(modulos.items(), key=lambda x: -x[1][1])[:options['top']]
+        for nombre, (propio, acumulado) in top:
+            self.stdout.write(f"  {acumulado / 1000:8.1f} ms {propio / 1000:8.1f} ms  {nombre}")
+
+        presupuesto = options['presupuesto_ms']
+        if presupuesto is None:
+            presupuesto = getattr(settings, 'ARRANQUE_PRESUPUESTO_MS', None)
+        if presupuesto and mediana > presupuesto:
+            raise CommandError(
+                f"Arranque en frío de {mediana:.0f} ms supera el presupuesto de {presupuesto:.0f} ms"
+            )
+        self.stdout.write(self.style.SUCCESS(f"✅ Arranque dentro del presupuesto ({presupuesto} ms)"))
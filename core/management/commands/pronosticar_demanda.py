@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.pronostico import calcular_sugerencias
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el pronóstico de demanda y las sugerencias de reposición'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tienda', type=int, help='Solo esta tienda (por defecto, todas)')
+        parser.add_argument('--dias-historia', type=int, default=3 * 365)
+        parser.add_argument('--ventana', type=int, default=28, help='Días de la media móvil')
+        parser.add_argument('--horizonte', type=int, default=14, help='Días a cubrir tras la entrega')
+        parser.add_argument('--plazo', type=int, default=7, help='Plazo de entrega del proveedor (días)')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = calcular_sugerencias(
+            tienda_id=options['tienda'],
+            dias_historia=options['dias_historia'],
+            ventana=options['ventana'],
+            horizonte=options['horizonte'],
+            plazo_entrega=options['plazo'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} sugerencias calculadas en {time.perf_counter() - inicio:.1f}s"
+        ))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.routers import fijar_primaria
+from core.ventas import recuperar_diarios
+
+
+class Command(BaseCommand):
+    help = 'Inserta las ventas de diarios huérfanos (procesos caídos con VENTAS_INGESTA=diario)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directorio', default=None, help='Por defecto VENTAS_DIARIO_DIR')
+
+    def handle(self, *args, **options):
+        # Se comprueba en el libro de stock qué ventas se confirmaron: sin réplica atrasada
+        fijar_primaria()
+        directorio = options['directorio'] or settings.VENTAS_DIARIO_DIR
+        total = recuperar_diarios(directorio, settings.VENTAS_DIARIO_LOTE)
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} líneas recuperadas de {directorio}"))
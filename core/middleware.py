@@ -0,0 +1,90 @@
+# core/middleware.py
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware.gzip import GZipMiddleware
+
+from . import routers
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaMiddleware:
+    """Fija a la primaria las peticiones que escriben y, durante unos segundos,
+    las siguientes del mismo cliente (su token, o la IP si es anónimo), para
+    leer lo escrito."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _clave(self, request):
+        # ✅ Por token: las cajas de una tienda (o los admins de una oficina)
+        # comparten IP tras el NAT y no deben fijarse unas a otras. La IP solo
+        # para peticiones anónimas
+        auth = request.META.get('HTTP_AUTHORIZATION')
+        if auth:
+            return 'replica_fijada_tk_%s' % hashlib.sha256(auth.encode()).hexdigest()
+        return 'replica_fijada_ip_%s' % request.META.get('REMOTE_ADDR', '')
+
+    def __call__(self, request):
+        routers.reiniciar()
+        if routers.alias_replica() is None:
+            return self.get_response(request)
+
+        clave = self._clave(request)
+        if request.method not in METODOS_SEGUROS or cache.get(clave):
+            routers.fijar_primaria()
+
+        response = self.get_response(request)
+
+        if routers.escribio():
+            cache.set(clave, True, getattr(settings, 'REPLICA_FIJAR_SEGUNDOS', 5))
+        return response
+
+
+class CompresionMiddleware(GZipMiddleware):
+    """GZip para las respuestas JSON grandes (catálogo, reportes), salvo el
+    stream SSE: comprimirlo retendría los eventos en el buffer del compresor."""
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        return super().process_response(request, response)
+
+
+class PerfiladoMiddleware:
+    """Perfila la petición (core/perfilado.py) si la pide un admin global con
+    ``X-Perfilar: 1`` o cae en la muestra ``PERFILADO_MUESTREO``.
+
+    Con ``PERFILADO_ACTIVO = False`` Django lo descarta al arrancar."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFILADO_ACTIVO', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.muestreo = getattr(settings, 'PERFILADO_MUESTREO', 0.0)
+
+    def _admin_global(self, request):
+        from rest_framework.authtoken.models import Token
+
+        from .tiendas import es_admin_global
+
+        auth = request.META.get('HTTP_AUTHORIZATION', '')
+        if not auth.startswith('Token '):
+            return False
+        token = Token.objects.select_related('user').filter(key=auth[len('Token '):].strip()).first()
+        return token is not None and token.user.is_active and es_admin_global(token.user)
+
+    def __call__(self, request):
+        if request.headers.get('X-Perfilar') and self._admin_global(request):
+            motivo = 'cabecera'
+        elif self.muestreo and random.random() < self.muestreo:
+            motivo = 'muestreo'
+        else:
+            return self.get_response(request)
+
+        from .perfilado import perfilar
+        return perfilar(request, self.get_response, motivo)
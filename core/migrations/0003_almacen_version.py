@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:20
+
+from django.db import migrations, models
+
+
+def crear_secuencia(apps, schema_editor):
+    # Solo PostgreSQL tiene secuencia: en otros motores core.sync usa un reloj local
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.execute("UPDATE core_almacen SET version = id")
+        return
+    schema_editor.execute("CREATE SEQUENCE IF NOT EXISTS core_catalogo_version_seq")
+    schema_editor.execute("UPDATE core_almacen SET version = nextval('core_catalogo_version_seq')")
+
+
+def borrar_secuencia(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP SEQUENCE IF EXISTS core_catalogo_version_seq")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_almacen_fechavencimiento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto_id', models.BigIntegerField()),
+                ('version', models.BigIntegerField(db_index=True)),
+                ('fechaeliminacion', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='almacen',
+            name='fechaactualizacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='almacen',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(crear_secuencia, borrar_secuencia),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_almacen_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tienda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=150, unique=True)),
+                ('direccion', models.CharField(blank=True, max_length=255)),
+                ('activa', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='tienda',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='usuarios', to='core.tienda'),
+        ),
+        migrations.AddField(
+            model_name='almacen',
+            name='tienda',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='productos', to='core.tienda'),
+        ),
+        migrations.AddField(
+            model_name='productosvendidos',
+            name='tienda',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ventas', to='core.tienda'),
+        ),
+        migrations.AddField(
+            model_name='productoeliminado',
+            name='tienda',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.tienda'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:45
+
+from django.db import migrations
+
+
+def asignar_tienda_principal(apps, schema_editor):
+    """Los datos existentes (una sola tienda hasta ahora) pasan a 'Principal'."""
+    Tienda = apps.get_model('core', 'Tienda')
+    User = apps.get_model('core', 'User')
+    Almacen = apps.get_model('core', 'Almacen')
+    ProductosVendidos = apps.get_model('core', 'ProductosVendidos')
+    ProductoEliminado = apps.get_model('core', 'ProductoEliminado')
+
+    hay_datos = (
+        Almacen.objects.exists() or ProductosVendidos.objects.exists()
+        or ProductoEliminado.objects.exists() or User.objects.exclude(rol='admin').exists()
+    )
+    if not hay_datos:
+        return
+
+    principal, _ = Tienda.objects.get_or_create(nombre='Principal')
+    Almacen.objects.filter(tienda__isnull=True).update(tienda=principal)
+    ProductosVendidos.objects.filter(tienda__isnull=True).update(tienda=principal)
+    ProductoEliminado.objects.filter(tienda__isnull=True).update(tienda=principal)
+    # Los administradores quedan globales (sin tienda)
+    User.objects.exclude(rol='admin').filter(tienda__isnull=True).update(tienda=principal)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_tienda'),
+    ]
+
+    operations = [
+        migrations.RunPython(asignar_tienda_principal, migrations.RunPython.noop),
+    ]
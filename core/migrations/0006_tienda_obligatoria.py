@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Separada de 0005: PostgreSQL no permite ALTER TABLE con eventos de FK pendientes
+    dependencies = [
+        ('core', '0005_asignar_tienda_principal'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='almacen',
+            name='tienda',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='productos', to='core.tienda'),
+        ),
+        migrations.AlterField(
+            model_name='productosvendidos',
+            name='tienda',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='ventas', to='core.tienda'),
+        ),
+        migrations.AlterField(
+            model_name='productoeliminado',
+            name='tienda',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.tienda'),
+        ),
+        migrations.AddIndex(
+            model_name='almacen',
+            index=models.Index(fields=['tienda', 'nombreproducto'], name='almacen_tienda_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='almacen',
+            index=models.Index(fields=['tienda', 'categoria'], name='almacen_tienda_categoria_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='almacen',
+            index=models.Index(fields=['tienda', 'version'], name='almacen_tienda_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productoeliminado',
+            index=models.Index(fields=['tienda', 'version'], name='eliminado_tienda_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productosvendidos',
+            index=models.Index(fields=['tienda', 'fechaventa'], name='vendidos_tienda_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productosvendidos',
+            index=models.Index(fields=['tienda', 'categoria', 'fechaventa'], name='vendidos_tienda_cat_fecha_idx'),
+        ),
+    ]
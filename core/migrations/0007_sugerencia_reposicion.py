@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_tienda_obligatoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SugerenciaReposicion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField()),
+                ('demanda_diaria', models.FloatField()),
+                ('dias_cobertura', models.FloatField(blank=True, null=True)),
+                ('cantidad_sugerida', models.PositiveIntegerField()),
+                ('fechacalculo', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='productosvendidos',
+            name='producto',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas', to='core.almacen'),
+        ),
+        migrations.AddIndex(
+            model_name='productosvendidos',
+            index=models.Index(fields=['producto', 'fechaventa'], name='vendidos_producto_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='sugerenciareposicion',
+            name='producto',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sugerencia', to='core.almacen'),
+        ),
+        migrations.AddField(
+            model_name='sugerenciareposicion',
+            name='tienda',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.tienda'),
+        ),
+        migrations.AddIndex(
+            model_name='sugerenciareposicion',
+            index=models.Index(fields=['tienda', 'dias_cobertura'], name='sugerencia_tienda_cob_idx'),
+        ),
+    ]
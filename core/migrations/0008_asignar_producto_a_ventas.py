@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:05
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def asignar_producto(apps, schema_editor):
+    """Enlaza las ventas históricas con el producto de su tienda por nombre."""
+    Almacen = apps.get_model('core', 'Almacen')
+    ProductosVendidos = apps.get_model('core', 'ProductosVendidos')
+
+    mismo_producto = Almacen.objects.filter(
+        tienda_id=OuterRef('tienda_id'), nombreproducto=OuterRef('nombreproducto')
+    ).order_by('id').values('id')[:1]
+    ProductosVendidos.objects.filter(producto__isnull=True).update(producto_id=Subquery(mismo_producto))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_sugerencia_reposicion'),
+    ]
+
+    operations = [
+        migrations.RunPython(asignar_producto, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_asignar_producto_a_ventas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productosvendidos',
+            name='uuid',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='productosvendidos',
+            name='fechaventa',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False),
+        ),
+    ]
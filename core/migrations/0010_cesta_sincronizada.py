@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_ventas_uuid_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CestaSincronizada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cliente_id', models.CharField(max_length=64)),
+                ('fechacliente', models.DateTimeField()),
+                ('fecharecepcion', models.DateTimeField(auto_now_add=True)),
+                ('lineas', models.PositiveIntegerField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('tienda', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='cestas_sincronizadas', to='core.tienda')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('tienda', 'cliente_id'), name='cesta_tienda_cliente_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_cesta_sincronizada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
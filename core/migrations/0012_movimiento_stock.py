@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:48
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def saldo_inicial(apps, schema_editor):
+    """Un movimiento ya aplicado por producto con su stock actual: foto = suma."""
+    Almacen = apps.get_model('core', 'Almacen')
+    MovimientoStock = apps.get_model('core', 'MovimientoStock')
+
+    lote = []
+    productos = Almacen.objects.exclude(stock=0).values_list('id', 'tienda_id', 'stock', 'version')
+    for producto_id, tienda_id, stock, version in productos.iterator(chunk_size=2000):
+        lote.append(MovimientoStock(
+            producto_id=producto_id, tienda_id=tienda_id, tipo='importacion', cantidad=stock,
+            version=version, aplicado=True, referencia='saldo inicial',
+        ))
+        if len(lote) >= 2000:
+            MovimientoStock.objects.bulk_create(lote)
+            lote = []
+    MovimientoStock.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_user_actualizado'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='almacen',
+            name='stock',
+            field=models.IntegerField(default=1, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('venta', 'Venta'), ('ajuste', 'Ajuste'), ('importacion', 'Importación'), ('devolucion', 'Devolución')], max_length=20)),
+                ('cantidad', models.IntegerField()),
+                ('version', models.BigIntegerField()),
+                ('aplicado', models.BooleanField(default=False)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('referencia', models.CharField(blank=True, max_length=64)),
+                ('producto', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='core.almacen')),
+                ('tienda', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='core.tienda')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='movimiento_producto_fecha_idx'), models.Index(fields=['version'], name='movimiento_version_idx'), models.Index(condition=models.Q(('aplicado', False)), fields=['producto'], name='movimiento_pendiente_idx')],
+            },
+        ),
+        migrations.RunPython(saldo_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_movimiento_stock'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimientostock',
+            name='tipo',
+            field=models.CharField(choices=[('venta', 'Venta'), ('ajuste', 'Ajuste'), ('importacion', 'Importación'), ('devolucion', 'Devolución'), ('reserva', 'Reserva')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('activa', 'Activa'), ('confirmada', 'Confirmada'), ('cancelada', 'Cancelada'), ('expirada', 'Expirada')], default='activa', max_length=20)),
+                ('fechacreacion', models.DateTimeField(auto_now_add=True)),
+                ('expira', models.DateTimeField()),
+                ('tienda', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='reservas', to='core.tienda')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LineaReserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.almacen')),
+                ('reserva', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='core.reserva')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('estado', 'activa')), fields=['expira'], name='reserva_activa_expira_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_reservas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productosvendidos',
+            index=models.Index(fields=['fechaventa', 'id'], name='vendidos_fecha_idx'),
+        ),
+    ]
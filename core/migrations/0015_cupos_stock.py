@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_vendidos_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CupoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('particion', models.PositiveSmallIntegerField()),
+                ('cantidad', models.IntegerField(default=0)),
+                ('producto', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='cupos', to='core.almacen')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('producto', 'particion'), name='cupo_producto_particion_uniq')],
+            },
+        ),
+    ]
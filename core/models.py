@@ -4,11 +4,28 @@ from django.core.validators import MinValueValidator
 
 
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from rest_framework.authtoken.models import Token
 
+from .sync import siguiente_version
+
+class Tienda(models.Model):
+    nombre = models.CharField(max_length=150, unique=True)
+    direccion = models.CharField(max_length=255, blank=True)
+    activa = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        ordering = ['nombre']
+
+
 class User(AbstractUser):
     # Tus campos adicionales (ej. rol)
     ROL_CHOICES = (
@@ -17,6 +34,12 @@ class User(AbstractUser):
         ('usuario', 'Usuario'),
     )
     rol = models.CharField(max_length=20, choices=ROL_CHOICES, default='usuario')
+    # ✅ Tienda del empleado. Vacío solo para administradores globales (ven todas)
+    tienda = models.ForeignKey(
+        Tienda, on_delete=models.PROTECT, null=True, blank=True, related_name='usuarios'
+    )
+    # ✅ Última modificación: ETag/Last-Modified de /api/users/ sin renderizar el listado
+    actualizado = models.DateTimeField(auto_now=True)
 
     # 👇 Opcional: si quieres evitar conflictos futuros (aunque ya no harán falta con AUTH_USER_MODEL)
     # groups = models.ManyToManyField(
@@ -38,29 +61,100 @@ class User(AbstractUser):
         return self.username
 
 
+class AlmacenQuerySet(models.QuerySet):
+    def con_stock(self):
+        """Anota el estado real: foto (``stock``) + movimientos aún no compactados.
+
+        ``stock_actual``, ``version_actual`` y ``fecha_actual`` se calculan en la
+        misma consulta (subconsultas sobre el índice parcial de pendientes).
+        """
+        pendientes = MovimientoStock.objects.filter(producto=OuterRef('pk'), aplicado=False).order_by().values('producto')
+        return self.annotate(
+            stock_actual=F('stock') + Coalesce(Subquery(pendientes.annotate(s=Sum('cantidad')).values('s')), 0),
+            version_actual=Greatest('version', Coalesce(Subquery(pendientes.annotate(v=Max('version')).values('v')), 0)),
+            fecha_actual=Greatest('fechaactualizacion', Coalesce(
+                Subquery(pendientes.annotate(f=Max('fecha')).values('f')), 'fechaactualizacion'
+            )),
+        )
+
+
 class Almacen(models.Model):
+    # Sin índice propio: los índices compuestos de Meta empiezan por tienda
+    tienda = models.ForeignKey(Tienda, on_delete=models.PROTECT, related_name='productos', db_index=False)
     nombreproducto = models.CharField(max_length=255)
     tipoproducto = models.CharField(max_length=100)
     categoria = models.CharField(max_length=100)
     fechavencimiento = models.DateField(null=True, blank=True)  # ✅ Ahora es opcional
     imagen = models.ImageField(upload_to='productos/', blank=True, null=True)
     precio = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
-    stock = models.PositiveIntegerField(default=1)
+    # ✅ Foto del stock: suma de los movimientos ya compactados (core/stock.py).
+    # El stock real es stock + movimientos pendientes (Almacen.objects.con_stock()).
+    # El validador cubre el stock de alta; después solo cambia con movimientos
+    stock = models.IntegerField(default=1, validators=[MinValueValidator(0)])
+    # ✅ Sincronización incremental (core/sync.py): versión monótona por cambio
+    version = models.BigIntegerField(default=0, db_index=True, editable=False)
+    fechaactualizacion = models.DateTimeField(auto_now=True)
+
+    objects = AlmacenQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            # ✅ La foto del stock solo la cambia la compactación: guardar una
+            # instancia leída antes no debe pisarla
+            update_fields = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name != 'stock'
+            ]
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version', 'fechaactualizacion'}
+        # ✅ La versión se toma dentro de la transacción que la escribe (core/sync.py)
+        with transaction.atomic():
+            self.version = siguiente_version()
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.nombreproducto} (stock: {self.stock})"
 
     class Meta:
         ordering = ['nombreproducto']
+        indexes = [
+            models.Index(fields=['tienda', 'nombreproducto'], name='almacen_tienda_nombre_idx'),
+            models.Index(fields=['tienda', 'categoria'], name='almacen_tienda_categoria_idx'),
+            models.Index(fields=['tienda', 'version'], name='almacen_tienda_version_idx'),
+        ]
+
+
+class ProductoEliminado(models.Model):
+    """Lápida de un producto borrado, para que la sincronización incremental lo propague."""
+    producto_id = models.BigIntegerField()
+    tienda = models.ForeignKey(Tienda, on_delete=models.CASCADE, related_name='+', db_index=False)
+    version = models.BigIntegerField(db_index=True)
+    fechaeliminacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Producto {self.producto_id} eliminado (v{self.version})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tienda', 'version'], name='eliminado_tienda_version_idx'),
+        ]
 
 
 class ProductosVendidos(models.Model):
+    tienda = models.ForeignKey(Tienda, on_delete=models.PROTECT, related_name='ventas', db_index=False)
+    # ✅ Producto de origen (para pronósticos por producto). Se conserva la línea si se borra
+    producto = models.ForeignKey(
+        Almacen, on_delete=models.SET_NULL, null=True, blank=True, related_name='ventas', db_index=False
+    )
     nombreproducto = models.CharField(max_length=255)
     tipoproducto = models.CharField(max_length=100)
     categoria = models.CharField(max_length=100)
-    fechaventa = models.DateField(auto_now_add=True)
+    # Fecha de la venta, no de la inserción (el diario de ventas inserta en diferido)
+    fechaventa = models.DateField(default=timezone.localdate, editable=False)
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
     cantidad = models.PositiveIntegerField(default=1)
+    # ✅ Identificador de la línea: reinsertar desde el diario no duplica (ignore_conflicts)
+    uuid = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
     @property
     def total(self):
@@ -70,4 +164,139 @@ class ProductosVendidos(models.Model):
         return f"{self.cantidad}x {self.nombreproducto} ({self.total})"
 
     class Meta:
-        ordering = ['-fechaventa']
\ No newline at end of file
+        ordering = ['-fechaventa']
+        indexes = [
+            models.Index(fields=['tienda', 'fechaventa'], name='vendidos_tienda_fecha_idx'),
+            models.Index(fields=['tienda', 'categoria', 'fechaventa'], name='vendidos_tienda_cat_fecha_idx'),
+            models.Index(fields=['producto', 'fechaventa'], name='vendidos_producto_fecha_idx'),
+            # Admin: orden por defecto (-fechaventa, -id) y date_hierarchy sin filtro de tienda
+            models.Index(fields=['fechaventa', 'id'], name='vendidos_fecha_idx'),
+        ]
+
+
+class SugerenciaReposicion(models.Model):
+    """Resultado del último pronóstico de demanda (core/pronostico.py)."""
+    tienda = models.ForeignKey(Tienda, on_delete=models.CASCADE, related_name='+', db_index=False)
+    producto = models.OneToOneField(Almacen, on_delete=models.CASCADE, related_name='sugerencia')
+    stock = models.PositiveIntegerField()
+    demanda_diaria = models.FloatField()
+    dias_cobertura = models.FloatField(null=True, blank=True)  # None: sin demanda prevista
+    cantidad_sugerida = models.PositiveIntegerField()
+    fechacalculo = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.producto_id}: pedir {self.cantidad_sugerida}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tienda', 'dias_cobertura'], name='sugerencia_tienda_cob_idx'),
+        ]
+
+
+class CestaSincronizada(models.Model):
+    """Cesta vendida sin conexión y ya aplicada; evita reaplicarla si la caja la reenvía."""
+    tienda = models.ForeignKey(Tienda, on_delete=models.PROTECT, related_name='cestas_sincronizadas', db_index=False)
+    cliente_id = models.CharField(max_length=64)  # id generado por la caja
+    fechacliente = models.DateTimeField()  # cuándo se vendió en la caja
+    fecharecepcion = models.DateTimeField(auto_now_add=True)
+    lineas = models.PositiveIntegerField()
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.tienda_id}/{self.cliente_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tienda', 'cliente_id'], name='cesta_tienda_cliente_uniq'),
+        ]
+
+
+class MovimientoStock(models.Model):
+    """Libro de movimientos de stock: solo se insertan filas.
+
+    Las ventas no actualizan la fila del producto (punto caliente de los más
+    vendidos): insertan aquí. ``compactar_stock`` suma los pendientes a
+    ``Almacen.stock`` y los marca ``aplicado``.
+    """
+    TIPO_CHOICES = (
+        ('venta', 'Venta'),
+        ('ajuste', 'Ajuste'),
+        ('importacion', 'Importación'),
+        ('devolucion', 'Devolución'),
+        ('reserva', 'Reserva'),  # negativa al reservar, positiva al liberar (core/reservas.py)
+    )
+    producto = models.ForeignKey(Almacen, on_delete=models.CASCADE, related_name='movimientos', db_index=False)
+    tienda = models.ForeignKey(Tienda, on_delete=models.PROTECT, related_name='movimientos', db_index=False)
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    cantidad = models.IntegerField()  # con signo: negativa en ventas
+    version = models.BigIntegerField()
+    aplicado = models.BooleanField(default=False)
+    fecha = models.DateTimeField(auto_now_add=True)
+    usuario = models.ForeignKey('User', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    referencia = models.CharField(max_length=64, blank=True)  # p. ej. uuid de la línea de venta
+
+    def __str__(self):
+        return f"{self.tipo} {self.cantidad:+d} ({self.producto_id})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['producto', 'fecha'], name='movimiento_producto_fecha_idx'),
+            models.Index(fields=['version'], name='movimiento_version_idx'),
+            # Solo los pendientes: lo que leen con_stock() y la compactación
+            models.Index(
+                fields=['producto'], condition=models.Q(aplicado=False), name='movimiento_pendiente_idx'
+            ),
+        ]
+
+
+class CupoStock(models.Model):
+    """Parte del stock de un producto apartada para una partición de cajas.
+
+    Una venta resta de su cupo con un UPDATE condicional que solo bloquea esa
+    fila, así que las cajas de un producto muy vendido no se esperan entre
+    sí. La suma de los cupos nunca supera el stock real (core/stock.py).
+    """
+    producto = models.ForeignKey(Almacen, on_delete=models.CASCADE, related_name='cupos', db_index=False)
+    particion = models.PositiveSmallIntegerField()
+    cantidad = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Cupo {self.particion} de {self.producto_id}: {self.cantidad}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'particion'], name='cupo_producto_particion_uniq'),
+        ]
+
+
+class Reserva(models.Model):
+    """Cantidades apartadas para un carrito hasta ``expira`` (core/reservas.py)."""
+    ESTADO_CHOICES = (
+        ('activa', 'Activa'),
+        ('confirmada', 'Confirmada'),  # convertida en venta
+        ('cancelada', 'Cancelada'),
+        ('expirada', 'Expirada'),
+    )
+    tienda = models.ForeignKey(Tienda, on_delete=models.PROTECT, related_name='reservas', db_index=False)
+    usuario = models.ForeignKey('User', on_delete=models.CASCADE, related_name='reservas')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='activa')
+    fechacreacion = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField()
+
+    def __str__(self):
+        return f"Reserva {self.id} ({self.estado})"
+
+    class Meta:
+        indexes = [
+            # Lo que recorre el barrido de caducadas
+            models.Index(fields=['expira'], condition=models.Q(estado='activa'), name='reserva_activa_expira_idx'),
+        ]
+
+
+class LineaReserva(models.Model):
+    reserva = models.ForeignKey(Reserva, on_delete=models.CASCADE, related_name='lineas')
+    producto = models.ForeignKey(Almacen, on_delete=models.CASCADE, related_name='+')
+    cantidad = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.cantidad}x {self.producto_id}"
@@ -0,0 +1,177 @@
+# core/perfilado.py
+"""Perfilado bajo demanda de peticiones (cProfile + tiempo de SQL).
+
+Lo activa ``PerfiladoMiddleware`` cuando ``PERFILADO_ACTIVO`` es True, para
+las peticiones de un administrador global con la cabecera ``X-Perfilar: 1``
+o para una muestra aleatoria (``PERFILADO_MUESTREO``, 0..1). Con
+``PERFILADO_ACTIVO = False`` el middleware se descarta al arrancar y no
+cuesta nada.
+
+El resumen (funciones más costosas, sus llamadas principales, SQL frente a
+Python) se guarda en la caché y se consulta en ``/api/perfiles/``. Se
+guarda el SQL sin parámetros y la ruta sin secretos (``ruta_segura``). Solo se perfila una petición a la vez por
+proceso: cProfile no admite perfiladores simultáneos a partir de Python 3.12.
+"""
+import cProfile
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+INDICE_KEY = 'perfiles_indice'
+PERFIL_KEY = 'perfil_%s'
+
+# Parámetros de la URL (query o segmentos de la ruta) que no se guardan
+SENSIBLES = {'token', 'key', 'password', 'uidb64'}
+OCULTO = '***'
+
+_en_curso = threading.Lock()
+
+
+class MedidorSQL:
+    """execute_wrapper que acumula el tiempo de cada consulta."""
+
+    def __init__(self):
+        self.total = 0.0
+        self.consultas = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.total += duracion
+            veces, acumulado = self.consultas.get(sql, (0, 0.0))
+            self.consultas[sql] = (veces + 1, acumulado + duracion)
+
+
+def _nombre(funcion):
+    fichero, linea, nombre = funcion
+    if fichero == '~':
+        return nombre  # builtin
+    raiz = str(settings.BASE_DIR)
+    if fichero.startswith(raiz):
+        fichero = os.path.relpath(fichero, raiz)
+    else:
+        partes = fichero.split(os.sep)
+        if 'site-packages' in partes:
+            fichero = os.sep.join(partes[partes.index('site-packages') + 1:])
+    return f"{fichero}:{linea}({nombre})"
+
+
+def resumir(perfil, medidor, top=25):
+    estadisticas = pstats.Stats(perfil).stats
+    hijos = {}
+    for funcion, (_, _, _, _, llamadores) in estadisticas.items():
+        for llamador, (_, _, _, acumulado) in llamadores.items():
+            hijos.setdefault(llamador, []).append((acumulado, funcion))
+
+    def fila(funcion):
+        llamadas, _, propio, acumulado, _ = estadisticas[funcion]
+        return {
+            'funcion': _nombre(funcion),
+            'llamadas': llamadas,
+            'propio_ms': round(propio * 1000, 2),
+            'acumulado_ms': round(acumulado * 1000, 2),
+        }
+
+    por_acumulado = sorted(estadisticas, key=lambda f: estadisticas[f][3], reverse=True)[:top]
+    return {
+        # Árbol resumido: las funciones más costosas y sus llamadas más caras
+        'arbol': [
+            {**fila(f), 'llama_a': [fila(h) for _, h in sorted(hijos.get(f, []), reverse=True)[:5]]}
+            for f in por_acumulado
+        ],
+        'propio': [fila(f) for f in sorted(estadisticas, key=lambda f: estadisticas[f][2], reverse=True)[:top]],
+        'sql': [
+            {'sql': sql[:500], 'veces': veces, 'ms': round(total * 1000, 2)}
+            for sql, (veces, total) in sorted(medidor.consultas.items(), key=lambda c: c[1][1], reverse=True)[:10]
+        ],
+    }
+
+
+def ruta_segura(request):
+    """Ruta de la petición con los valores sensibles ocultos: ``?token=`` del
+    stream SSE y ``<uidb64>/<token>`` del enlace de recuperación de contraseña."""
+    ruta = request.path
+    coincidencia = getattr(request, 'resolver_match', None)
+    if coincidencia is not None:
+        for nombre, valor in coincidencia.kwargs.items():
+            if nombre in SENSIBLES and valor:
+                ruta = ruta.replace(f'/{valor}/', f'/{OCULTO}/')
+    consulta = request.GET.copy()
+    for nombre in consulta:
+        if nombre.lower() in SENSIBLES:
+            consulta.setlist(nombre, [OCULTO])
+    if consulta:
+        ruta += '?' + consulta.urlencode(safe='*')
+    return ruta[:300]
+
+
+def perfilar(request, get_response, motivo):
+    """Ejecuta la petición perfilada; devuelve la respuesta con ``X-Perfil-Id``."""
+    if not _en_curso.acquire(blocking=False):
+        return get_response(request)
+    try:
+        perfil = cProfile.Profile()
+        medidor = MedidorSQL()
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(medidor))
+            perfil.enable()
+            try:
+                response = get_response(request)
+            finally:
+                perfil.disable()
+        total = time.perf_counter() - inicio
+    finally:
+        _en_curso.release()
+
+    perfil_id = uuid.uuid4().hex[:12]
+    guardar(perfil_id, {
+        'id': perfil_id,
+        'fecha': timezone.now().isoformat(),
+        'metodo': request.method,
+        'ruta': ruta_segura(request),
+        'status': response.status_code,
+        'motivo': motivo,
+        'total_ms': round(total * 1000, 2),
+        'sql_ms': round(medidor.total * 1000, 2),
+        'python_ms': round((total - medidor.total) * 1000, 2),
+        'consultas': sum(veces for veces, _ in medidor.consultas.values()),
+        **resumir(perfil, medidor),
+    })
+    response['X-Perfil-Id'] = perfil_id
+    return response
+
+
+def guardar(perfil_id, resumen):
+    segundos = getattr(settings, 'PERFILADO_SEGUNDOS', 24 * 3600)
+    cache.set(PERFIL_KEY % perfil_id, resumen, segundos)
+    # Índice acotado a los últimos PERFILADO_MAX (la caché no es compartida por
+    # procesos con LocMem: en producción usar un backend común, p. ej. Redis)
+    indice = [perfil_id] + cache.get(INDICE_KEY, [])
+    cache.set(INDICE_KEY, indice[:getattr(settings, 'PERFILADO_MAX', 100)], segundos)
+
+
+def listar():
+    indice = cache.get(INDICE_KEY, [])
+    perfiles = cache.get_many([PERFIL_KEY % i for i in indice])
+    campos = ('id', 'fecha', 'metodo', 'ruta', 'status', 'motivo', 'total_ms', 'sql_ms', 'python_ms', 'consultas')
+    return [
+        {campo: perfiles[PERFIL_KEY % i][campo] for campo in campos}
+        for i in indice if PERFIL_KEY % i in perfiles
+    ]
+
+
+def obtener(perfil_id):
+    return cache.get(PERFIL_KEY % perfil_id)
@@ -0,0 +1,171 @@
+# core/pronostico.py
+"""Pronóstico de demanda y sugerencias de reposición.
+
+Las ventas diarias por producto se leen en bloque (``core.analitica``: el
+archivo columnar y una sola consulta agregada para lo no archivado) y se
+procesan con NumPy para todos los productos a la vez (sin bucles por
+producto en Python):
+
+* media móvil de los últimos ``ventana`` días (y su desviación típica);
+* estacionalidad semanal: peso de cada día de la semana en el historial;
+* estacionalidad anual: el mismo periodo del año pasado frente a las
+  semanas previas (si hay más de un año de historia);
+* días de cobertura del stock actual y cantidad a pedir para cubrir
+  ``plazo_entrega + horizonte`` días con stock de seguridad.
+
+El resultado se guarda en ``SugerenciaReposicion`` para consultarlo rápido.
+``actualizar_sugerencias`` (el endpoint) no recalcula si desde la última vez
+no ha cambiado nada de lo que entra en el cálculo: la clave de caché sale de
+la base de datos (última venta y último movimiento de stock de la tienda),
+no de un contador en memoria, así que vale para todos los procesos.
+"""
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .analitica import ventas_diarias
+from .models import Almacen, MovimientoStock, ProductosVendidos, SugerenciaReposicion
+
+Z_SERVICIO = 1.65  # ~95 % de nivel de servicio
+
+
+def pronosticar(ids, stock, venta_ids, dias, cantidades, desde, hoy,
+                ventana=28, horizonte=14, plazo_entrega=7):
+    """Cálculo vectorizado. ``ids`` debe estar ordenado ascendentemente.
+
+    Devuelve (demanda_diaria, dias_cobertura, cantidad_sugerida); la
+    cobertura es NaN si no hay demanda prevista.
+    """
+    n = len(ids)
+    total_dias = (hoy - desde).days
+
+    # Fila de cada venta; se descartan productos que ya no están en el catálogo
+    fila = np.minimum(np.searchsorted(ids, venta_ids), max(n - 1, 0))
+    validas = ids[fila] == venta_ids if n else np.zeros(len(venta_ids), dtype=bool)
+    fila, dias, cantidades = fila[validas], dias[validas], cantidades[validas]
+
+    # 1) Media móvil y dispersión (los días sin venta cuentan como 0)
+    recientes = dias >= total_dias - ventana
+    suma = np.bincount(fila[recientes], cantidades[recientes], minlength=n)
+    suma2 = np.bincount(fila[recientes], cantidades[recientes] ** 2, minlength=n)
+    media = suma / ventana
+    desviacion = np.sqrt(np.maximum(suma2 / ventana - media ** 2, 0))
+
+    # 2) Estacionalidad semanal
+    dia_semana = (dias + desde.weekday()) % 7
+    por_dia_semana = np.bincount(fila * 7 + dia_semana, cantidades, minlength=n * 7).reshape(n, 7)
+    ocurrencias = np.bincount((np.arange(total_dias) + desde.weekday()) % 7, minlength=7)
+    media_global = por_dia_semana.sum(axis=1) / total_dias
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Con menos de una semana de historia, los días de la semana que aún no
+        # han salido no tienen datos: peso neutro (1), no cero
+        factor_semana = np.where(
+            (media_global[:, None] > 0) & (ocurrencias > 0),
+            (por_dia_semana / np.maximum(ocurrencias, 1)) / media_global[:, None],
+            1.0,
+        )
+
+    # 3) Estacionalidad anual: el horizonte de hace un año frente a la ventana previa
+    factor_anual = np.ones(n)
+    if total_dias >= 365 + ventana:
+        inicio = total_dias - 365
+        en_horizonte = (dias >= inicio) & (dias < inicio + horizonte)
+        previas = (dias >= inicio - ventana) & (dias < inicio)
+        media_horizonte = np.bincount(fila[en_horizonte], cantidades[en_horizonte], minlength=n) / horizonte
+        media_previa = np.bincount(fila[previas], cantidades[previas], minlength=n) / ventana
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factor_anual = np.where(
+                media_previa > 0, np.clip(media_horizonte / media_previa, 0.5, 2.0), 1.0
+            )
+
+    # 4) Demanda prevista: media × peso de los días de la semana del horizonte × factor anual
+    dias_horizonte = np.bincount((np.arange(horizonte) + hoy.weekday()) % 7, minlength=7)
+    demanda_diaria = media * (factor_semana @ dias_horizonte) * factor_anual / horizonte
+
+    # 5) Cobertura y cantidad a pedir
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cobertura = np.where(demanda_diaria > 0, stock / demanda_diaria, np.nan)
+    seguridad = Z_SERVICIO * desviacion * math.sqrt(plazo_entrega)
+    objetivo = demanda_diaria * (plazo_entrega + horizonte) + seguridad
+    sugerido = np.ceil(np.maximum(objetivo - stock, 0)).astype(np.int64)
+
+    return demanda_diaria, cobertura, sugerido
+
+
+def calcular_sugerencias(tienda_id=None, dias_historia=3 * 365, ventana=28, horizonte=14,
+                         plazo_entrega=7, hoy=None):
+    """Recalcula y guarda las sugerencias de la tienda (o de todas). Devuelve cuántas."""
+    hoy = hoy or timezone.localdate()
+    desde = hoy - timedelta(days=dias_historia)
+
+    productos = Almacen.objects.con_stock().order_by('id')
+    if tienda_id is not None:
+        productos = productos.filter(tienda_id=tienda_id)
+    catalogo = [
+        (producto_id, tienda, max(existencias, 0))
+        for producto_id, tienda, existencias in productos.values_list('id', 'tienda_id', 'stock_actual')
+    ]
+    n = len(catalogo)
+    ids = np.fromiter((p[0] for p in catalogo), dtype=np.int64, count=n)
+    stock = np.fromiter((p[2] for p in catalogo), dtype=np.float64, count=n)
+
+    # Meses cerrados desde el archivo columnar; el resto, de la base de datos
+    venta_ids, dias, cantidades = ventas_diarias(tienda_id, desde, hoy)
+    demanda, cobertura, sugerido = pronosticar(
+        ids, stock, venta_ids, dias, cantidades, desde, hoy,
+        ventana=ventana, horizonte=horizonte, plazo_entrega=plazo_entrega,
+    )
+
+    ahora = timezone.now()
+    sugerencias = [
+        SugerenciaReposicion(
+            tienda_id=tienda,
+            producto_id=producto_id,
+            stock=existencias,
+            demanda_diaria=d,
+            dias_cobertura=None if math.isnan(c) else c,
+            cantidad_sugerida=q,
+            fechacalculo=ahora,
+        )
+        for (producto_id, tienda, existencias), d, c, q
+        in zip(catalogo, demanda.tolist(), cobertura.tolist(), sugerido.tolist())
+    ]
+
+    with transaction.atomic():
+        anteriores = SugerenciaReposicion.objects.all()
+        if tienda_id is not None:
+            anteriores = anteriores.filter(tienda_id=tienda_id)
+        anteriores.delete()
+        SugerenciaReposicion.objects.bulk_create(sugerencias, batch_size=5000)
+    return len(sugerencias)
+
+
+def _clave(tienda_id, hoy):
+    """Cambia con cada venta (alta o baja), cada movimiento de stock y cada día."""
+    ventas, movimientos = ProductosVendidos.objects.order_by(), MovimientoStock.objects.order_by()
+    if tienda_id is not None:
+        ventas, movimientos = ventas.filter(tienda_id=tienda_id), movimientos.filter(tienda_id=tienda_id)
+    v = ventas.aggregate(ultima=Max('id'), filas=Count('id'))
+    m = movimientos.aggregate(ultimo=Max('id'))
+    return 'reposicion_%s_%s_%s_%s_%s' % (tienda_id, hoy.isoformat(), v['ultima'], v['filas'], m['ultimo'])
+
+
+def actualizar_sugerencias(tienda_id=None):
+    """``calcular_sugerencias`` solo si han cambiado las ventas o el stock.
+
+    Devuelve (número de sugerencias, si se ha recalculado).
+    """
+    # La clave se toma antes de calcular: lo que entre mientras tanto
+    # la cambia y la siguiente llamada recalcula
+    clave = _clave(tienda_id, timezone.localdate())
+    total = cache.get(clave)
+    if total is not None:
+        return total, False
+    total = calcular_sugerencias(tienda_id=tienda_id)
+    cache.set(clave, total, 24 * 3600)
+    return total, True
@@ -0,0 +1,123 @@
+# core/recuperacion.py
+"""Recuperación de contraseña (solicitud por email y confirmación)."""
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.core.mail import send_mail
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from .throttles import PasswordResetEmailThrottle, PasswordResetIPThrottle
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+# ✅ Generador de tokens personalizado
+class PasswordResetTokenGenerator(PasswordResetTokenGenerator):
+    def _make_hash_value(self, user, timestamp):
+        # El hash de la contraseña invalida el enlace una vez usado
+        return str(user.pk) + user.password + str(timestamp) + str(user.is_active)
+
+password_reset_token = PasswordResetTokenGenerator()
+
+# ✅ Solicitar recuperación de contraseña
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@throttle_classes([PasswordResetIPThrottle, PasswordResetEmailThrottle])
+def password_reset_request(request):
+    if not isinstance(request.data, dict):
+        return Response({'error': 'Email es requerido'}, status=400)
+    email = request.data.get('email')
+    
+    if not email:
+        return Response({'error': 'Email es requerido'}, status=400)
+    
+    try:
+        user = User.objects.get(email=email)
+        
+        # ✅ Generar token único
+        token = password_reset_token.make_token(user)
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        
+        # ✅ Construir URL de restablecimiento
+        
+        reset_url = f'http://127.0.0.1:5500/reset-password.html?uidb64={uid}&token={token}'
+
+        # ✅ Enviar email
+        subject = 'Recuperación de contraseña - MultiTiendas'
+        message = f'''
+        Hola {user.username},
+
+        Has solicitado recuperar tu contraseña en MultiTiendas.
+
+        Haz clic en el siguiente enlace para crear una nueva contraseña:
+        {reset_url}
+
+        Este enlace expirará en 1 hora.
+
+        Si no solicitaste este cambio, ignora este email.
+
+        Gracias,
+        El equipo de MultiTiendas
+        '''
+        
+        send_mail(
+            subject,
+            message,
+            settings.DEFAULT_FROM_EMAIL,
+            [email],
+            fail_silently=False,
+        )
+        
+        return Response({'message': 'Se ha enviado un enlace de recuperación a tu email'})
+    
+    except User.DoesNotExist:
+        # ✅ No revelar si el email existe (seguridad)
+        return Response({'message': 'Si el email está registrado, recibirás un enlace de recuperación'})
+    except Exception as e:
+        logger.error(f"Error al enviar email: {str(e)}")
+        return Response({'error': 'Error al procesar la solicitud'}, status=500)
+
+
+# ✅ Verificar token y restablecer contraseña
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+def password_reset_confirm(request, uidb64, token):
+    try:
+        uid = force_str(urlsafe_base64_decode(uidb64))
+        user = User.objects.get(pk=uid)
+        
+        # Verificar token
+        # ✅ Con el mismo generador que lo emitió
+        if not password_reset_token.check_token(user, token):
+            return Response({'error': 'El enlace ha expirado o es inválido'}, status=400)
+        
+        # Si es GET: verificar y mostrar formulario
+        if request.method == 'GET':
+            return Response({
+                'message': 'Token válido. Puedes establecer una nueva contraseña.',
+                'uidb64': uidb64,
+                'token': token
+            })
+        
+        # Si es POST: actualizar contraseña
+        new_password = request.data.get('password')
+        if not new_password or len(new_password) < 6:
+            return Response({'error': 'La contraseña debe tener al menos 6 caracteres'}, status=400)
+        
+        user.set_password(new_password)
+        user.save()
+        
+        return Response({'message': 'Contraseña actualizada correctamente'})
+    
+    except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+        return Response({'error': 'El enlace es inválido'}, status=400)
+    except Exception as e:
+        logger.error(f"Error al restablecer contraseña: {str(e)}")
+        return Response({'error': 'Error al procesar la solicitud'}, status=500)
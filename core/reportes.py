@@ -0,0 +1,217 @@
+# core/reportes.py
+"""Ranking de productos por ingresos y clasificación ABC.
+
+Se calcula en la base de datos con funciones de ventana sobre
+``ProductosVendidos`` agrupado por producto: posición dentro de la
+categoría (o global), ingresos acumulados y total de la partición. Clase
+ABC: A hasta el 80 % de los ingresos acumulados, B hasta el 95 %, C resto.
+
+Si el periodo incluye meses ya archivados y al día (``core.archivo``) se
+calcula desde los totales por artículo del archivo columnar
+(``core.analitica``, con NumPy) más la base de datos para el resto, con el
+mismo resultado.
+
+Los resultados se cachean por (tienda, periodo, categoría, n) y la versión
+de las ventas de la tienda (``version_ventas``), lo que invalida de golpe
+todas las entradas de esa tienda sin tener que enumerarlas:
+
+* con una caché compartida (Redis, memcached...) es la "generación" de la
+  tienda, que incrementa cada venta, también las altas, cambios y bajas
+  desde el admin (señales en ``core.signals``);
+* con una caché por proceso (LocMem, la de desarrollo) un contador en
+  memoria no ve lo que escriben los demás procesos: la versión se lee de la
+  base de datos (última id y número de ventas de la tienda).
+"""
+import hashlib
+import time
+from calendar import monthrange
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Func, Max, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .archivo import meses_vigentes
+from .models import ProductosVendidos
+
+LIMITE_A = Decimal('0.80')
+LIMITE_B = Decimal('0.95')
+
+GENERACION_KEY = 'reportes_generacion_%s'
+
+
+class SumaVentana(Func):
+    """SUM(...) OVER (...) sobre un agregado: Django no permite Sum(Sum(...))."""
+    function = 'SUM'
+    window_compatible = True
+    output_field = DecimalField(max_digits=20, decimal_places=2)
+
+
+def _semilla():
+    # Si la clave se pierde (reinicio o desalojo de la caché) la generación
+    # vuelve a empezar por encima de cualquiera ya repartida: las ETag de
+    # /api/ventas/list/ dependen de que no se repita
+    return time.time_ns() // 1000
+
+
+def generacion(tienda_id):
+    return cache.get_or_set(GENERACION_KEY % tienda_id, _semilla, timeout=None)
+
+
+def cache_compartida():
+    """Si la caché por defecto la ven todos los procesos (no LocMem ni Dummy)."""
+    backend = settings.CACHES['default']['BACKEND']
+    return not backend.endswith(('.LocMemCache', '.DummyCache'))
+
+
+def version_ventas(tienda_id):
+    """Versión de las ventas de la tienda (None = todas) para claves de caché y ETag."""
+    if cache_compartida():
+        return generacion(tienda_id if tienda_id is not None else 'todas')
+    ventas = ProductosVendidos.objects.order_by()
+    if tienda_id is not None:
+        ventas = ventas.filter(tienda_id=tienda_id)
+    datos = ventas.aggregate(ultima=Max('id'), filas=Count('id'))
+    return 'bd-%s-%s' % (datos['ultima'], datos['filas'])
+
+
+def invalidar_reportes(tienda_id):
+    """Invalida (tras el commit) los reportes de la tienda y los globales."""
+    def incrementar():
+        for clave in (tienda_id, 'todas'):
+            try:
+                cache.incr(GENERACION_KEY % clave)
+            except ValueError:
+                cache.set(GENERACION_KEY % clave, _semilla(), timeout=None)
+    transaction.on_commit(incrementar)
+
+
+def _dia_siguiente(dia):
+    # ✅ date.max + 1 día desborda (OverflowError): el límite abierto se queda en date.max
+    return dia + timedelta(days=1) if dia < date.max else date.max
+
+
+def rango_periodo(params):
+    """[desde, hasta) a partir de ?periodo=YYYY-MM o ?desde=&hasta= (inclusive).
+
+    Por defecto, el mes en curso. Lanza ValueError si el formato es inválido.
+    """
+    if params.get('desde') or params.get('hasta'):
+        desde = date.fromisoformat(params['desde']) if params.get('desde') else date.min
+        hasta = _dia_siguiente(date.fromisoformat(params['hasta'])) if params.get('hasta') else date.max
+        return desde, hasta
+
+    if params.get('periodo'):
+        anio, mes = (int(x) for x in params['periodo'].split('-'))
+        desde = date(anio, mes, 1)
+    else:
+        desde = timezone.localdate().replace(day=1)
+    hasta = _dia_siguiente(desde.replace(day=monthrange(desde.year, desde.month)[1]))
+    return desde, hasta
+
+
+def clase_abc(previo, total):
+    """Clase según el porcentaje acumulado ANTES del producto (el que cruza el 80 % es A)."""
+    if not total or previo < LIMITE_A * total:
+        return 'A'
+    if previo < LIMITE_B * total:
+        return 'B'
+    return 'C'
+
+
+def ranking(tienda_id, desde, hasta, categoria=None, por_categoria=True, n=50):
+    """Top ``n`` por ingresos en [desde, hasta), por categoría o global, con clase ABC."""
+    # ✅ La categoría la escribe el cliente: se resume para que la clave sea
+    # corta y sin espacios ni caracteres de control (memcached las rechaza)
+    clave = 'reportes_ranking_%s' % '_'.join(str(p) for p in (
+        tienda_id, version_ventas(tienda_id),
+        desde.isoformat(), hasta.isoformat(),
+        hashlib.sha256(categoria.encode()).hexdigest()[:32] if categoria else '', int(por_categoria), n,
+    ))
+    data = cache.get(clave)
+    if data is not None:
+        return data
+
+    meses = meses_vigentes(desde, hasta)
+    if meses:
+        from . import analitica  # NumPy solo si el periodo toca meses archivados
+
+        data = _ranking_archivo(
+            analitica.totales_por_articulo(tienda_id, desde, hasta, categoria, meses), por_categoria, n
+        )
+        cache.set(clave, data, getattr(settings, 'REPORTES_CACHE_SEGUNDOS', 3600))
+        return data
+
+    ventas = ProductosVendidos.objects.filter(fechaventa__gte=desde, fechaventa__lt=hasta)
+    if tienda_id is not None:
+        ventas = ventas.filter(tienda_id=tienda_id)
+    if categoria:
+        ventas = ventas.filter(categoria=categoria)
+
+    ingresos = Sum(F('precio_unitario') * F('cantidad'))
+    particion = [F('categoria')] if por_categoria else None
+    orden = [F('ingresos').desc(), F('nombreproducto').asc()]
+
+    filas = (
+        ventas.order_by()
+        .values('categoria', 'nombreproducto')
+        .annotate(ingresos=ingresos, unidades=Sum('cantidad'))
+        .annotate(
+            posicion=Window(RowNumber(), partition_by=particion, order_by=orden),
+            acumulado=Window(SumaVentana(ingresos), partition_by=particion, order_by=orden),
+            total=Window(SumaVentana(ingresos), partition_by=particion),
+        )
+        .filter(posicion__lte=n)
+        .order_by('categoria' if por_categoria else 'posicion', 'posicion')
+    )
+
+    data = []
+    for f in filas:
+        previo = f['acumulado'] - f['ingresos']
+        data.append({
+            'posicion': f['posicion'],
+            'nombreproducto': f['nombreproducto'],
+            'categoria': f['categoria'],
+            'unidades': f['unidades'],
+            'ingresos': float(f['ingresos']),
+            'porcentaje_acumulado': round(float(f['acumulado'] / f['total']) * 100, 2) if f['total'] else 0.0,
+            'clase': clase_abc(previo, f['total']),
+        })
+
+    cache.set(clave, data, getattr(settings, 'REPORTES_CACHE_SEGUNDOS', 3600))
+    return data
+
+
+def _ranking_archivo(totales, por_categoria, n):
+    """Mismo resultado que la consulta con ventanas, a partir de los totales
+    por artículo (``core.analitica``) cuando el periodo incluye meses archivados."""
+    particiones = {}
+    for (categoria, nombre), (unidades, centimos) in totales.items():
+        particiones.setdefault(categoria if por_categoria else None, []).append(
+            (Decimal(centimos) / 100, nombre, categoria, unidades)
+        )
+
+    data = []
+    for particion in sorted(particiones, key=lambda c: c or ''):
+        filas = sorted(particiones[particion], key=lambda f: (-f[0], f[1]))
+        total = sum(f[0] for f in filas)
+        acumulado = Decimal(0)
+        for posicion, (ingresos, nombre, categoria, unidades) in enumerate(filas[:n], start=1):
+            previo = acumulado
+            acumulado += ingresos
+            data.append({
+                'posicion': posicion,
+                'nombreproducto': nombre,
+                'categoria': categoria,
+                'unidades': unidades,
+                'ingresos': float(ingresos),
+                'porcentaje_acumulado': round(float(acumulado / total) * 100, 2) if total else 0.0,
+                'clase': clase_abc(previo, total),
+            })
+    if not por_categoria:
+        data.sort(key=lambda f: f['posicion'])
+    return data
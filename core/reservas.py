@@ -0,0 +1,146 @@
+# core/reservas.py
+"""Reservas de stock para carritos (ventas relámpago).
+
+Al reservar se descuenta el stock como en una venta (del cupo de la caja,
+core/stock.py) y se inserta un movimiento ``reserva``
+negativo por producto (core/stock.py): la cantidad deja de estar
+disponible para los demás carritos hasta que la reserva caduca. Los
+carritos que no caben se rechazan al reservar, no al pagar.
+
+``crear_venta`` con ``{"reserva": id}`` confirma la reserva: bloquea solo
+la fila de la reserva (propia del carrito), inserta ``+reserva`` / ``-venta``
+y registra las líneas, sin volver a mirar ni bloquear los productos.
+
+Las reservas caducadas las libera en bloque ``manage.py expirar_reservas``
+(un movimiento ``+reserva`` por línea). Hasta que pasa el barrido siguen
+apartando su stock, pero ya no se pueden confirmar.
+
+Reservar, cancelar y expirar cambian el stock disponible: publican el
+evento de productos (core/eventos.py) tras el commit, como una venta.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+
+from . import stock
+from .eventos import publicar_cambios_producto
+from .models import Almacen, LineaReserva, MovimientoStock, Reserva
+from .ventas import VentaRechazada, leer_lineas, pedido_de
+
+
+def duracion(segundos=None):
+    """TTL pedido (o el por defecto), acotado a ``RESERVAS_TTL_MAX``."""
+    if segundos is None:
+        return settings.RESERVAS_TTL_SEGUNDOS
+    if not isinstance(segundos, int) or isinstance(segundos, bool) or segundos < 1:
+        raise VentaRechazada('ttl debe ser un entero positivo (segundos)')
+    return min(segundos, settings.RESERVAS_TTL_MAX)
+
+
+def reservar(productos, items, usuario, segundos=None):
+    """Aparta el stock de ``items`` durante ``segundos``. Devuelve la ``Reserva``.
+
+    Lanza ``VentaRechazada`` (p. ej. stock insuficiente) sin apartar nada.
+    """
+    segundos = duracion(segundos)
+    catalogo, pedido = pedido_de(productos, leer_lineas(items))
+    tiendas = {p.tienda_id for p in catalogo.values()}
+    if len(tiendas) != 1:
+        raise VentaRechazada('Una reserva solo puede incluir productos de una tienda')
+
+    with transaction.atomic():
+        reserva = Reserva.objects.create(
+            tienda_id=tiendas.pop(), usuario=usuario, expira=timezone.now() + timedelta(seconds=segundos),
+        )
+        reserva.lineas_apartadas = LineaReserva.objects.bulk_create([
+            LineaReserva(reserva=reserva, producto_id=producto_id, cantidad=cantidad)
+            for producto_id, cantidad in pedido.items()
+        ])
+        try:
+            stock.descontar(
+                catalogo, pedido, tipo='reserva', usuario=usuario,
+                referencias=dict.fromkeys(pedido, f'reserva:{reserva.id}'),
+            )
+        except stock.StockInsuficiente as e:
+            raise VentaRechazada(
+                str(e), status.HTTP_409_CONFLICT,
+                extra={'producto_id': e.producto.id, 'disponible': max(e.disponible, 0), 'solicitado': e.solicitado},
+            )
+    publicar_cambios_producto([catalogo[producto_id] for producto_id in pedido])
+    return reserva
+
+
+def tomar(reserva_id, usuario):
+    """Bloquea la reserva activa del usuario para confirmarla o cancelarla."""
+    try:
+        reserva = Reserva.objects.select_for_update().get(pk=reserva_id, usuario=usuario)
+    except (Reserva.DoesNotExist, TypeError, ValueError):
+        raise VentaRechazada('Reserva no encontrada', status.HTTP_404_NOT_FOUND)
+    if reserva.estado != 'activa':
+        raise VentaRechazada(f'La reserva está {reserva.estado}', status.HTTP_409_CONFLICT)
+    if reserva.expira <= timezone.now():
+        raise VentaRechazada('La reserva ha expirado', status.HTTP_410_GONE)
+    return reserva
+
+
+def _liberar(reserva_ids, usuario=None):
+    """Devuelve al stock las líneas de las reservas (movimientos ``+reserva``)."""
+    lineas = LineaReserva.objects.filter(reserva_id__in=reserva_ids).values_list(
+        'reserva_id', 'reserva__tienda_id', 'producto_id', 'cantidad',
+    )
+    movimientos = stock.insertar([
+        MovimientoStock(
+            producto_id=producto_id, tienda_id=tienda_id, tipo='reserva', cantidad=cantidad,
+            usuario=usuario, referencia=f'reserva:{reserva_id}',
+        )
+        for reserva_id, tienda_id, producto_id, cantidad in lineas
+    ])
+    productos = list(Almacen.objects.con_stock().filter(id__in={m.producto_id for m in movimientos}))
+    for producto in productos:
+        producto.stock, producto.version = producto.stock_actual, producto.version_actual
+    publicar_cambios_producto(productos)
+    return movimientos
+
+
+def convertir(reserva, catalogo, usuario, referencias):
+    """La reserva tomada pasa a venta: ``+reserva`` y ``-venta`` por línea, sin comprobar stock."""
+    movimientos = []
+    for linea in reserva.lineas.all():
+        comun = {'producto_id': linea.producto_id, 'tienda_id': reserva.tienda_id, 'usuario': usuario}
+        movimientos.append(MovimientoStock(
+            tipo='reserva', cantidad=linea.cantidad, referencia=f'reserva:{reserva.id}', **comun,
+        ))
+        movimientos.append(MovimientoStock(
+            tipo='venta', cantidad=-linea.cantidad, referencia=referencias.get(linea.producto_id, ''), **comun,
+        ))
+    stock.insertar(movimientos)
+    Reserva.objects.filter(pk=reserva.pk).update(estado='confirmada')
+
+
+def cancelar(reserva_id, usuario):
+    with transaction.atomic():
+        reserva = tomar(reserva_id, usuario)
+        _liberar([reserva.id], usuario)
+        Reserva.objects.filter(pk=reserva.pk).update(estado='cancelada')
+
+
+def expirar(lote=1000):
+    """Libera hasta ``lote`` reservas caducadas. Devuelve cuántas.
+
+    Las reservas que se están confirmando en ese momento (fila bloqueada)
+    se saltan (SKIP LOCKED): si la confirmación falla, las toma la
+    siguiente pasada.
+    """
+    with transaction.atomic():
+        ids = list(
+            Reserva.objects.select_for_update(skip_locked=True)
+            .filter(estado='activa', expira__lte=timezone.now()).order_by('expira')
+            .values_list('id', flat=True)[:lote]
+        )
+        if ids:
+            _liberar(ids)
+            Reserva.objects.filter(id__in=ids).update(estado='expirada')
+    return len(ids)
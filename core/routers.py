@@ -0,0 +1,104 @@
+# core/routers.py
+"""Enrutado de lecturas a una réplica de solo lectura.
+
+Con ``DATABASE_REPLICA`` configurado, las lecturas van a la réplica salvo:
+
+* peticiones que escriben (POST/PUT/PATCH/DELETE) o que ya escribieron:
+  se fijan a la primaria durante el resto de la petición;
+* lecturas dentro de una transacción de la primaria (``atomic``): leen lo
+  que la transacción va a escribir. ``select_for_update()`` ya pasa por
+  ``db_for_write``;
+* comandos y procesos fuera de una petición que llaman a ``fijar_primaria()``;
+* clientes que escribieron hace menos de ``REPLICA_FIJAR_SEGUNDOS``
+  (read-your-writes entre peticiones, ver ``core.middleware``);
+* réplica con retraso mayor que ``REPLICA_MAX_RETRASO`` segundos o caída.
+"""
+import logging
+import threading
+import time
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+_estado = Local()
+
+_retraso_lock = threading.Lock()
+_retraso_cache = {}  # alias -> (comprobado_en, retrasada)
+
+
+def reiniciar():
+    _estado.primaria = False
+    _estado.escribio = False
+
+
+def fijar_primaria():
+    _estado.primaria = True
+
+
+def escribio():
+    return getattr(_estado, 'escribio', False)
+
+
+def alias_replica():
+    alias = getattr(settings, 'DATABASE_REPLICA', None)
+    return alias if alias in settings.DATABASES else None
+
+
+def _medir_retraso(alias):
+    conexion = connections[alias]
+    if conexion.vendor != 'postgresql':
+        return 0.0
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+        )
+        return float(cursor.fetchone()[0])
+
+
+def replica_retrasada(alias):
+    """True si la réplica va atrasada o no responde. Se comprueba como mucho
+    cada ``REPLICA_CHEQUEO_SEGUNDOS`` por proceso."""
+    ahora = time.monotonic()
+    intervalo = getattr(settings, 'REPLICA_CHEQUEO_SEGUNDOS', 5)
+    comprobado_en, retrasada = _retraso_cache.get(alias, (None, False))
+    if comprobado_en is not None and ahora - comprobado_en < intervalo:
+        return retrasada
+
+    with _retraso_lock:
+        try:
+            retrasada = _medir_retraso(alias) > getattr(settings, 'REPLICA_MAX_RETRASO', 5)
+        except Exception as e:
+            logger.warning(f"Réplica {alias} no disponible, se usa la primaria: {str(e)}")
+            retrasada = True
+        _retraso_cache[alias] = (ahora, retrasada)
+    return retrasada
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = alias_replica()
+        if alias is None or getattr(_estado, 'primaria', False):
+            return DEFAULT_DB_ALIAS
+        # ✅ Dentro de una transacción se lee de la primaria aunque aún no haya escrito
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or replica_retrasada(alias):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # ✅ Tras escribir, el resto de la petición lee de la primaria
+        _estado.primaria = True
+        _estado.escribio = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Misma base de datos física
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == alias_replica():
+            return False
+        return None
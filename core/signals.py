@@ -1,8 +1,36 @@
 # core/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
 
+from .models import Almacen, ProductoEliminado, ProductosVendidos
+from .reportes import invalidar_reportes
+from .stock import saldo_inicial
+from .sync import siguiente_version
+
 User = get_user_model()
 
+
+@receiver(post_delete, sender=Almacen)
+def registrar_producto_eliminado(sender, instance, **kwargs):
+    # ✅ Lápida para que /api/almacen/sync/ propague la baja
+    ProductoEliminado.objects.create(
+        producto_id=instance.pk, tienda_id=instance.tienda_id, version=siguiente_version()
+    )
+
+
+@receiver(post_save, sender=Almacen)
+def registrar_saldo_inicial(sender, instance, created, raw=False, **kwargs):
+    # ✅ El stock de alta entra en el libro de movimientos ya aplicado (foto = suma)
+    if created and not raw:
+        saldo_inicial(instance)
+
+
+@receiver(post_save, sender=ProductosVendidos)
+@receiver(post_delete, sender=ProductosVendidos)
+def invalidar_reportes_venta(sender, instance, raw=False, **kwargs):
+    # ✅ Altas, cambios y bajas una a una (admin): las rutas de venta en bloque
+    # (bulk_create, sin señales) ya llaman a invalidar_reportes
+    if not raw:
+        invalidar_reportes(instance.tienda_id)
@@ -0,0 +1,281 @@
+# core/stock.py
+"""Libro de movimientos de stock (``MovimientoStock``).
+
+``Almacen.stock`` es una foto: la suma de los movimientos ya compactados.
+Las ventas, ajustes, importaciones y devoluciones solo insertan
+movimientos, así que los productos más vendidos dejan de ser una fila que
+todas las cajas actualizan a la vez. El stock real es la foto más los
+movimientos pendientes (``Almacen.objects.con_stock()``).
+
+``manage.py compactar_stock`` suma los pendientes a la foto en bloques y
+los marca como aplicados; ``manage.py verificar_stock`` comprueba que la
+foto coincide con la suma de lo aplicado.
+
+Para no vender más de lo que hay sin que las cajas de un producto muy
+vendido se esperen entre sí, el stock real se reparte en cupos
+(``CupoStock``, ``STOCK_PARTICIONES`` por producto) y cada caja vende del
+suyo: un UPDATE condicional (``cantidad >= pedido``) que solo bloquea esa
+fila hasta el commit. La suma de los cupos nunca supera el stock real, así
+que las ventas que caben en su cupo no pueden dejarlo negativo aunque no
+vean las de las demás cajas, aún sin confirmar. Solo cuando el cupo de la
+caja se agota se toma el camino lento: ``bloquear`` todos los cupos del
+producto (esperando a las ventas en curso), leer el stock real, comprobarlo
+y volver a ``repartir`` lo que queda. Todo lo que reduce el stock sin pasar
+por un cupo (recuentos, sincronización de cestas) hace lo mismo.
+
+La fila del producto no se bloquea ni se escribe en cada venta: sin
+versiones muertas ni WAL del producto caliente; eso lo hacen solo las
+compactaciones, por lotes.
+"""
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Almacen, CupoStock, LineaReserva, MovimientoStock
+from .sync import siguiente_version, siguientes_versiones
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, producto, disponible, solicitado):
+        super().__init__(f'Stock insuficiente para {producto.nombreproducto}')
+        self.producto = producto
+        self.disponible = disponible
+        self.solicitado = solicitado
+
+
+def stock_actual(ids):
+    """{producto_id: foto + pendientes} en una consulta."""
+    return dict(Almacen.objects.con_stock().filter(id__in=ids).values_list('id', 'stock_actual'))
+
+
+def particiones():
+    return getattr(settings, 'STOCK_PARTICIONES', 8)
+
+
+def particion_de(usuario):
+    """Cupo de la caja: uno por usuario; al azar si no hay usuario."""
+    if usuario is not None and usuario.pk:
+        return usuario.pk % particiones()
+    return random.randrange(particiones())
+
+
+def _bloquear_cupos(ids):
+    return list(
+        CupoStock.objects.select_for_update().filter(producto_id__in=ids)
+        .order_by('producto_id', 'particion').values_list('id', flat=True)
+    )
+
+
+def bloquear(ids):
+    """Congela el stock de los productos: bloquea todos sus cupos.
+
+    En orden (producto, partición), el mismo en que los toman las ventas:
+    sin interbloqueos. Espera a las ventas en curso de esos productos.
+    """
+    ids = sorted(ids)
+    if len(_bloquear_cupos(ids)) < particiones() * len(ids):
+        # Primera vez (o más particiones que antes): se crean vacíos, sin cambiar la suma
+        CupoStock.objects.bulk_create(
+            [CupoStock(producto_id=i, particion=k) for i in ids for k in range(particiones())],
+            ignore_conflicts=True,
+        )
+        _bloquear_cupos(ids)
+
+
+def repartir(restante):
+    """Reparte ``restante`` ({producto_id: stock real}) a partes iguales entre los cupos.
+
+    Con los cupos bloqueados (``bloquear``) y en la misma transacción que
+    los movimientos que dejan ese stock. Una sola sentencia.
+    """
+    if not restante:
+        return
+    n = particiones()
+    base = {i: max(total, 0) // n for i, total in restante.items()}
+    resto = {i: max(total, 0) % n for i, total in restante.items()}
+    CupoStock.objects.filter(producto_id__in=list(restante)).update(cantidad=Case(
+        *[When(producto_id=i, particion__lt=n, then=Value(base[i])) for i in restante],
+        default=Value(0), output_field=IntegerField(),
+    ) + Case(
+        *[When(producto_id=i, particion__lt=resto[i], then=Value(1)) for i in restante if resto[i]],
+        default=Value(0), output_field=IntegerField(),
+    ))
+
+
+def _descontar_bloqueando(producto, cantidad):
+    """Camino lento: el cupo de la caja no alcanza."""
+    bloquear([producto.id])
+    disponible = stock_actual([producto.id])[producto.id]
+    if disponible < cantidad:
+        raise StockInsuficiente(producto, disponible, cantidad)
+    repartir({producto.id: disponible - cantidad})
+
+
+def descontar(productos, pedido, tipo='venta', referencias=None, usuario=None):
+    """Inserta los movimientos de salida de ``pedido`` ({producto_id: cantidad}).
+
+    ``productos``: {producto_id: Almacen}. Debe llamarse dentro de una
+    transacción (si lanza ``StockInsuficiente`` hay que deshacerla, como
+    hace ``transaction.atomic``). Deja en cada producto tocado ``stock``
+    (real) y ``version`` actualizados para los eventos.
+    """
+    particion = particion_de(usuario)
+    # ✅ En orden de id, como bloquear(): sin interbloqueos con el camino lento
+    for producto_id in sorted(pedido):
+        cantidad = pedido[producto_id]
+        # ✅ Sin bloquear el producto: solo el cupo de esta caja, si alcanza
+        tomado = CupoStock.objects.filter(
+            producto_id=producto_id, particion=particion, cantidad__gte=cantidad,
+        ).update(cantidad=F('cantidad') - cantidad)
+        if not tomado:
+            _descontar_bloqueando(productos[producto_id], cantidad)
+
+    referencias = referencias or {}
+    movimientos = insertar([
+        MovimientoStock(
+            producto_id=producto_id, tienda_id=productos[producto_id].tienda_id, tipo=tipo,
+            cantidad=-cantidad, usuario=usuario, referencia=referencias.get(producto_id, ''),
+        )
+        for producto_id, cantidad in pedido.items()
+    ])
+    # Stock para los eventos: lo confirmado más lo propio (sin esperar a nadie)
+    disponible = stock_actual(list(pedido))
+    for movimiento in movimientos:
+        producto = productos[movimiento.producto_id]
+        producto.stock = disponible[producto.id]
+        producto.version = movimiento.version
+    return movimientos
+
+
+def insertar(movimientos):
+    """Asigna versiones e inserta los movimientos sin comprobar stock."""
+    for movimiento, version in zip(movimientos, siguientes_versiones(len(movimientos))):
+        movimiento.version = version
+    return MovimientoStock.objects.bulk_create(movimientos, batch_size=1000)
+
+
+def ajustar(producto, stock=None, cantidad=None, tipo='ajuste', usuario=None, referencia=''):
+    """Registra un ajuste: ``stock`` absoluto (recuento) o ``cantidad`` relativa.
+
+    El absoluto se guarda como la diferencia con el stock real, con los
+    cupos bloqueados para que ninguna venta se cuele entre la lectura y el
+    movimiento (después se reparte el stock nuevo entre ellos). El recuento incluye lo que está en carritos: las reservas
+    activas ya están descontadas del stock real y vuelven a él al caducar,
+    así que se restan del recuento. Devuelve el movimiento (None si no había
+    nada que cambiar). Lanza ``ValueError`` si el stock quedaría negativo.
+    """
+    with transaction.atomic():
+        bloquear([producto.id])
+        if stock is None:
+            actual = stock_actual([producto.id])[producto.id]
+        else:
+            # ✅ Stock real y reservado en la misma consulta (misma instantánea):
+            # una reserva que caduca o se confirma a la vez no se cuenta a medias
+            actual, reservado = Almacen.objects.con_stock().filter(pk=producto.id).annotate(
+                reservado=Coalesce(Subquery(
+                    LineaReserva.objects.filter(producto=OuterRef('pk'), reserva__estado='activa')
+                    .order_by().values('producto').annotate(s=Sum('cantidad')).values('s')
+                ), 0),
+            ).values_list('stock_actual', 'reservado').get()
+            if stock < reservado:
+                raise ValueError(f'El recuento no puede ser menor que lo reservado en carritos ({reservado})')
+            cantidad = stock - reservado - actual
+        if actual + cantidad < 0:
+            raise ValueError(f'El stock no puede quedar negativo (disponible: {actual})')
+        producto.stock = actual + cantidad
+        if not cantidad:
+            return None
+        repartir({producto.id: producto.stock})
+        producto.version = siguiente_version()
+        return MovimientoStock.objects.create(
+            producto=producto, tienda_id=producto.tienda_id, tipo=tipo, cantidad=cantidad,
+            version=producto.version, usuario=usuario, referencia=referencia,
+        )
+
+
+def saldo_inicial(producto):
+    """Movimiento ya aplicado con el stock con el que se crea un producto."""
+    if producto.stock:
+        MovimientoStock.objects.create(
+            producto=producto, tienda_id=producto.tienda_id, tipo='importacion',
+            cantidad=producto.stock, version=producto.version, aplicado=True, referencia='alta',
+        )
+
+
+def compactar(lote=5000):
+    """Suma a la foto hasta ``lote`` movimientos pendientes. Devuelve cuántos.
+
+    Varios compactadores pueden correr a la vez: cada uno toma movimientos
+    distintos (SKIP LOCKED). La foto y la marca ``aplicado`` cambian en la
+    misma transacción, así que el stock real nunca cuenta un movimiento dos
+    veces ni lo pierde.
+    """
+    with transaction.atomic():
+        pendientes = list(
+            MovimientoStock.objects.select_for_update(skip_locked=True)
+            .filter(aplicado=False).order_by('id')
+            .values_list('id', 'producto_id', 'cantidad', 'version', 'fecha')[:lote]
+        )
+        if not pendientes:
+            return 0
+
+        suma, version, fecha = defaultdict(int), {}, {}
+        for _, producto_id, cantidad, v, f in pendientes:
+            suma[producto_id] += cantidad
+            version[producto_id] = max(version.get(producto_id, v), v)
+            fecha[producto_id] = max(fecha.get(producto_id, f), f)
+
+        ids = sorted(suma)
+        # No cambia el stock real: basta con las filas de los productos, sin los cupos
+        list(Almacen.objects.select_for_update().filter(id__in=ids).order_by('id').values_list('id', flat=True))
+        # ✅ Una sola sentencia para todo el bloque (UPDATE ... CASE)
+        Almacen.objects.filter(id__in=ids).update(
+            stock=F('stock') + Case(
+                *[When(id=i, then=Value(suma[i])) for i in ids], output_field=IntegerField(),
+            ),
+            version=Greatest('version', Case(*[When(id=i, then=Value(version[i])) for i in ids])),
+            fechaactualizacion=Greatest(
+                'fechaactualizacion', Case(*[When(id=i, then=Value(fecha[i])) for i in ids]),
+            ),
+        )
+        MovimientoStock.objects.filter(id__in=[p[0] for p in pendientes]).update(aplicado=True)
+    return len(pendientes)
+
+
+def verificar(limite=20):
+    """Estado del libro: descuadres entre foto y movimientos aplicados, negativos y pendientes."""
+    aplicados = (
+        MovimientoStock.objects.filter(producto=OuterRef('pk'), aplicado=True)
+        .order_by().values('producto').annotate(s=Sum('cantidad')).values('s')
+    )
+    descuadres = list(
+        Almacen.objects.annotate(aplicado=Coalesce(Subquery(aplicados), 0))
+        .exclude(stock=F('aplicado')).order_by('id')
+        .values('id', 'nombreproducto', 'stock', 'aplicado')[:limite]
+    )
+    negativos = list(
+        Almacen.objects.con_stock().filter(stock_actual__lt=0).order_by('id')
+        .values('id', 'nombreproducto', 'stock_actual')[:limite]
+    )
+    # Cupos que suman más que el stock real: una venta podría dejarlo negativo
+    cupos = list(
+        Almacen.objects.con_stock().annotate(en_cupos=Subquery(
+            CupoStock.objects.filter(producto=OuterRef('pk')).order_by()
+            .values('producto').annotate(s=Sum('cantidad')).values('s')
+        )).filter(en_cupos__gt=F('stock_actual')).order_by('id')
+        .values('id', 'nombreproducto', 'stock_actual', 'en_cupos')[:limite]
+    )
+    pendientes = MovimientoStock.objects.filter(aplicado=False).order_by('id')
+    primero = pendientes.values_list('fecha', flat=True).first()
+    return {
+        'descuadres': descuadres,
+        'negativos': negativos,
+        'cupos': cupos,
+        'pendientes': pendientes.count(),
+        'pendiente_mas_antiguo': (timezone.now() - primero).total_seconds() if primero else None,
+    }
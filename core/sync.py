@@ -0,0 +1,132 @@
+# core/sync.py
+"""Versiones del catálogo para la sincronización incremental (?since=).
+
+Cada alta, modificación o baja de un producto (y cada movimiento de
+stock) toma un número de una secuencia monótona global. Los clientes guardan la última versión recibida
+y piden solo lo que cambió después.
+
+Las versiones se reparten antes del commit, así que pueden confirmarse
+desordenadas: la 11 puede ser visible mientras la 10 sigue en vuelo. La
+sincronización solo entrega hasta ``version_confirmada()``, por debajo de
+la escritura en vuelo más antigua; si no, un cliente que ya recibió la 11
+no vería nunca la 10.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+SECUENCIA = 'core_catalogo_version_seq'
+
+_lock = threading.Lock()
+_ultima_local = 0
+
+
+def _identificar(cursor):
+    """Asigna ya el id de transacción (xid), antes de tomar la versión.
+
+    Así toda transacción con una versión ya repartida figura con su xid en
+    ``pg_stat_activity`` hasta que termina, y ``version_confirmada`` puede
+    esperarla. Fuera de una transacción no hay nada que fijar.
+    """
+    if connection.in_atomic_block:
+        cursor.execute("SELECT pg_current_xact_id()")
+
+
+def siguiente_version():
+    """Siguiente versión del catálogo.
+
+    En PostgreSQL usa una secuencia (no bloquea ni participa en la
+    transacción). En otros motores, solo pensados para desarrollo, se usa
+    un reloj en microsegundos estrictamente creciente dentro del proceso.
+
+    Debe llamarse dentro de la transacción que escribe la versión (ver
+    ``_identificar``).
+    """
+    global _ultima_local
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            _identificar(cursor)
+            cursor.execute("SELECT nextval(%s)", [SECUENCIA])
+            return cursor.fetchone()[0]
+
+    with _lock:
+        _ultima_local = max(_ultima_local + 1, time.time_ns() // 1000)
+        return _ultima_local
+
+
+def siguientes_versiones(n):
+    """``n`` versiones nuevas en una sola consulta (actualizaciones en bloque)."""
+    global _ultima_local
+    if n <= 0:
+        return []
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            _identificar(cursor)
+            cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [SECUENCIA, n])
+            return sorted(fila[0] for fila in cursor.fetchall())
+
+    with _lock:
+        inicio = max(_ultima_local + 1, time.time_ns() // 1000)
+        _ultima_local = inicio + n - 1
+        return list(range(inicio, inicio + n))
+
+
+def version_confirmada(espera=None):
+    """Versión hasta la que no queda ninguna escritura en vuelo, o None.
+
+    En PostgreSQL lee el último valor de la secuencia y después las
+    transacciones con xid abiertas en ese momento (``pg_stat_activity``):
+    las que tomaron esas versiones tienen xid desde antes (``_identificar``)
+    y están entre ellas, así que basta esperar a que terminen. No asigna
+    xid a la lectura. Las escrituras son cortas y la espera suele ser nula;
+    si una transacción larga la alarga más de ``espera`` segundos
+    (``SYNC_ESPERA_MAX``) devuelve None y el cliente repite más tarde. Debe
+    consultarse en la primaria.
+
+    En otros motores (desarrollo) devuelve ``version_actual()``.
+    """
+    if connection.vendor != 'postgresql':
+        return version_actual()
+    if espera is None:
+        espera = getattr(settings, 'SYNC_ESPERA_MAX', 2.0)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {SECUENCIA}")
+        tope = cursor.fetchone()[0]
+        # ✅ pg_snapshot_xmin no basta: una transacción con xid posterior al último
+        # confirmado puede seguir abierta sin aparecer en la instantánea
+        cursor.execute(
+            "SELECT pid, backend_xid::text FROM pg_stat_activity "
+            "WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid()"
+        )
+        abiertas = set(cursor.fetchall())
+        limite = time.monotonic() + espera
+        while abiertas:
+            if time.monotonic() >= limite:
+                return None
+            time.sleep(0.01)
+            # pg_stat_activity se congela dentro de una transacción: se relee
+            cursor.execute("SELECT pg_stat_clear_snapshot()")
+            cursor.execute(
+                "SELECT pid, backend_xid::text FROM pg_stat_activity WHERE pid = ANY(%s)",
+                [[pid for pid, _ in abiertas]],
+            )
+            abiertas &= set(cursor.fetchall())
+        return tope
+
+
+def version_actual():
+    """Versión más alta ya escrita (productos, movimientos de stock o lápidas).
+
+    Puede adelantarse a una versión menor aún sin confirmar: para el tope
+    de la sincronización se usa ``version_confirmada()``.
+    """
+    from django.db.models import Max
+    from .models import Almacen, MovimientoStock, ProductoEliminado
+
+    productos = Almacen.objects.aggregate(v=Max('version'))['v'] or 0
+    movimientos = MovimientoStock.objects.aggregate(v=Max('version'))['v'] or 0
+    eliminados = ProductoEliminado.objects.aggregate(v=Max('version'))['v'] or 0
+    return max(productos, movimientos, eliminados)
@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.admin import FechasPorRango
+from core.models import Almacen, ProductosVendidos, Tienda, User
+
+
+class AdminVentasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tienda = Tienda.objects.create(nombre='Centro')
+        Almacen.objects.create(
+            tienda=self.tienda, nombreproducto='Pan', tipoproducto='t', categoria='panadería', precio=1, stock=1,
+        )
+        for fecha in (date(2023, 11, 30), date(2024, 2, 3)):
+            ProductosVendidos.objects.create(
+                tienda=self.tienda, nombreproducto='Pan', tipoproducto='t', categoria='panadería',
+                precio_unitario=1, cantidad=1, fechaventa=fecha,
+            )
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+
+    def ventas(self):
+        return FechasPorRango(ProductosVendidos, ProductosVendidos.objects.all().query.chain())
+
+    def test_dates_desde_min_max(self):
+        self.assertEqual(self.ventas().dates('fechaventa', 'year'), [date(2023, 1, 1), date(2024, 1, 1)])
+        self.assertEqual(
+            self.ventas().dates('fechaventa', 'month'),
+            [date(2023, 11, 1), date(2023, 12, 1), date(2024, 1, 1), date(2024, 2, 1)],
+        )
+        self.assertEqual(self.ventas().filter(fechaventa__year=2022).dates('fechaventa', 'day'), [])
+
+    def test_listado_con_jerarquia_y_filtro_de_categoria(self):
+        r = self.client.get('/admin/core/productosvendidos/')
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, 'fechaventa__year=2024')
+        self.assertContains(r, 'categoria=panader')
+
+        r = self.client.get('/admin/core/productosvendidos/', {'fechaventa__year': 2023})
+        self.assertContains(r, 'fechaventa__month=11')
@@ -0,0 +1,79 @@
+import shutil
+import tempfile
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core import analitica
+from core.models import ProductosVendidos, Tienda
+from core.reportes import ranking
+
+
+class ArchivoRankingTests(TestCase):
+    """El ranking desde el archivo columnar es el mismo que desde la base de datos."""
+
+    def setUp(self):
+        cache.clear()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        ajuste = override_settings(ARCHIVO_VENTAS_DIR=directorio)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        self.centro, self.norte = Tienda.objects.create(nombre='Centro'), Tienda.objects.create(nombre='Norte')
+        ventas = [
+            (self.centro, 'Pan', 'panadería', '1.20', 30, date(2024, 2, 1)),
+            (self.centro, 'Bollo', 'panadería', '0.85', 12, date(2024, 2, 14)),
+            (self.centro, 'Leche', 'lácteos', '0.99', 40, date(2024, 2, 29)),
+            (self.centro, 'Queso', 'lácteos', '7.50', 3, date(2024, 3, 2)),
+            (self.norte, 'Pan', 'panadería', '1.20', 5, date(2024, 2, 10)),
+            (self.norte, 'Yogur', 'lácteos', '0.45', 60, date(2024, 2, 20)),
+        ]
+        for tienda, nombre, categoria, precio, cantidad, fecha in ventas:
+            ProductosVendidos.objects.create(
+                tienda=tienda, nombreproducto=nombre, tipoproducto='t', categoria=categoria,
+                precio_unitario=precio, cantidad=cantidad, fechaventa=fecha,
+            )
+
+    def calcular(self, categoria=None):
+        cache.clear()
+        return [
+            ranking(tienda, date(2024, 2, 1), date(2024, 4, 1), categoria=categoria, por_categoria=por_categoria, n=3)
+            for tienda in (None, self.centro.id)
+            for por_categoria in (True, False)
+        ]
+
+    def archivar(self):
+        salida = StringIO()
+        call_command('archivar_ventas', desde='2024-02', hasta='2024-02', stdout=salida)
+        return salida.getvalue()
+
+    def test_mismo_ranking_desde_archivo_y_desde_bd(self):
+        desde_bd = self.calcular() + self.calcular(categoria='lácteos')
+        self.archivar()
+
+        with mock.patch.object(analitica, 'totales_por_articulo', wraps=analitica.totales_por_articulo) as archivo:
+            desde_archivo = self.calcular() + self.calcular(categoria='lácteos')
+        self.assertTrue(archivo.called)
+        self.assertEqual(desde_archivo, desde_bd)
+
+    def test_mes_cambiado_se_lee_de_la_bd(self):
+        self.archivar()
+        # Cambio sin señales (UPDATE directo): mismas filas y misma máxima id
+        ProductosVendidos.objects.filter(nombreproducto='Yogur').update(cantidad=6)
+        desde_bd = self.calcular()
+
+        with mock.patch.object(analitica, 'totales_por_articulo') as archivo:
+            self.assertEqual(self.calcular(), desde_bd)
+        self.assertFalse(archivo.called)
+        self.assertEqual(
+            [f['unidades'] for f in ranking(self.norte.id, date(2024, 2, 1), date(2024, 3, 1), por_categoria=False)],
+            [5, 6],
+        )
+
+        self.assertIn('cambió desde la exportación', self.archivar())
+        self.assertIn('al día', self.archivar())
@@ -0,0 +1,50 @@
+import json
+import tempfile
+import uuid
+from pathlib import Path
+
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from core import stock
+from core.models import Almacen, ProductosVendidos, Tienda
+from core.ventas import recuperar_diarios, registrar_venta
+
+
+class DiarioVentasTests(TestCase):
+    def setUp(self):
+        self.tienda = Tienda.objects.create(nombre='Centro')
+        self.producto = Almacen.objects.create(
+            tienda=self.tienda, nombreproducto='Pan', tipoproducto='t', categoria='c', precio=2, stock=10,
+        )
+
+    def _registro(self):
+        clave = str(uuid.uuid4())
+        return {
+            'uuid': clave, 'referencia': clave, 'tienda_id': self.tienda.id, 'producto_id': self.producto.id,
+            'nombreproducto': 'Pan', 'tipoproducto': 't', 'categoria': 'c', 'precio_unitario': '2.00',
+            'cantidad': 1, 'fechaventa': timezone.localdate().isoformat(),
+        }
+
+    def test_recuperacion_descarta_ventas_sin_confirmar(self):
+        confirmada, perdida = self._registro(), self._registro()
+        # Solo la primera llegó al commit: su movimiento de stock existe
+        stock.descontar(
+            {self.producto.id: self.producto}, {self.producto.id: 1}, referencias={self.producto.id: confirmada['uuid']},
+        )
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = Path(directorio) / 'ventas-1-1.jsonl'
+            ruta.write_text(''.join(json.dumps(r) + '\n' for r in (confirmada, perdida)))
+
+            self.assertEqual(recuperar_diarios(directorio), 1)
+            self.assertFalse(ruta.exists())
+        self.assertEqual(
+            list(ProductosVendidos.objects.values_list('uuid', flat=True)), [uuid.UUID(confirmada['uuid'])],
+        )
+
+    def test_modo_diario_exige_transaccion_exterior(self):
+        items = [{'producto_id': self.producto.id, 'cantidad': 1}]
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                registrar_venta(Almacen.objects.all(), items, modo='diario')
@@ -0,0 +1,80 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from rest_framework.authtoken.models import Token
+
+from core import eventos
+from core.eventos import BrokerEnMemoria, formato_sse
+from core.models import Tienda, User
+
+
+class BrokerEnMemoriaTests(SimpleTestCase):
+    async def test_cada_suscriptor_recibe_cada_evento(self):
+        broker = BrokerEnMemoria()
+        a, b = broker.suscribir(), broker.suscribir()
+        broker.publicar({'tipo': 'productos', 'tienda': 1})
+        self.assertEqual(await a.recibir(1), {'tipo': 'productos', 'tienda': 1})
+        self.assertEqual(await b.recibir(1), {'tipo': 'productos', 'tienda': 1})
+
+    async def test_cliente_lento_pierde_los_mas_antiguos(self):
+        broker = BrokerEnMemoria(max_pendientes=2)
+        suscripcion = broker.suscribir()
+        for i in range(3):
+            broker.publicar({'n': i})
+        await asyncio.sleep(0)
+        self.assertEqual([(await suscripcion.recibir(1))['n'] for _ in range(2)], [1, 2])
+        self.assertIsNone(await suscripcion.recibir(0.01))
+
+    async def test_cerrar_deja_de_recibir(self):
+        broker = BrokerEnMemoria()
+        suscripcion = broker.suscribir()
+        suscripcion.cerrar()
+        broker.publicar({'n': 1})
+        self.assertIsNone(await suscripcion.recibir(0.01))
+        self.assertFalse(broker._suscripciones)
+
+
+class StreamEventosTests(TestCase):
+    def setUp(self):
+        self.centro, self.norte = Tienda.objects.create(nombre='Centro'), Tienda.objects.create(nombre='Norte')
+        usuario = User.objects.create_user('ana', password='x', tienda=self.centro)
+        self.token = Token.objects.create(user=usuario).key
+        self.broker = BrokerEnMemoria()
+        parche = mock.patch.object(eventos, '_broker', self.broker)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    async def test_solo_eventos_de_su_tienda_y_limpieza_al_desconectar(self):
+        response = await self.async_client.get('/api/eventos/', {'token': self.token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        recibidos = asyncio.Queue()
+
+        async def cliente():
+            async for trozo in response.streaming_content:
+                await recibidos.put(trozo.decode())
+
+        tarea = asyncio.create_task(cliente())
+        self.assertEqual(await asyncio.wait_for(recibidos.get(), 1), 'retry: 3000\n\n')
+
+        self.broker.publicar({'tipo': 'productos', 'tienda': self.norte.id, 'productos': [{'id': 1, 'version': 7}]})
+        propio = {'tipo': 'productos', 'tienda': self.centro.id, 'productos': [{'id': 2, 'version': 8}]}
+        self.broker.publicar(propio)
+        trozo = await asyncio.wait_for(recibidos.get(), 1)
+        self.assertEqual(trozo, formato_sse(propio))
+        self.assertIn('id: 8', trozo)
+        self.assertEqual(json.loads(trozo.split('data: ')[1])['tienda'], self.centro.id)
+        self.assertTrue(recibidos.empty())
+
+        # Desconexión: el servidor ASGI cancela la tarea que recorre la respuesta
+        tarea.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await tarea
+        self.assertFalse(self.broker._suscripciones)
+
+    async def test_token_invalido(self):
+        response = await self.async_client.get('/api/eventos/', {'token': 'nope'})
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(self.broker._suscripciones)
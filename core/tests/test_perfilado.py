@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from core.middleware import PerfiladoMiddleware
+from core.models import Tienda, User
+from core.perfilado import obtener, ruta_segura
+
+
+class RutaSeguraTests(SimpleTestCase):
+    def test_oculta_el_token_del_stream(self):
+        request = RequestFactory().get('/api/eventos/', {'token': 'secreto', 'tienda': 1})
+        self.assertEqual(ruta_segura(request), '/api/eventos/?token=***&tienda=1')
+
+    def test_sin_consulta(self):
+        self.assertEqual(ruta_segura(RequestFactory().get('/api/almacen/')), '/api/almacen/')
+
+
+@override_settings(PERFILADO_ACTIVO=True, PERFILADO_MUESTREO=0.0)
+class PerfiladoMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def perfil(self, url='/api/almacen/', **extra):
+        return self.client.get(url, **extra).headers.get('X-Perfil-Id')
+
+    def test_desactivado_no_se_monta(self):
+        with override_settings(PERFILADO_ACTIVO=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                PerfiladoMiddleware(lambda request: None)
+
+    @override_settings(PERFILADO_MUESTREO=0.25)
+    def test_muestreo_por_debajo_del_umbral(self):
+        with mock.patch('core.middleware.random.random', return_value=0.2):
+            perfil_id = self.perfil()
+        self.assertEqual(obtener(perfil_id)['motivo'], 'muestreo')
+        with mock.patch('core.middleware.random.random', return_value=0.3):
+            self.assertIsNone(self.perfil())
+
+    def test_cabecera_solo_para_admin_global(self):
+        tienda = Tienda.objects.create(nombre='Centro')
+        local = Token.objects.create(user=User.objects.create_user('local', password='x', rol='admin', tienda=tienda))
+        glob = Token.objects.create(user=User.objects.create_user('global', password='x', rol='admin'))
+
+        self.assertIsNone(self.perfil(HTTP_X_PERFILAR='1', HTTP_AUTHORIZATION=f'Token {local.key}'))
+        perfil_id = self.perfil(HTTP_X_PERFILAR='1', HTTP_AUTHORIZATION=f'Token {glob.key}')
+        perfil = obtener(perfil_id)
+        self.assertEqual((perfil['motivo'], perfil['status']), ('cabecera', 200))
+        self.assertGreater(perfil['consultas'], 0)
+
+    @override_settings(PERFILADO_MUESTREO=1.0)
+    def test_no_guarda_tokens_de_la_url(self):
+        perfil_id = self.perfil('/api/password-reset/MQ/abc-123/?token=secreto&limit=5')
+        self.assertEqual(obtener(perfil_id)['ruta'], '/api/password-reset/***/***/?token=***&limit=5')
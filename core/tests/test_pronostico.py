@@ -0,0 +1,87 @@
+import math
+from datetime import date, timedelta
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from core import stock
+from core.models import Almacen, SugerenciaReposicion, Tienda, User
+from core.pronostico import Z_SERVICIO, calcular_sugerencias, pronosticar
+
+
+class PronosticarTests(SimpleTestCase):
+    """Serie de dos semanas calculada a mano (desde un lunes, ventana y horizonte de 7 días)."""
+
+    desde = date(2024, 1, 1)  # lunes
+    hoy = date(2024, 1, 15)
+
+    def calcular(self, ids, stock, ventas):
+        venta_ids, dias, cantidades = (np.array(c) for c in zip(*ventas)) if ventas else (np.zeros(0, np.int64),) * 3
+        return pronosticar(
+            np.array(ids, dtype=np.int64), np.array(stock, dtype=np.float64),
+            venta_ids.astype(np.int64), dias.astype(np.int64), cantidades.astype(np.float64),
+            self.desde, self.hoy, ventana=7, horizonte=7, plazo_entrega=1,
+        )
+
+    def test_serie_a_mano(self):
+        ventas = [(1, dia, 2) for dia in range(14)]  # 2 al día, todos los días
+        ventas.append((3, 13, 7))                     # producto nuevo: una sola venta, el domingo
+        ventas.append((9, 5, 100))                    # ya no está en el catálogo: se ignora
+        demanda, cobertura, sugerido = self.calcular([1, 2, 3], [10, 4, 0], ventas)
+
+        # 1: media 2, sin dispersión ni estacionalidad -> 10 / 2 = 5 días; 2 * (1 + 7) - 10 = 6
+        # 2: sin ventas -> sin demanda, cobertura indefinida y nada que pedir
+        # 3: media 1 (7 / 7 días); todo el peso en domingo, que sale una vez en el horizonte;
+        #    desviación sqrt(49 / 7 - 1) = sqrt(6) -> 1 * 8 + 1.65 * sqrt(6) = 12.04 -> 13
+        self.assertEqual(demanda.tolist(), [2.0, 0.0, 1.0])
+        self.assertEqual(cobertura[0], 5.0)
+        self.assertTrue(math.isnan(cobertura[1]))
+        self.assertEqual(cobertura[2], 0.0)
+        self.assertEqual(sugerido.tolist(), [6, 0, math.ceil(8 + Z_SERVICIO * math.sqrt(6))])
+        self.assertEqual(sugerido[2], 13)
+
+    def test_historia_mas_corta_que_la_ventana(self):
+        # Solo 3 días de historia con ventana de 7: los días sin datos cuentan como 0
+        self.desde = self.hoy - timedelta(days=3)
+        demanda, cobertura, sugerido = self.calcular([1], [0], [(1, d, 7) for d in range(3)])
+        self.assertAlmostEqual(demanda[0], 3.0)  # 21 unidades / 7 días
+        self.assertEqual(sugerido.tolist(), [math.ceil(3.0 * 8 + Z_SERVICIO * math.sqrt(49 * 3 / 7 - 9))])
+
+    def test_sin_ventas_ni_catalogo(self):
+        demanda, cobertura, sugerido = self.calcular([], [], [])
+        self.assertEqual((len(demanda), len(cobertura), len(sugerido)), (0, 0, 0))
+
+
+class CalcularReposicionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tienda = Tienda.objects.create(nombre='Centro')
+        self.producto = Almacen.objects.create(
+            tienda=self.tienda, nombreproducto='Pan', tipoproducto='t', categoria='c', precio=1, stock=10,
+        )
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(User.objects.create_user('ana', password='x', rol='admin', tienda=self.tienda))
+
+    def calcular(self):
+        r = self.cliente.post('/api/reposicion/calcular/')
+        self.assertEqual(r.status_code, 200)
+        return r.data
+
+    def test_guarda_una_sugerencia_por_producto(self):
+        self.assertEqual(calcular_sugerencias(tienda_id=self.tienda.id), 1)
+        self.assertEqual(SugerenciaReposicion.objects.get().stock, 10)
+
+    def test_no_recalcula_sin_cambios(self):
+        with mock.patch('core.pronostico.calcular_sugerencias', wraps=calcular_sugerencias) as calcular:
+            self.assertTrue(self.calcular()['recalculado'])
+            self.assertFalse(self.calcular()['recalculado'])
+            self.assertEqual(calcular.call_count, 1)
+
+            # Un movimiento de stock (o una venta) cambia la clave
+            stock.ajustar(self.producto, cantidad=5)
+            self.assertTrue(self.calcular()['recalculado'])
+            self.assertEqual(calcular.call_count, 2)
+        self.assertEqual(SugerenciaReposicion.objects.get().stock, 15)
@@ -0,0 +1,41 @@
+import re
+
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import User
+
+
+class RecuperacionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.usuario = User.objects.create_user('ana', email='ana@example.com', password='antigua')
+
+    def enlace(self):
+        r = self.cliente.post('/api/password-reset/', {'email': 'ana@example.com'}, format='json')
+        self.assertEqual(r.status_code, 200)
+        uid, token = re.search(r'uidb64=(\S+)&token=(\S+)', mail.outbox[-1].body).groups()
+        return f'/api/password-reset/{uid}/{token}/'
+
+    def test_enlace_del_email_cambia_la_contraseña(self):
+        url = self.enlace()
+        self.assertEqual(self.cliente.get(url).status_code, 200)
+        r = self.cliente.post(url, {'password': 'nueva123'}, format='json')
+        self.assertEqual(r.status_code, 200)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.check_password('nueva123'))
+
+    def test_enlace_usado_deja_de_valer(self):
+        url = self.enlace()
+        self.cliente.post(url, {'password': 'nueva123'}, format='json')
+        r = self.cliente.post(url, {'password': 'otra456'}, format='json')
+        self.assertEqual(r.status_code, 400)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.check_password('nueva123'))
+
+    def test_token_inventado(self):
+        url = self.enlace().rsplit('/', 2)[0] + '/abc-123/'
+        self.assertEqual(self.cliente.get(url).status_code, 400)
@@ -0,0 +1,77 @@
+from datetime import date
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from core.models import ProductosVendidos, Tienda, User
+from core.reportes import rango_periodo
+
+
+class RangoPeriodoTests(SimpleTestCase):
+    def test_hasta_ultimo_dia_representable(self):
+        self.assertEqual(rango_periodo({'hasta': '9999-12-31'}), (date.min, date.max))
+
+    def test_periodo_diciembre(self):
+        self.assertEqual(rango_periodo({'periodo': '2025-12'}), (date(2025, 12, 1), date(2026, 1, 1)))
+        self.assertEqual(rango_periodo({'periodo': '9999-12'}), (date(9999, 12, 1), date.max))
+
+
+class RankingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(User.objects.create_user('ana', password='x', rol='admin'))
+
+    def test_fecha_limite_no_da_500(self):
+        r = self.cliente.get('/api/ventas/ranking/', {'desde': '2025-01-01', 'hasta': '9999-12-31'})
+        self.assertEqual(r.status_code, 200)
+
+    def test_categoria_con_espacios_y_larga(self):
+        r = self.cliente.get('/api/ventas/ranking/', {'categoria': 'ropa de niño ' * 40})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data, [])
+
+
+class RankingInvalidacionTests(TestCase):
+    """Una venta dada de alta, cambiada o borrada fuera de la API (admin) invalida el ranking."""
+
+    def setUp(self):
+        cache.clear()
+        self.tienda = Tienda.objects.create(nombre='Centro')
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(User.objects.create_user('ana', password='x', rol='admin', tienda=self.tienda))
+
+    def vender(self, cantidad=3):
+        return ProductosVendidos.objects.create(
+            tienda=self.tienda, nombreproducto='Pan', tipoproducto='t', categoria='c',
+            precio_unitario=2, cantidad=cantidad, fechaventa=date(2024, 2, 3),
+        )
+
+    def ingresos(self):
+        r = self.cliente.get('/api/ventas/ranking/', {'periodo': '2024-02', 'global': 1})
+        self.assertEqual(r.status_code, 200)
+        return [(f['nombreproducto'], f['ingresos']) for f in r.data]
+
+    def test_cache_compartida_por_generacion(self):
+        with mock.patch('core.reportes.cache_compartida', return_value=True):
+            self.assertEqual(self.ingresos(), [])
+            with self.captureOnCommitCallbacks(execute=True):
+                venta = self.vender()
+            self.assertEqual(self.ingresos(), [('Pan', 6.0)])
+            venta.cantidad = 5
+            with self.captureOnCommitCallbacks(execute=True):
+                venta.save()
+            self.assertEqual(self.ingresos(), [('Pan', 10.0)])
+            with self.captureOnCommitCallbacks(execute=True):
+                venta.delete()
+            self.assertEqual(self.ingresos(), [])
+
+    def test_cache_por_proceso_lee_la_version_de_la_base_de_datos(self):
+        # Sin ejecutar on_commit el contador no se mueve (como en otro proceso): la clave sale de la BD
+        self.assertEqual(self.ingresos(), [])
+        self.vender()
+        self.assertEqual(self.ingresos(), [('Pan', 6.0)])
+        ProductosVendidos.objects.all().delete()
+        self.assertEqual(self.ingresos(), [])
@@ -0,0 +1,94 @@
+import threading
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from core import reservas, stock
+from core.models import Almacen, Reserva, Tienda, User
+from core.ventas import VentaRechazada
+
+
+class ReservasTests(TestCase):
+    def setUp(self):
+        self.tienda = Tienda.objects.create(nombre='Centro')
+        self.usuario = User.objects.create_user('ana', password='x', tienda=self.tienda)
+        self.producto = Almacen.objects.create(
+            tienda=self.tienda, nombreproducto='Pan', tipoproducto='t', categoria='c', precio=1, stock=10,
+        )
+
+    def reservar(self, cantidad):
+        return reservas.reservar(
+            Almacen.objects.all(), [{'producto_id': self.producto.id, 'cantidad': cantidad}], self.usuario,
+        )
+
+    def real(self):
+        return Almacen.objects.con_stock().get(pk=self.producto.pk).stock_actual
+
+    def caducar(self):
+        Reserva.objects.update(expira=timezone.now() - timedelta(seconds=1))
+        return reservas.expirar()
+
+    def test_recuento_descuenta_lo_reservado(self):
+        self.reservar(3)
+        # Recuento físico: las 3 unidades del carrito siguen en la tienda
+        stock.ajustar(self.producto, stock=10)
+        self.assertEqual(self.real(), 7)
+
+        self.assertEqual(self.caducar(), 1)
+        self.assertEqual(self.real(), 10)
+
+    def test_recuento_menor_que_lo_reservado(self):
+        self.reservar(3)
+        with self.assertRaises(ValueError):
+            stock.ajustar(self.producto, stock=2)
+
+    def test_reservar_cancelar_y_expirar_publican_el_stock(self):
+        with mock.patch('core.reservas.publicar_cambios_producto') as publicar:
+            reserva = self.reservar(4)
+            self.assertEqual([p.stock for p in publicar.call_args.args[0]], [6])
+
+            reservas.cancelar(reserva.id, self.usuario)
+            self.assertEqual([p.stock for p in publicar.call_args.args[0]], [10])
+
+            self.reservar(2)
+            self.caducar()
+            self.assertEqual([p.stock for p in publicar.call_args.args[0]], [10])
+        self.assertEqual(publicar.call_count, 4)
+
+    def test_sin_stock_no_reserva(self):
+        with self.assertRaises(VentaRechazada):
+            self.reservar(11)
+        self.assertFalse(Reserva.objects.exists())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'bloqueos de fila de PostgreSQL')
+class ReservasConcurrentesTests(TransactionTestCase):
+    def test_reservas_simultaneas_no_superan_el_stock(self):
+        tienda = Tienda.objects.create(nombre='Centro')
+        usuario = User.objects.create_user('ana', password='x', tienda=tienda)
+        producto = Almacen.objects.create(
+            tienda=tienda, nombreproducto='Pan', tipoproducto='t', categoria='c', precio=1, stock=5,
+        )
+        barrera, hechas = threading.Barrier(10), []
+
+        def carrito():
+            try:
+                barrera.wait()
+                reservas.reservar(Almacen.objects.all(), [{'producto_id': producto.id, 'cantidad': 1}], usuario)
+                hechas.append(1)
+            except VentaRechazada:
+                pass
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=carrito) for _ in range(10)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(len(hechas), 5)
+        self.assertEqual(Almacen.objects.con_stock().get(pk=producto.pk).stock_actual, 0)
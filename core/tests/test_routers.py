@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase
+
+from core import routers
+from core.middleware import ReplicaMiddleware
+from core.models import Almacen
+
+
+@mock.patch('core.routers.replica_retrasada', return_value=False)
+@mock.patch('core.routers.alias_replica', return_value='replica')
+class ReplicaRouterTests(TransactionTestCase):
+    def setUp(self):
+        routers.reiniciar()
+        self.router = routers.ReplicaRouter()
+
+    def tearDown(self):
+        routers.reiniciar()
+
+    def test_lectura_suelta_va_a_la_replica(self, *_):
+        self.assertEqual(self.router.db_for_read(Almacen), 'replica')
+
+    def test_dentro_de_atomic_lee_de_la_primaria(self, *_):
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Almacen), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_read(Almacen), 'replica')
+
+    def test_fijar_primaria(self, *_):
+        routers.fijar_primaria()
+        self.assertEqual(self.router.db_for_read(Almacen), DEFAULT_DB_ALIAS)
+
+
+
+@mock.patch('core.routers.replica_retrasada', return_value=False)
+@mock.patch('core.routers.alias_replica', return_value='replica')
+class ReplicaMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def pasar(self, request, escribe=False):
+        """Primaria o réplica para las lecturas de ``request``."""
+        def vista(request):
+            if escribe:
+                routers.ReplicaRouter().db_for_write(Almacen)
+            return routers.ReplicaRouter().db_for_read(Almacen)
+        return ReplicaMiddleware(vista)(request)
+
+    def test_escritura_fija_solo_a_su_token(self, *_):
+        ip = {'REMOTE_ADDR': '10.0.0.1'}
+        self.assertEqual(self.pasar(self.factory.post('/', HTTP_AUTHORIZATION='Token a', **ip), True), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.pasar(self.factory.get('/', HTTP_AUTHORIZATION='Token a', **ip)), DEFAULT_DB_ALIAS)
+        # Otra caja tras el mismo NAT sigue leyendo de la réplica
+        self.assertEqual(self.pasar(self.factory.get('/', HTTP_AUTHORIZATION='Token b', **ip)), 'replica')
+        self.assertEqual(self.pasar(self.factory.get('/', **ip)), 'replica')
+
+    def test_anonimo_por_ip(self, *_):
+        self.pasar(self.factory.post('/', REMOTE_ADDR='10.0.0.1'), True)
+        self.assertEqual(self.pasar(self.factory.get('/', REMOTE_ADDR='10.0.0.1')), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.pasar(self.factory.get('/', REMOTE_ADDR='10.0.0.2')), 'replica')
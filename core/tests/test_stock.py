@@ -0,0 +1,173 @@
+import threading
+import unittest
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core import stock
+from core.models import Almacen, CupoStock, MovimientoStock, Tienda, User
+
+
+def crear_producto(tienda, stock_inicial=10, nombre='Pan'):
+    return Almacen.objects.create(
+        tienda=tienda, nombreproducto=nombre, tipoproducto='t', categoria='c', precio=1, stock=stock_inicial,
+    )
+
+
+class LibroStockTests(TestCase):
+    def setUp(self):
+        self.tienda = Tienda.objects.create(nombre='Centro')
+        self.producto = crear_producto(self.tienda)
+
+    def real(self):
+        return Almacen.objects.con_stock().get(pk=self.producto.pk)
+
+    def test_descontar_inserta_movimiento_y_actualiza_el_producto(self):
+        movimientos = stock.descontar({self.producto.id: self.producto}, {self.producto.id: 4})
+        self.assertEqual([m.cantidad for m in movimientos], [-4])
+        self.assertEqual(self.producto.stock, 6)
+        self.assertEqual(self.producto.version, movimientos[0].version)
+
+        real = self.real()
+        self.assertEqual((real.stock, real.stock_actual), (10, 6))
+        self.assertEqual(real.version_actual, movimientos[0].version)
+
+    def test_descontar_sin_stock_no_inserta_nada(self):
+        with self.assertRaises(stock.StockInsuficiente) as e:
+            stock.descontar({self.producto.id: self.producto}, {self.producto.id: 11})
+        self.assertEqual((e.exception.disponible, e.exception.solicitado), (10, 11))
+        self.assertFalse(MovimientoStock.objects.filter(tipo='venta').exists())
+
+    def test_compactar_suma_los_pendientes_a_la_foto(self):
+        stock.descontar({self.producto.id: self.producto}, {self.producto.id: 3})
+        stock.ajustar(self.producto, cantidad=5)
+        antes = self.real()
+
+        self.assertEqual(stock.compactar(), 2)
+        self.assertEqual(stock.compactar(), 0)
+        despues = self.real()
+        self.assertEqual(despues.stock, 12)
+        self.assertEqual(despues.stock_actual, antes.stock_actual)
+        self.assertEqual(despues.version, antes.version_actual)
+
+        estado = stock.verificar()
+        self.assertEqual((estado['descuadres'], estado['negativos'], estado['pendientes']), ([], [], 0))
+
+    def test_verificar_detecta_descuadres(self):
+        Almacen.objects.filter(pk=self.producto.pk).update(stock=7)
+        self.assertEqual(stock.verificar()['descuadres'][0]['aplicado'], 10)
+
+
+@override_settings(STOCK_PARTICIONES=4)
+class CuposStockTests(TestCase):
+    def setUp(self):
+        self.tienda = Tienda.objects.create(nombre='Centro')
+        self.producto = crear_producto(self.tienda)
+        # pk % 4 distintos: cada caja en su partición
+        self.cajas = [User.objects.create_user(f'caja{i}', password='x', tienda=self.tienda) for i in range(4)]
+
+    def vender(self, cantidad, caja=0):
+        return stock.descontar({self.producto.id: self.producto}, {self.producto.id: cantidad}, usuario=self.cajas[caja])
+
+    def cupos(self):
+        return {c.particion: c.cantidad for c in CupoStock.objects.filter(producto=self.producto)}
+
+    def particion(self, caja):
+        return stock.particion_de(self.cajas[caja])
+
+    def test_primera_venta_reparte_lo_que_queda(self):
+        self.vender(4)
+        self.assertEqual(sorted(self.cupos().values()), [1, 1, 2, 2])
+        self.assertEqual(self.producto.stock, 6)
+
+    def test_venta_dentro_del_cupo_no_bloquea_el_producto(self):
+        self.vender(1)
+        antes = self.cupos()
+        with mock.patch('core.stock.bloquear') as bloquear:
+            self.vender(1, caja=1)
+        bloquear.assert_not_called()
+        despues = self.cupos()
+        self.assertEqual(despues[self.particion(1)], antes[self.particion(1)] - 1)
+        self.assertEqual(sum(despues.values()), 8)
+        self.assertEqual(self.producto.stock, 8)
+
+    def test_cupo_agotado_reparte_y_vende(self):
+        self.vender(2)  # quedan 8: 2 por cupo
+        self.vender(3, caja=1)  # su cupo no alcanza: camino lento
+        self.assertEqual(sum(self.cupos().values()), 5)
+        self.assertEqual(Almacen.objects.con_stock().get(pk=self.producto.pk).stock_actual, 5)
+        with self.assertRaises(stock.StockInsuficiente) as e:
+            self.vender(6, caja=2)
+        self.assertEqual(e.exception.disponible, 5)
+
+    def test_ajustes_reparten_el_stock_nuevo(self):
+        self.vender(2)
+        stock.ajustar(self.producto, cantidad=12)
+        self.assertEqual(sum(self.cupos().values()), 20)
+        stock.ajustar(self.producto, stock=3)
+        self.assertEqual(sorted(self.cupos().values()), [0, 1, 1, 1])
+        self.assertEqual(stock.verificar()['cupos'], [])
+
+    def test_verificar_detecta_cupos_por_encima_del_stock(self):
+        self.vender(2)
+        CupoStock.objects.filter(producto=self.producto, particion=0).update(cantidad=100)
+        self.assertEqual(stock.verificar()['cupos'][0]['id'], self.producto.id)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'bloqueos de fila de PostgreSQL')
+class DescontarConcurrenteTests(TransactionTestCase):
+    def test_ventas_simultaneas_no_venden_de_mas(self):
+        producto = crear_producto(Tienda.objects.create(nombre='Centro'), stock_inicial=5)
+        barrera, vendidas = threading.Barrier(10), []
+
+        def caja():
+            try:
+                barrera.wait()
+                with transaction.atomic():
+                    stock.descontar({producto.id: Almacen.objects.get(pk=producto.pk)}, {producto.id: 1})
+                vendidas.append(1)
+            except stock.StockInsuficiente:
+                pass
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=caja) for _ in range(10)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(len(vendidas), 5)
+        self.assertEqual(Almacen.objects.con_stock().get(pk=producto.pk).stock_actual, 0)
+
+    def test_cajas_distintas_no_se_esperan(self):
+        producto = crear_producto(Tienda.objects.create(nombre='Centro'), stock_inicial=1000)
+        cajas = [User.objects.create_user(f'caja{i}', password='x') for i in range(2)]
+        self.assertNotEqual(stock.particion_de(cajas[0]), stock.particion_de(cajas[1]))
+        with transaction.atomic():
+            stock.descontar({producto.id: producto}, {producto.id: 1})  # reparte los cupos
+
+        vendida, soltar, hecho = threading.Event(), threading.Event(), []
+
+        def caja(usuario, esperar):
+            try:
+                with transaction.atomic():
+                    stock.descontar({producto.id: Almacen.objects.get(pk=producto.pk)}, {producto.id: 1}, usuario=usuario)
+                    vendida.set()
+                    if esperar:
+                        soltar.wait(5)
+                hecho.append(usuario.username)
+            finally:
+                connection.close()
+
+        lenta = threading.Thread(target=caja, args=(cajas[0], True))
+        lenta.start()
+        self.assertTrue(vendida.wait(5))
+        # La primera venta sigue sin confirmar: la otra caja vende de su cupo sin esperarla
+        rapida = threading.Thread(target=caja, args=(cajas[1], False))
+        rapida.start()
+        rapida.join(2)
+        self.assertEqual(hecho, ['caja1'])
+        soltar.set()
+        lenta.join()
+        self.assertEqual(Almacen.objects.con_stock().get(pk=producto.pk).stock_actual, 997)
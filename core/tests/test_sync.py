@@ -0,0 +1,62 @@
+import threading
+import unittest
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from core.models import Almacen, Tienda, User
+from core.sync import version_confirmada
+
+
+def producto(tienda, nombre, stock=5):
+    return Almacen.objects.create(
+        tienda=tienda, nombreproducto=nombre, tipoproducto='t', categoria='c', precio=1, stock=stock,
+    )
+
+
+class SincronizarProductosTests(TestCase):
+    def setUp(self):
+        self.tienda = Tienda.objects.create(nombre='Centro')
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(User.objects.create_user('ana', password='x', rol='admin'))
+
+    def test_cambios_y_since_posterior_vacio(self):
+        p = producto(self.tienda, 'Pan')
+        r = self.cliente.get('/api/almacen/sync/', {'since': 0})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([f['id'] for f in r.data['productos']], [p.id])
+
+        r = self.cliente.get('/api/almacen/sync/', {'since': r.data['version']})
+        self.assertEqual(r.data['productos'], [])
+        self.assertFalse(r.data['mas'])
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'xid y secuencia de PostgreSQL')
+class VersionConfirmadaTests(TransactionTestCase):
+    def test_version_confirmada_no_salta_una_escritura_en_vuelo(self):
+        tienda = Tienda.objects.create(nombre='Centro')
+        tomada, seguir, versiones = threading.Event(), threading.Event(), {}
+
+        def lenta():
+            try:
+                with transaction.atomic():
+                    versiones['lenta'] = producto(tienda, 'Lenta').version
+                    tomada.set()
+                    seguir.wait(5)
+            finally:
+                connection.close()
+
+        hilo = threading.Thread(target=lenta)
+        hilo.start()
+        tomada.wait(5)
+        # Versión mayor, confirmada antes que la de la transacción lenta
+        rapida = producto(tienda, 'Rápida').version
+        self.assertGreater(rapida, versiones['lenta'])
+
+        tope = version_confirmada(espera=0.2)
+        self.assertTrue(tope is None or tope < versiones['lenta'])
+
+        seguir.set()
+        hilo.join()
+        self.assertGreaterEqual(version_confirmada(espera=1), rapida)
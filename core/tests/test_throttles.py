@@ -0,0 +1,66 @@
+import threading
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.throttles import LoginIPThrottle, LoginUsuarioThrottle
+
+
+class VentanaThrottleTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+
+    def _peticion(self):
+        return Request(
+            self.factory.post('/api/login/', {'username': 'ana'}, format='json'), parsers=[JSONParser()],
+        )
+
+    def test_rafaga_paralela_no_supera_la_tasa(self):
+        permitidas = []
+        barrera = threading.Barrier(20)
+
+        def intento():
+            throttle = LoginUsuarioThrottle()
+            peticion = self._peticion()
+            barrera.wait()
+            permitidas.append(throttle.allow_request(peticion, None))
+
+        hilos = [threading.Thread(target=intento) for _ in range(20)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(sum(permitidas), LoginUsuarioThrottle().num_requests)
+
+    def test_x_forwarded_for_falso_no_reinicia_el_limite(self):
+        throttle = LoginIPThrottle()
+        for i in range(throttle.num_requests):
+            peticion = self.factory.post('/api/login/', {}, format='json', HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')
+            self.assertTrue(throttle.allow_request(Request(peticion), None))
+        peticion = self.factory.post('/api/login/', {}, format='json', HTTP_X_FORWARDED_FOR='10.9.9.9')
+        self.assertFalse(throttle.allow_request(Request(peticion), None))
+
+    def test_rechazo_informa_la_espera(self):
+        throttle = LoginIPThrottle()
+        peticion = self._peticion()
+        for _ in range(throttle.num_requests):
+            self.assertTrue(throttle.allow_request(peticion, None))
+        self.assertFalse(throttle.allow_request(peticion, None))
+        self.assertGreater(throttle.wait(), 0)
+
+
+class LoginCuerpoListaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cuerpo_json_lista_responde_400(self):
+        r = APIClient().post('/api/login/', [1, 2], format='json')
+        self.assertEqual(r.status_code, 400)
+
+    def test_recuperacion_con_lista_responde_400(self):
+        r = APIClient().post('/api/password-reset/', ['a@b.c'], format='json')
+        self.assertEqual(r.status_code, 400)
@@ -0,0 +1,48 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Tienda, User
+
+
+class RegistroTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.datos = {'username': 'ana', 'email': 'ana@example.com', 'password': 'x'}
+
+    def test_una_tienda_activa_se_asigna(self):
+        tienda = Tienda.objects.create(nombre='Centro')
+        r = self.cliente.post('/api/register/', self.datos, format='json')
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(r.data['tienda'], tienda.id)
+
+    def test_varias_tiendas_exige_tienda(self):
+        Tienda.objects.create(nombre='Centro')
+        Tienda.objects.create(nombre='Norte')
+        r = self.cliente.post('/api/register/', self.datos, format='json')
+        self.assertEqual(r.status_code, 400)
+        self.assertIn('Indique la tienda', r.data['error'])
+        self.assertFalse(User.objects.filter(username='ana').exists())
+
+
+class ListarUsuariosTests(TestCase):
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(User.objects.create_user('admin', password='x', rol='admin'))
+        User.objects.bulk_create([User(username=f'u{i:03}', email=f'u{i}@example.com') for i in range(120)])
+
+    def test_sin_parametros_devuelve_todos(self):
+        r = self.cliente.get('/api/users/')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(r.data), 121)
+        self.assertNotIn('Link', r)
+
+    def test_con_limit_pagina_por_id(self):
+        r = self.cliente.get('/api/users/', {'limit': 50, 'fields': 'id'})
+        self.assertEqual(len(r.data), 50)
+        self.assertIn('rel="next"', r['Link'])
+
+        r = self.cliente.get('/api/users/', {'after': r.data[-1]['id'], 'fields': 'id'})
+        self.assertEqual(len(r.data), 71)
+        self.assertNotIn('Link', r)
@@ -0,0 +1,144 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Almacen, CestaSincronizada, ProductosVendidos, Tienda, User
+from core.ventas import registrar_venta
+
+
+class ListadoVentasETagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tienda = Tienda.objects.create(nombre='Centro')
+        self.producto = Almacen.objects.create(
+            tienda=self.tienda, nombreproducto='Pan', tipoproducto='t', categoria='c', precio=2, stock=10,
+        )
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(User.objects.create_user('ana', password='x', rol='admin'))
+
+    def _vender(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_venta(Almacen.objects.all(), [{'producto_id': self.producto.id, 'cantidad': 1}], modo='sincrona')
+
+    def test_304_sin_consultar_las_ventas_y_nueva_etag_tras_vender(self):
+        with mock.patch('core.reportes.cache_compartida', return_value=True):
+            self._vender()
+            etag = self.cliente.get('/api/ventas/list/')['ETag']
+
+            with self.assertNumQueries(0):
+                r = self.cliente.get('/api/ventas/list/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(r.status_code, 304)
+
+            self._vender()
+            r = self.cliente.get('/api/ventas/list/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(len(r.data), ProductosVendidos.objects.count())
+            self.assertNotEqual(r['ETag'], etag)
+
+    def test_cambio_desde_el_admin_cambia_la_etag(self):
+        with mock.patch('core.reportes.cache_compartida', return_value=True):
+            self._vender()
+            etag = self.cliente.get('/api/ventas/list/')['ETag']
+            venta = ProductosVendidos.objects.get()
+            venta.cantidad = 5
+            with self.captureOnCommitCallbacks(execute=True):
+                venta.save()
+            self.assertEqual(self.cliente.get('/api/ventas/list/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_cache_por_proceso_consulta_la_version(self):
+        # LocMem: el contador de este proceso no ve las ventas de los demás. Una
+        # alta que no pasa por él (on_commit sin ejecutar) cambia igualmente la ETag
+        registrar_venta(Almacen.objects.all(), [{'producto_id': self.producto.id, 'cantidad': 1}], modo='sincrona')
+        etag = self.cliente.get('/api/ventas/list/')['ETag']
+        with self.assertNumQueries(1):
+            r = self.cliente.get('/api/ventas/list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+        registrar_venta(Almacen.objects.all(), [{'producto_id': self.producto.id, 'cantidad': 1}], modo='sincrona')
+        self.assertEqual(self.cliente.get('/api/ventas/list/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ListadoVentasParametrosTests(TestCase):
+    def setUp(self):
+        tienda = Tienda.objects.create(nombre='Centro')
+        ProductosVendidos.objects.create(
+            tienda=tienda, nombreproducto='Pan', tipoproducto='t', categoria='c',
+            precio_unitario=2, cantidad=3, fechaventa='2025-03-01',
+        )
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(User.objects.create_user('ana', password='x', rol='admin'))
+
+    def test_fields_limita_las_claves(self):
+        r = self.cliente.get('/api/ventas/list/', {'fields': 'producto_nombre,precio_total'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data, [{'producto_nombre': 'Pan', 'precio_total': 6.0}])
+
+    def test_fields_desconocido_responde_400(self):
+        r = self.cliente.get('/api/ventas/list/', {'fields': 'id,contraseña'})
+        self.assertEqual(r.status_code, 400)
+        self.assertIn('contraseña', r.data['error'])
+
+    def test_fecha_invalida_responde_400(self):
+        r = self.cliente.get('/api/ventas/list/', {'fecha': 'abc'})
+        self.assertEqual(r.status_code, 400)
+
+    def test_filtra_por_fecha(self):
+        self.assertEqual(len(self.cliente.get('/api/ventas/list/', {'fecha': '2025-03-01'}).data), 1)
+        self.assertEqual(self.cliente.get('/api/ventas/list/', {'fecha': '2025-03-02'}).data, [])
+
+
+class SincronizarCestasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tienda = Tienda.objects.create(nombre='Centro')
+        self.producto = Almacen.objects.create(
+            tienda=self.tienda, nombreproducto='Pan', tipoproducto='t', categoria='c', precio=2, stock=10,
+        )
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(User.objects.create_user('caja1', password='x', tienda=self.tienda))
+
+    def cesta(self, cliente_id, cantidad=1):
+        return {'id': cliente_id, 'fecha': '2024-02-03T10:00:00',
+                'ventas': [{'producto_id': self.producto.id, 'cantidad': cantidad}]}
+
+    def sincronizar(self, *cestas):
+        r = self.cliente.post('/api/ventas/sync/', {'cestas': list(cestas)}, format='json')
+        self.assertEqual(r.status_code, 200)
+        return [resultado['estado'] for resultado in r.data['resultados']]
+
+    def stock(self):
+        return Almacen.objects.con_stock().get(pk=self.producto.pk).stock_actual
+
+    def test_reenvio_no_descuenta_dos_veces(self):
+        self.assertEqual(self.sincronizar(self.cesta('a', 3)), ['ok'])
+        # La caja no recibió la respuesta y reenvía todo, con la cesta repetida en el lote
+        self.assertEqual(self.sincronizar(self.cesta('a', 3), self.cesta('b', 1), self.cesta('b', 1)),
+                         ['duplicada', 'ok', 'duplicada'])
+        self.assertEqual(self.stock(), 6)
+        self.assertEqual(ProductosVendidos.objects.count(), 2)
+        self.assertEqual(CestaSincronizada.objects.count(), 2)
+
+    def test_conflicto_de_stock(self):
+        r = self.cliente.post('/api/ventas/sync/', {'cestas': [self.cesta('a', 8), self.cesta('b', 3)]}, format='json')
+        self.assertEqual([x['estado'] for x in r.data['resultados']], ['ok', 'conflicto'])
+        conflicto = r.data['resultados'][1]
+        self.assertEqual((conflicto['disponible'], conflicto['solicitado']), (2, 3))
+        self.assertEqual(self.stock(), 2)
+        # La cesta en conflicto no queda registrada: se puede reenviar corregida
+        self.assertEqual(self.sincronizar(self.cesta('b', 2)), ['ok'])
+        self.assertEqual(self.stock(), 0)
+
+    def test_cesta_mal_formada_no_aborta_el_lote(self):
+        estados = self.sincronizar(
+            self.cesta('a'),
+            'no es una cesta',
+            {'id': 'sin-fecha', 'ventas': [{'producto_id': self.producto.id}]},
+            {**self.cesta('cero'), 'ventas': [{'producto_id': self.producto.id, 'cantidad': 0}]},
+            {**self.cesta('producto'), 'ventas': [{'producto_id': 'x'}]},
+            self.cesta('b', 2),
+        )
+        self.assertEqual(estados, ['ok', 'invalida', 'invalida', 'invalida', 'invalida', 'ok'])
+        self.assertEqual(self.stock(), 7)
+        self.assertEqual(set(CestaSincronizada.objects.values_list('cliente_id', flat=True)), {'a', 'b'})
@@ -0,0 +1,126 @@
+# core/throttles.py
+"""Throttles de ventana deslizante para los endpoints públicos costosos.
+
+``login_view`` ejecuta PBKDF2 en cada intento y ``password_reset_request``
+envía correo; ambos son ``AllowAny``. DRF evalúa los throttles en
+``APIView.initial()``, antes de llamar a la vista, así que un intento
+rechazado nunca llega a ``authenticate()`` ni al SMTP.
+
+Las tasas se configuran en ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`` con
+el formato habitual de DRF (``'5/min'``): como mucho ese número de intentos
+en cualquier ventana de esa duración. Se cuenta con ``cache.add`` +
+``cache.incr`` (atómicos en Redis, Memcached y LocMem): en una ráfaga
+paralela cada petición recibe su propio número y no pasan más de las
+permitidas. Los intentos rechazados también cuentan. El estado vive en la
+caché configurada (``CACHES['default']``), compartida entre procesos si es
+Redis o Memcached.
+"""
+import hashlib
+import logging
+
+from django.core.cache import cache
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+METRICAS_KEY = 'throttle_rechazos_%s'
+
+
+def registrar_rechazo(scope):
+    key = METRICAS_KEY % scope
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # La clave expiró/desalojó entre add() e incr()
+        cache.set(key, 1, timeout=None)
+
+
+def metricas_rechazos(scopes):
+    """Devuelve {scope: intentos rechazados} desde la caché."""
+    valores = cache.get_many([METRICAS_KEY % s for s in scopes])
+    return {s: valores.get(METRICAS_KEY % s, 0) for s in scopes}
+
+
+class VentanaThrottle(SimpleRateThrottle):
+    """Ventana deslizante: contador de la ventana actual + parte proporcional de la anterior."""
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        ventana, fraccion = divmod(self.now / self.duration, 1)
+        ventana = int(ventana)
+        actual = f'{self.key}:{ventana}'
+        self.cache.add(actual, 0, self.duration * 2)
+        try:
+            intentos = self.cache.incr(actual)
+        except ValueError:
+            # Desalojada entre add() e incr()
+            self.cache.add(actual, 1, self.duration * 2)
+            intentos = 1
+        anterior = self.cache.get(f'{self.key}:{ventana - 1}', 0)
+
+        if anterior * (1 - fraccion) + intentos > self.num_requests:
+            self.espera = (1 - fraccion) * self.duration
+            return self.throttle_failure()
+        return True
+
+    def throttle_failure(self):
+        registrar_rechazo(self.scope)
+        logger.warning("Throttle %s: intento rechazado (%s)", self.scope, self.key)
+        return False
+
+    def wait(self):
+        return getattr(self, 'espera', None)
+
+
+class _PorIP(VentanaThrottle):
+    # get_ident: REMOTE_ADDR, o X-Forwarded-For según REST_FRAMEWORK['NUM_PROXIES']
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class _PorCampo(VentanaThrottle):
+    campo = None
+
+    def get_cache_key(self, request, view):
+        if not isinstance(request.data, dict):
+            return None  # Cuerpo JSON que no es un objeto: la vista responde 400
+        valor = request.data.get(self.campo)
+        if not valor or not isinstance(valor, str):
+            return None  # La vista responde 400 sin hacer trabajo costoso
+        # Hash: el valor lo controla el cliente y no siempre es una clave de caché válida
+        ident = hashlib.sha256(valor.strip().lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class LoginIPThrottle(_PorIP):
+    scope = 'login_ip'
+
+
+class LoginUsuarioThrottle(_PorCampo):
+    scope = 'login_usuario'
+    campo = 'username'
+
+
+class PasswordResetIPThrottle(_PorIP):
+    scope = 'password_reset_ip'
+
+
+class PasswordResetEmailThrottle(_PorCampo):
+    scope = 'password_reset_email'
+    campo = 'email'
+
+
+SCOPES = [
+    LoginIPThrottle.scope,
+    LoginUsuarioThrottle.scope,
+    PasswordResetIPThrottle.scope,
+    PasswordResetEmailThrottle.scope,
+]
@@ -0,0 +1,67 @@
+# core/tiendas.py
+"""Ámbito por tienda de las consultas.
+
+* Empleados (y administradores de tienda): siempre su propia tienda.
+* Administradores globales (``rol='admin'`` sin tienda): todas, o la
+  indicada con ``?tienda=<id>`` (en altas, también el campo ``tienda``).
+"""
+from rest_framework import status
+
+from .models import Tienda
+
+
+class TiendaNoValida(Exception):
+    def __init__(self, mensaje, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(mensaje)
+        self.status_code = status_code
+
+
+def es_admin_global(user):
+    return user.rol == 'admin' and user.tienda_id is None
+
+
+def tienda_de(request, cuerpo=False):
+    """Id de la tienda de la petición, o None si es un admin global sin filtro.
+
+    Para filtrar solo se mira ``?tienda=``; con ``cuerpo=True`` (altas) también
+    el campo ``tienda`` del cuerpo.
+    """
+    user = request.user
+    if user.tienda_id is not None:
+        return user.tienda_id
+    if user.rol != 'admin':
+        raise TiendaNoValida('Usuario sin tienda asignada', status.HTTP_403_FORBIDDEN)
+
+    valor = request.query_params.get('tienda')
+    if cuerpo and valor in (None, ''):
+        valor = request.data.get('tienda')
+    if valor in (None, ''):
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise TiendaNoValida('Tienda inválida')
+
+
+def filtrar_por_tienda(queryset, request):
+    tienda_id = tienda_de(request)
+    return queryset if tienda_id is None else queryset.filter(tienda_id=tienda_id)
+
+
+def validar_tienda(valor):
+    """Id de una tienda activa a partir del valor recibido en la petición."""
+    try:
+        tienda_id = int(valor)
+    except (TypeError, ValueError):
+        raise TiendaNoValida('Tienda inválida')
+    if not Tienda.objects.filter(pk=tienda_id, activa=True).exists():
+        raise TiendaNoValida('Tienda no encontrada o inactiva', status.HTTP_404_NOT_FOUND)
+    return tienda_id
+
+
+def tienda_para_escribir(request):
+    """Tienda (activa) en la que se crean registros; obligatoria."""
+    tienda_id = tienda_de(request, cuerpo=True)
+    if tienda_id is None:
+        raise TiendaNoValida('Indique la tienda (campo "tienda")')
+    return validar_tienda(tienda_id)
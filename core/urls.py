@@ -1,15 +1,23 @@
 # core/urls.py
 from django.urls import path
-from . import views
+
+from . import recuperacion, views
+
 
 urlpatterns = [
     # Auth
     path('login/', views.login_view, name='login'),
     path('register/', views.register_user, name='register_user'),
     path('register-staff/', views.register_staff, name='register_staff'),
+    path('throttle/metricas/', views.metricas_throttle, name='metricas_throttle'),
     
+    # Tiendas
+    path('tiendas/', views.listar_tiendas, name='listar_tiendas'),
+    path('tiendas/create/', views.crear_tienda, name='crear_tienda'),
+
     # Almacén
     path('almacen/', views.listar_productos, name='listar_productos'),
+    path('almacen/sync/', views.sincronizar_productos, name='sincronizar_productos'),
     path('almacen/create/', views.crear_producto, name='crear_producto'),
     path('almacen/<int:pk>/', views.actualizar_producto, name='actualizar_producto'),
     path('almacen/<int:pk>/update-stock/', views.actualizar_stock, name='update_stock'),
@@ -18,12 +26,28 @@ urlpatterns = [
     # Ventas
     path('ventas/', views.crear_venta, name='crear_venta'),  # POST para crear
     path('ventas/list/', views.listar_ventas_detalle, name='listar_ventas_detalle'),  # GET para listar
+    path('ventas/ranking/', views.ranking_productos, name='ranking_productos'),  # Top-N y ABC
+    path('ventas/sync/', views.sincronizar_ventas, name='sincronizar_ventas'),  # POST cestas sin conexión
+    path('reservas/', views.crear_reserva, name='crear_reserva'),  # POST aparta stock con TTL
+    path('reservas/<int:pk>/', views.cancelar_reserva, name='cancelar_reserva'),  # DELETE libera
     
+    # Eventos en tiempo real (SSE, solo ASGI)
+    path('eventos/', views.stream_eventos, name='stream_eventos'),
+
+    # Reposición (pronóstico de demanda)
+    path('reposicion/', views.listar_reposicion, name='listar_reposicion'),
+    path('reposicion/calcular/', views.calcular_reposicion, name='calcular_reposicion'),
+
+    # Perfilado (PERFILADO_ACTIVO)
+    path('perfiles/', views.listar_perfiles, name='listar_perfiles'),
+    path('perfiles/<str:perfil_id>/', views.detalle_perfil, name='detalle_perfil'),
+
     # Usuarios
     path('users/', views.listar_usuarios, name='listar_usuarios'),
     path('users/<int:pk>/', views.actualizar_usuario, name='actualizar_usuario'),
+    path('users/bulk/', views.actualizar_usuarios_lote, name='actualizar_usuarios_lote'),
 
     # recuperacion de password
-    path('password-reset/', views.password_reset_request, name='password_reset_request'),
-    path('password-reset/<uidb64>/<token>/', views.password_reset_confirm, name='password_reset_confirm'),    
+    path('password-reset/', recuperacion.password_reset_request, name='password_reset_request'),
+    path('password-reset/<uidb64>/<token>/', recuperacion.password_reset_confirm, name='password_reset_confirm'),
 ]
\ No newline at end of file
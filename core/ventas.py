@@ -0,0 +1,536 @@
+# core/ventas.py
+"""Registro de ventas: reserva de stock e ingesta de las líneas vendidas.
+
+El stock se descuenta siempre de forma síncrona, insertando movimientos
+``venta`` en el libro de stock (core/stock.py) en vez de actualizar la
+fila del producto. Las líneas de ``ProductosVendidos`` se guardan según ``VENTAS_INGESTA``:
+
+* ``'sincrona'`` (por defecto): se insertan en la misma transacción.
+* ``'diario'``: se añaden a un diario local (JSONL + fsync) antes del
+  commit y un hilo las inserta en lotes cada ``VENTAS_DIARIO_FLUSH_MS``.
+  La respuesta ya no espera a los INSERT de las líneas.
+
+Cada proceso escribe su propio fichero en ``VENTAS_DIARIO_DIR`` y lo
+mantiene bloqueado (flock). Un fichero sin bloqueo es de un proceso caído:
+``recuperar_diarios`` reinserta las líneas cuya venta llegó a confirmarse
+(existe su movimiento de stock ``venta``; el ``uuid`` de cada línea evita
+duplicados) y lo borra. Se ejecuta al arrancar el hilo y con
+``manage.py recuperar_diario_ventas``.
+
+``sincronizar_cestas`` aplica en bloque las cestas que una caja vendió sin
+conexión; cada cesta aplicada queda en ``CestaSincronizada`` para que
+reenviarla no la duplique.
+
+Garantía del diario: cada venta confirmada deja sus líneas una sola vez.
+Si el proceso muere entre el fsync del diario y el commit del stock, la
+línea está en el diario pero su movimiento no, y la recuperación la
+descarta. La venta en modo diario debe ser la transacción exterior
+(``atomic(durable=True)``): si otra la envolviera, su rollback dejaría la
+línea en el diario sin anular.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+
+from .eventos import publicar_cambios_producto
+from . import stock
+from .models import Almacen, CestaSincronizada, MovimientoStock, ProductosVendidos
+from .reportes import invalidar_reportes
+from .routers import fijar_primaria
+
+logger = logging.getLogger(__name__)
+
+
+class VentaRechazada(Exception):
+    def __init__(self, mensaje, status_code=status.HTTP_400_BAD_REQUEST, extra=None):
+        super().__init__(mensaje)
+        self.status_code = status_code
+        self.extra = extra or {}
+
+
+def modo_ingesta():
+    return getattr(settings, 'VENTAS_INGESTA', 'sincrona')
+
+
+def leer_lineas(items):
+    """[(producto_id, cantidad)] de ``items`` ({producto_id, cantidad}) o ``VentaRechazada``."""
+    lineas = []
+    for item in items:
+        producto_id = item.get('producto_id')
+        cantidad = item.get('cantidad', 1)
+        if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad < 1:
+            raise VentaRechazada(f"Cantidad inválida: {cantidad}")
+        try:
+            lineas.append((int(producto_id), cantidad))
+        except (TypeError, ValueError):
+            raise VentaRechazada(f'Producto no encontrado: {producto_id}', status.HTTP_404_NOT_FOUND)
+    return lineas
+
+
+def pedido_de(productos, lineas):
+    """(catálogo {id: Almacen}, {producto_id: cantidad total}); 404 si falta alguno."""
+    catalogo = productos.in_bulk({producto_id for producto_id, _ in lineas})
+    pedido = Counter()
+    for producto_id, cantidad in lineas:
+        if producto_id not in catalogo:
+            raise VentaRechazada(f'Producto no encontrado: {producto_id}', status.HTTP_404_NOT_FOUND)
+        pedido[producto_id] += cantidad
+    return catalogo, pedido
+
+
+def registrar_venta(productos, items, modo=None, usuario=None, reserva=None):
+    """Descuenta el stock y registra las líneas de ``items`` ({producto_id, cantidad}).
+
+    ``productos`` es el queryset de productos permitidos (ya filtrado por
+    tienda). Con ``reserva`` (id de una reserva activa del usuario) las
+    líneas salen de la reserva y el stock ya está apartado: no se vuelve a
+    comprobar ni a bloquear. Devuelve (total, detalles). Lanza
+    ``VentaRechazada``; en ese caso no se descuenta nada.
+    """
+    modo = modo or modo_ingesta()
+    if reserva is None:
+        lineas = leer_lineas(items)
+        catalogo, pedido = pedido_de(productos, lineas)
+
+    hoy = timezone.localdate()
+    total_venta = 0
+    detalles = []
+    registros = []
+    en_diario = False
+
+    try:
+        with transaction.atomic(durable=modo == 'diario'):
+            if reserva is not None:
+                from .reservas import convertir, tomar
+                apartada = tomar(reserva, usuario)
+                lineas = [(l.producto_id, l.cantidad) for l in apartada.lineas.all()]
+                catalogo, pedido = pedido_de(productos, lineas)
+
+            for producto_id, cantidad in lineas:
+                producto = catalogo[producto_id]
+                subtotal = float(producto.precio) * cantidad
+                total_venta += subtotal
+                registro = {
+                    'uuid': str(uuid.uuid4()),
+                    'tienda_id': producto.tienda_id,
+                    'producto_id': producto.id,
+                    'nombreproducto': producto.nombreproducto,
+                    'tipoproducto': producto.tipoproducto,
+                    'categoria': producto.categoria,
+                    'precio_unitario': str(producto.precio),
+                    'cantidad': cantidad,
+                    'fechaventa': hoy.isoformat(),
+                }
+                registros.append(registro)
+                detalles.append({
+                    'id': None,
+                    'uuid': registro['uuid'],
+                    'producto': producto.nombreproducto,
+                    'cantidad': cantidad,
+                    'subtotal': subtotal,
+                })
+
+            referencias = {r['producto_id']: r['uuid'] for r in reversed(registros)}
+            for registro in registros:
+                # Movimiento de stock de la línea: la recuperación del diario lo busca
+                registro['referencia'] = referencias[registro['producto_id']]
+            if reserva is not None:
+                # ✅ Stock ya apartado: se convierte la reserva en venta sin volver a mirar el stock
+                convertir(apartada, catalogo, usuario, referencias)
+            else:
+                # ✅ Movimientos de venta: solo se bloquea el cupo de la caja (core/stock.py)
+                try:
+                    stock.descontar(catalogo, pedido, usuario=usuario, referencias=referencias)
+                except stock.StockInsuficiente as e:
+                    raise VentaRechazada(
+                        str(e), extra={'disponible': max(e.disponible, 0), 'solicitado': e.solicitado},
+                    )
+
+            if modo == 'diario':
+                # Durable en disco antes del commit del stock
+                diario = get_diario()
+                diario.escribir(registros)
+                en_diario = True
+                transaction.on_commit(lambda: diario.encolar(registros))
+            else:
+                creadas = ProductosVendidos.objects.bulk_create([a_modelo(r) for r in registros])
+                for detalle, venta in zip(detalles, creadas):
+                    detalle['id'] = venta.id
+                for tienda_id in {r['tienda_id'] for r in registros}:
+                    invalidar_reportes(tienda_id)
+    except Exception:
+        if en_diario:
+            get_diario().anular(registros)
+        raise
+
+    if reserva is None:
+        # Con reserva el stock real no cambia: se apartó al reservar
+        publicar_cambios_producto([catalogo[producto_id] for producto_id in pedido])
+    return total_venta, detalles
+
+
+def _validar_cesta(cesta):
+    """(cliente_id, fecha, [(producto_id, cantidad)]) o ValueError con el motivo."""
+    if not isinstance(cesta, dict):
+        raise ValueError('Cesta inválida')
+    cliente_id = str(cesta.get('id') or '').strip()
+    if not cliente_id or len(cliente_id) > 64:
+        raise ValueError('id requerido (máx. 64 caracteres)')
+    fecha = parse_datetime(str(cesta.get('fecha') or ''))
+    if fecha is None:
+        raise ValueError('fecha requerida (ISO 8601)')
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    items = cesta.get('ventas')
+    if not isinstance(items, list) or not items:
+        raise ValueError('ventas debe ser una lista no vacía')
+    lineas = []
+    for item in items:
+        cantidad = item.get('cantidad', 1) if isinstance(item, dict) else None
+        if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad < 1:
+            raise ValueError(f"Cantidad inválida: {cantidad}")
+        try:
+            lineas.append((int(item.get('producto_id')), cantidad))
+        except (TypeError, ValueError):
+            raise ValueError(f"Producto inválido: {item.get('producto_id')}")
+    return cliente_id, fecha, lineas
+
+
+def sincronizar_cestas(tienda_id, cestas, lote=200):
+    """Aplica cestas vendidas sin conexión, en orden y en transacciones de ``lote`` cestas.
+
+    Cada cesta se aplica entera o no se aplica. Devuelve un resultado por
+    cesta (mismo orden) con estado ``ok``, ``duplicada`` (ya aplicada: el
+    reenvío es seguro), ``conflicto`` (p. ej. stock insuficiente),
+    ``invalida`` o ``error`` (el lote falló; se puede reenviar).
+    """
+    resultados = [None] * len(cestas)
+    validas = []
+    for i, cesta in enumerate(cestas):
+        try:
+            validas.append((i, *_validar_cesta(cesta)))
+        except ValueError as e:
+            resultados[i] = {'id': cesta.get('id') if isinstance(cesta, dict) else None,
+                             'estado': 'invalida', 'error': str(e)}
+
+    for inicio in range(0, len(validas), lote):
+        bloque = validas[inicio:inicio + lote]
+        try:
+            _aplicar_bloque(tienda_id, bloque, resultados)
+        except Exception as e:
+            logger.error(f"Error al sincronizar cestas: {str(e)}")
+            for i, cliente_id, _, _ in bloque:
+                resultados[i] = {'id': cliente_id, 'estado': 'error', 'error': 'Error al aplicar el lote; reenviar'}
+    return resultados
+
+
+def _aplicar_bloque(tienda_id, bloque, resultados):
+    ids = sorted({producto_id for _, _, _, lineas in bloque for producto_id, _ in lineas})
+    with transaction.atomic():
+        # ✅ Cupos bloqueados en orden (sin interbloqueos con las ventas ni con otras
+        # cajas que sincronizan a la vez). Tras esperar el bloqueo se ven las cestas
+        # que otro reenvío acaba de aplicar
+        productos = Almacen.objects.filter(tienda_id=tienda_id).in_bulk(ids)
+        stock.bloquear(list(productos))
+        aplicadas = set(CestaSincronizada.objects.filter(
+            tienda_id=tienda_id, cliente_id__in=[c for _, c, _, _ in bloque]
+        ).values_list('cliente_id', flat=True))
+
+        # Stock real (foto + pendientes) leído ya con los productos bloqueados
+        disponible = stock.stock_actual(list(productos))
+        ventas, nuevas, movimientos = [], [], []
+        for i, cliente_id, fecha, lineas in bloque:
+            if cliente_id in aplicadas:
+                resultados[i] = {'id': cliente_id, 'estado': 'duplicada'}
+                continue
+            pedido = Counter()
+            for producto_id, cantidad in lineas:
+                pedido[producto_id] += cantidad
+
+            conflicto = None
+            for producto_id, cantidad in pedido.items():
+                if producto_id not in productos:
+                    conflicto = {'error': f'Producto no encontrado: {producto_id}', 'producto_id': producto_id}
+                elif disponible[producto_id] < cantidad:
+                    conflicto = {
+                        'error': f'Stock insuficiente para {productos[producto_id].nombreproducto}',
+                        'producto_id': producto_id, 'disponible': max(disponible[producto_id], 0),
+                        'solicitado': cantidad,
+                    }
+                if conflicto:
+                    break
+            if conflicto:
+                resultados[i] = {'id': cliente_id, 'estado': 'conflicto', **conflicto}
+                continue
+
+            for producto_id, cantidad in pedido.items():
+                disponible[producto_id] -= cantidad
+                movimientos.append(MovimientoStock(
+                    producto_id=producto_id, tienda_id=tienda_id, tipo='venta', cantidad=-cantidad,
+                    referencia=cliente_id,
+                ))
+            total = Decimal(0)
+            for producto_id, cantidad in lineas:
+                p = productos[producto_id]
+                total += p.precio * cantidad
+                ventas.append(ProductosVendidos(
+                    uuid=uuid.uuid4(), tienda_id=tienda_id, producto=p,
+                    nombreproducto=p.nombreproducto, tipoproducto=p.tipoproducto,
+                    categoria=p.categoria, precio_unitario=p.precio, cantidad=cantidad,
+                    fechaventa=timezone.localdate(fecha),
+                ))
+            nuevas.append(CestaSincronizada(
+                tienda_id=tienda_id, cliente_id=cliente_id, fechacliente=fecha,
+                lineas=len(lineas), total=total,
+            ))
+            aplicadas.add(cliente_id)
+            resultados[i] = {'id': cliente_id, 'estado': 'ok', 'total': float(total)}
+
+        # ✅ Todo el bloque en tres sentencias: INSERT movimientos, INSERT líneas, INSERT cestas
+        tocados = {}
+        for movimiento in stock.insertar(movimientos):
+            p = tocados[movimiento.producto_id] = productos[movimiento.producto_id]
+            p.stock, p.version = disponible[p.id], movimiento.version
+        stock.repartir({p.id: disponible[p.id] for p in tocados.values()})
+        ProductosVendidos.objects.bulk_create(ventas, batch_size=1000)
+        CestaSincronizada.objects.bulk_create(nuevas)
+
+        publicar_cambios_producto(tocados.values())
+        if ventas:
+            invalidar_reportes(tienda_id)
+
+
+def a_modelo(registro):
+    return ProductosVendidos(
+        uuid=registro['uuid'],
+        tienda_id=registro['tienda_id'],
+        producto_id=registro['producto_id'],
+        nombreproducto=registro['nombreproducto'],
+        tipoproducto=registro['tipoproducto'],
+        categoria=registro['categoria'],
+        precio_unitario=Decimal(registro['precio_unitario']),
+        cantidad=registro['cantidad'],
+        fechaventa=date.fromisoformat(registro['fechaventa']),
+    )
+
+
+def insertar_lote(registros, lote=1000):
+    """Inserta líneas del diario; las ya insertadas (mismo uuid) se ignoran."""
+    if not registros:
+        return
+    # Un producto borrado antes del volcado deja la línea sin producto (SET_NULL)
+    existentes = set(Almacen.objects.filter(
+        id__in={r['producto_id'] for r in registros}
+    ).values_list('id', flat=True))
+    ventas = [a_modelo(r) for r in registros]
+    for venta in ventas:
+        if venta.producto_id not in existentes:
+            venta.producto_id = None
+    ProductosVendidos.objects.bulk_create(ventas, batch_size=lote, ignore_conflicts=True)
+    for tienda_id in {r['tienda_id'] for r in registros}:
+        invalidar_reportes(tienda_id)
+
+
+def _leer_diario(fichero):
+    registros = {}
+    for linea in fichero:
+        try:
+            dato = json.loads(linea)
+        except ValueError:
+            # Última línea a medio escribir: nunca llegó a confirmarse el fsync
+            continue
+        if 'anular' in dato:
+            for clave in dato['anular']:
+                registros.pop(clave, None)
+        else:
+            registros[dato['uuid']] = dato
+    return list(registros.values())
+
+
+def _confirmados(registros, lote=1000):
+    """Las líneas cuya venta se confirmó: su movimiento ``venta`` está en el libro."""
+    if not registros:
+        return registros
+    # ✅ Acotado por producto y fecha (índice movimiento_producto_fecha_idx)
+    desde = timezone.make_aware(datetime.combine(
+        min(date.fromisoformat(r['fechaventa']) for r in registros) - timedelta(days=1), datetime.min.time(),
+    ))
+    productos = {r['producto_id'] for r in registros}
+    referencias = sorted({r.get('referencia', r['uuid']) for r in registros})
+    confirmadas = set()
+    for i in range(0, len(referencias), lote):
+        confirmadas.update(MovimientoStock.objects.filter(
+            producto_id__in=productos, fecha__gte=desde, tipo='venta', referencia__in=referencias[i:i + lote],
+        ).values_list('referencia', flat=True))
+    return [r for r in registros if r.get('referencia', r['uuid']) in confirmadas]
+
+
+def recuperar_diarios(directorio=None, lote=1000, excluir=None):
+    """Reinserta los diarios de procesos caídos. Devuelve cuántas líneas reinsertó."""
+    directorio = Path(directorio or settings.VENTAS_DIARIO_DIR)
+    if not directorio.is_dir():
+        return 0
+    total = 0
+    for ruta in sorted(directorio.glob('ventas-*.jsonl')):
+        if excluir is not None and ruta == excluir:
+            continue
+        try:
+            fichero = open(ruta, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            continue  # otro proceso lo recuperó
+        with fichero:
+            try:
+                fcntl.flock(fichero, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue  # su proceso sigue vivo
+            if os.fstat(fichero.fileno()).st_nlink == 0:
+                continue
+            leidos = _leer_diario(fichero)
+            registros = _confirmados(leidos, lote)
+            insertar_lote(registros, lote)
+            ruta.unlink()
+            total += len(registros)
+            logger.warning(
+                f"Diario de ventas recuperado: {ruta.name} ({len(registros)} líneas, "
+                f"{len(leidos) - len(registros)} sin venta confirmada)"
+            )
+    return total
+
+
+class DiarioVentas:
+    """Diario local del proceso y su hilo de volcado a la base de datos."""
+
+    def __init__(self, directorio, intervalo=0.25, lote=1000, rotar_bytes=8 * 1024 * 1024):
+        self.directorio = Path(directorio)
+        self.intervalo = intervalo
+        self.lote = lote
+        self.rotar_bytes = rotar_bytes
+        self._lock = threading.Lock()
+        self._pendientes = []
+        self._en_vuelo = 0  # escritas pero con la transacción aún abierta
+        self._parar = threading.Event()
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self._abrir()
+        self._hilo = threading.Thread(target=self._bucle, name='diario-ventas', daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    def _abrir(self):
+        # Se bloquea antes de darle el nombre definitivo: la recuperación
+        # nunca ve un fichero nuevo sin dueño
+        nombre = f"ventas-{os.getpid()}-{time.time_ns()}"
+        temporal = self.directorio / f"{nombre}.tmp"
+        self._fichero = open(temporal, 'a', encoding='utf-8')
+        fcntl.flock(self._fichero, fcntl.LOCK_EX)
+        self.ruta = self.directorio / f"{nombre}.jsonl"
+        os.rename(temporal, self.ruta)
+        descriptor = os.open(self.directorio, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def _anexar(self, lineas):
+        self._fichero.write(''.join(json.dumps(linea) + '\n' for linea in lineas))
+        self._fichero.flush()
+        os.fsync(self._fichero.fileno())
+
+    def escribir(self, registros):
+        with self._lock:
+            self._anexar(registros)
+            self._en_vuelo += 1
+
+    def encolar(self, registros):
+        with self._lock:
+            self._en_vuelo -= 1
+            self._pendientes.extend(registros)
+
+    def anular(self, registros):
+        with self._lock:
+            self._anexar([{'anular': [r['uuid'] for r in registros]}])
+            self._en_vuelo -= 1
+
+    def pendientes(self):
+        with self._lock:
+            return len(self._pendientes) + self._en_vuelo
+
+    def volcar(self):
+        """Inserta lo pendiente. Si falla, queda para el siguiente intento."""
+        with self._lock:
+            registros = self._pendientes
+            self._pendientes = []
+        if registros:
+            try:
+                insertar_lote(registros, self.lote)
+            except Exception:
+                with self._lock:
+                    self._pendientes[:0] = registros
+                raise
+
+        with self._lock:
+            # Todo lo del fichero ya está en la base de datos: se empieza otro
+            if not self._pendientes and not self._en_vuelo and self._fichero.tell() > self.rotar_bytes:
+                viejo, ruta = self._fichero, self.ruta
+                self._abrir()
+                ruta.unlink()
+                viejo.close()
+
+    def _bucle(self):
+        fijar_primaria()  # hilo propio, fuera de ReplicaMiddleware
+        try:
+            recuperar_diarios(self.directorio, self.lote, excluir=self.ruta)
+        except Exception as e:
+            logger.error(f"Error al recuperar diarios de ventas: {str(e)}")
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.volcar()
+            except Exception as e:
+                logger.error(f"Error al volcar el diario de ventas: {str(e)}")
+                connection.close()
+            finally:
+                close_old_connections()
+
+    def cerrar(self):
+        self._parar.set()
+        self._hilo.join(timeout=5)
+        try:
+            self.volcar()
+        except Exception as e:
+            # Queda en el fichero: se recupera en el próximo arranque
+            logger.error(f"Diario de ventas sin volcar al salir: {str(e)}")
+            return
+        with self._lock:
+            if not self._pendientes and not self._en_vuelo:
+                self.ruta.unlink(missing_ok=True)
+
+
+_diario = None
+_diario_lock = threading.Lock()
+
+
+def get_diario():
+    global _diario
+    if _diario is None:
+        with _diario_lock:
+            if _diario is None:
+                _diario = DiarioVentas(
+                    settings.VENTAS_DIARIO_DIR,
+                    intervalo=settings.VENTAS_DIARIO_FLUSH_MS / 1000,
+                    lote=settings.VENTAS_DIARIO_LOTE,
+                )
+    return _diario
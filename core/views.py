@@ -1,27 +1,46 @@
 # core/views.py
 from django.contrib.auth import authenticate, get_user_model
 from django.utils import timezone
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.authtoken.models import Token
-from .models import Almacen, ProductosVendidos
+from .models import (
+    Almacen, MovimientoStock, ProductoEliminado, ProductosVendidos, SugerenciaReposicion, Tienda,
+)
+from .stock import ajustar
+from .routers import fijar_primaria
+from .sync import version_confirmada
+from .tiendas import (
+    TiendaNoValida, es_admin_global, filtrar_por_tienda, tienda_de, tienda_para_escribir,
+    validar_tienda,
+)
+from .eventos import formato_sse, get_broker, publicar_cambios_producto
+from .reportes import ranking, rango_periodo, version_ventas
+from .ventas import VentaRechazada, registrar_venta, sincronizar_cestas
+from .reservas import cancelar, reservar
+from .throttles import SCOPES, LoginIPThrottle, LoginUsuarioThrottle, metricas_rechazos
+from .condicional import etiqueta, responder, validador
+from .campos import (
+    CAMPOS_PRODUCTO, CAMPOS_USUARIO, CAMPOS_VENTA, CamposInvalidos, campos_solicitados, filas,
+)
+from collections import Counter
 from datetime import date
 
-from django.core.mail import send_mail
-from django.contrib.auth.tokens import PasswordResetTokenGenerator
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.utils.encoding import force_bytes, force_str
-from django.urls import reverse
-from django.conf import settings
+# La recuperación de contraseña vive en core/recuperacion.py
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.http import JsonResponse, StreamingHttpResponse
 import logging
 
-from django.contrib.auth.tokens import default_token_generator
-
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+# Movimientos que se pueden registrar a mano (las ventas van por crear_venta)
+TIPOS_AJUSTE = ('ajuste', 'importacion', 'devolucion')
+
 # ========== PERMISOS ==========
 class IsAdmin:
     def has_permission(self, request, view):
@@ -35,11 +54,18 @@ class IsUsuarioOrAlmaceneroOrAdmin:
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.rol in ['usuario', 'almacenero', 'admin']
 
+class IsAdminGlobal:
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and es_admin_global(request.user)
+
 
 # ========== AUTH ==========
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([LoginIPThrottle, LoginUsuarioThrottle])  # ✅ Se rechaza antes de authenticate()
 def login_view(request):
+    if not isinstance(request.data, dict):
+        return Response({'error': 'Usuario y contraseña requeridos'}, status=status.HTTP_400_BAD_REQUEST)
     username = request.data.get('username')
     password = request.data.get('password')
 
@@ -58,7 +84,8 @@ def login_view(request):
         'token': token.key,
         'username': user.username,
         'rol': user.rol,
-        'user_id': user.id
+        'user_id': user.id,
+        'tienda': user.tienda_id
     })
 
 
@@ -72,6 +99,20 @@ def register_user(request):
     if not username or not email or not password:
         return Response({'error': 'Faltan campos requeridos: username, email, password'}, status=status.HTTP_400_BAD_REQUEST)
 
+    # ✅ Tienda opcional solo con una tienda activa (se asigna automáticamente).
+    # Con varias es obligatoria: no se crean usuarios sin tienda
+    tienda_id = request.data.get('tienda')
+    try:
+        if tienda_id in (None, ''):
+            activas = list(Tienda.objects.filter(activa=True).values_list('id', flat=True)[:2])
+            if len(activas) > 1:
+                raise TiendaNoValida('Indique la tienda (campo "tienda")')
+            tienda_id = activas[0] if activas else None
+        else:
+            tienda_id = validar_tienda(tienda_id)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
+
     if User.objects.filter(username=username).exists():
         return Response({'error': 'Nombre de usuario ya existe'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -83,7 +124,8 @@ def register_user(request):
             username=username,
             email=email,
             password=password,
-            rol='usuario'
+            rol='usuario',
+            tienda_id=tienda_id
         )
         user.is_active = True
         user.save()
@@ -93,7 +135,8 @@ def register_user(request):
             'token': token.key,
             'username': user.username,
             'rol': user.rol,
-            'user_id': user.id
+            'user_id': user.id,
+            'tienda': user.tienda_id
         }, status=status.HTTP_201_CREATED)
 
     except Exception as e:
@@ -116,6 +159,16 @@ def register_staff(request):
     if rol not in ['admin', 'almacenero']:
         return Response({'error': 'Rol inválido. Solo se permiten: admin, almacenero'}, status=status.HTTP_400_BAD_REQUEST)
 
+    # ✅ Un admin de tienda solo crea personal de su tienda; el global elige (admin sin tienda = global)
+    try:
+        tienda_id = tienda_de(request, cuerpo=True)
+        if tienda_id is not None:
+            tienda_id = validar_tienda(tienda_id)
+        elif rol == 'almacenero':
+            raise TiendaNoValida('Un almacenero necesita tienda (campo "tienda")')
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
+
     if User.objects.filter(username=username).exists():
         return Response({'error': 'Nombre de usuario ya existe'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -127,7 +180,8 @@ def register_staff(request):
             username=username,
             email=email,
             password=password,
-            rol=rol
+            rol=rol,
+            tienda_id=tienda_id
         )
         user.is_active = True
         user.save()
@@ -137,7 +191,8 @@ def register_staff(request):
             'username': user.username,
             'email': user.email,
             'rol': user.rol,
-            'is_active': user.is_active
+            'is_active': user.is_active,
+            'tienda': user.tienda_id
         }, status=status.HTTP_201_CREATED)
 
     except Exception as e:
@@ -146,29 +201,122 @@ def register_staff(request):
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def metricas_throttle(request):
+    """Intentos rechazados por throttle (login y recuperación de contraseña)"""
+    return Response(metricas_rechazos(SCOPES))
+
+
+# ========== TIENDAS ==========
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def listar_tiendas(request):
+    tiendas = Tienda.objects.all()
+    if not es_admin_global(request.user):
+        tiendas = tiendas.filter(pk=request.user.tienda_id)
+    return Response(list(tiendas.values('id', 'nombre', 'direccion', 'activa')))
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminGlobal])
+def crear_tienda(request):
+    nombre = request.data.get('nombre')
+    if not nombre:
+        return Response({'error': 'Campo "nombre" requerido'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if Tienda.objects.filter(nombre=nombre).exists():
+        return Response({'error': 'Ya existe una tienda con ese nombre'}, status=status.HTTP_400_BAD_REQUEST)
+
+    tienda = Tienda.objects.create(nombre=nombre, direccion=request.data.get('direccion', ''))
+    return Response({
+        'id': tienda.id,
+        'nombre': tienda.nombre,
+        'direccion': tienda.direccion,
+        'activa': tienda.activa
+    }, status=status.HTTP_201_CREATED)
+
+
 # ========== ALMACÉN ==========
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def listar_productos(request):
-    productos = Almacen.objects.all()
-    data = []
-    for p in productos:
-        item = {
-            'id': p.id,
-            'nombreproducto': p.nombreproducto,
-            'tipoproducto': p.tipoproducto,
-            'categoria': p.categoria,
-            'fechavencimiento': p.fechavencimiento.isoformat() if p.fechavencimiento else None,
-            'precio': float(p.precio) if p.precio else 0.0,
-            'stock': p.stock
-        }
-        # ✅ Imagen segura
-        if p.imagen:
-            item['imagen'] = p.imagen.url
-        else:
-            item['imagen'] = None
-        data.append(item)
-    return Response(data)
+    try:
+        campos = campos_solicitados(request, CAMPOS_PRODUCTO)
+        productos = filtrar_por_tienda(Almacen.objects.con_stock(), request)
+    except CamposInvalidos as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
+
+    # ✅ 304 si nada cambió: versión máxima (movimientos de stock incluidos) + nº de productos
+    etag, modificado = validador(request, productos, 'version_actual', 'fecha_actual')
+    bajas = filtrar_por_tienda(ProductoEliminado.objects, request).aggregate(f=Max('fechaeliminacion'))['f']
+    if bajas and (modificado is None or bajas.timestamp() > modificado):
+        modificado = int(bajas.timestamp())
+
+    # ✅ Solo se leen las columnas de los campos pedidos (?fields=id,nombreproducto,precio,stock)
+    return responder(request, etag, modificado, lambda: Response(filas(productos, campos, CAMPOS_PRODUCTO)))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sincronizar_productos(request):
+    """Cambios del catálogo desde ?since=<version> (altas/modificaciones y bajas)"""
+    try:
+        since = int(request.GET.get('since', 0))
+        limite = min(int(request.GET.get('limit', 1000)), 5000)
+        campos = campos_solicitados(request, CAMPOS_PRODUCTO)
+        tienda_id = tienda_de(request)
+    except CamposInvalidos as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    except ValueError:
+        return Response({'error': 'since y limit deben ser enteros'}, status=status.HTTP_400_BAD_REQUEST)
+    if limite < 1:
+        return Response({'error': 'limit debe ser mayor que 0'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if 'version' not in campos:
+        campos.append('version')
+
+    # ✅ Tope por debajo de la escritura en vuelo más antigua: una versión menor
+    # que se confirme tarde no queda por detrás del since del cliente (core/sync.py).
+    # El tope y las lecturas salen de la primaria: la réplica puede ir atrasada
+    fijar_primaria()
+    hasta = version_confirmada()
+    if hasta is None or hasta <= since:
+        return Response({'version': since, 'mas': False, 'productos': [], 'eliminados': []})
+    # El producto o alguno de sus movimientos de stock pendientes cambió después de since
+    tocados = Q(version__gt=since) | Q(id__in=MovimientoStock.objects.filter(
+        aplicado=False, version__gt=since,
+    ).values('producto_id'))
+    cambios = (
+        Almacen.objects.filter(tocados).con_stock()
+        .filter(version_actual__gt=since, version_actual__lte=hasta).order_by('version_actual')
+    )
+    lapidas = ProductoEliminado.objects.all()
+    if tienda_id is not None:
+        cambios = cambios.filter(tienda_id=tienda_id)
+        lapidas = lapidas.filter(tienda_id=tienda_id)
+    productos = filas(cambios[:limite], campos, CAMPOS_PRODUCTO)
+
+    mas = len(productos) == limite
+    if mas:
+        hasta = productos[-1]['version']
+
+    eliminados = list(
+        lapidas
+        .filter(version__gt=since, version__lte=hasta)
+        .values_list('producto_id', flat=True)
+    )
+
+    return Response({
+        'version': max(hasta, since),
+        'mas': mas,  # True: volver a llamar con since=version
+        'productos': productos,
+        'eliminados': eliminados,
+    })
 
 
 @api_view(['POST'])
@@ -184,6 +332,10 @@ def crear_producto(request):
 
         if not all([nombreproducto, tipoproducto, categoria, fechavencimiento_str, stock]):
             return Response({'error': 'Faltan campos requeridos'}, status=status.HTTP_400_BAD_REQUEST)
+        if int(stock) < 0:
+            return Response({'error': 'El stock no puede ser negativo'}, status=status.HTTP_400_BAD_REQUEST)
+
+        tienda_id = tienda_para_escribir(request)
 
         # ✅ Convertir string a objeto date
         try:
@@ -191,8 +343,9 @@ def crear_producto(request):
         except (TypeError, ValueError):
             return Response({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # ✅ Crear producto
+        # ✅ Crear producto (el stock inicial entra en el libro: core/signals.py)
         producto = Almacen.objects.create(
+            tienda_id=tienda_id,
             nombreproducto=nombreproducto,
             tipoproducto=tipoproducto,
             categoria=categoria,
@@ -204,7 +357,7 @@ def crear_producto(request):
         # ✅ Guardar imagen si existe
         if imagen:
             producto.imagen = imagen
-            producto.save()
+            producto.save(update_fields=['imagen'])
 
         # ✅ Respuesta segura
         return Response({
@@ -215,9 +368,12 @@ def crear_producto(request):
             'fechavencimiento': producto.fechavencimiento.isoformat(),
             'imagen': producto.imagen.url if producto.imagen else None,
             'precio': float(producto.precio),
-            'stock': producto.stock
+            'stock': producto.stock,
+            'tienda': producto.tienda_id
         }, status=status.HTTP_201_CREATED)
 
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
     except Exception as e:
         print("❌ Error en crear_producto:", str(e))
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -227,7 +383,7 @@ def crear_producto(request):
 @permission_classes([IsAlmaceneroOrAdmin])
 def actualizar_producto(request, pk):
     try:
-        producto = Almacen.objects.get(pk=pk)
+        producto = filtrar_por_tienda(Almacen.objects.con_stock(), request).get(pk=pk)
         
         # ✅ Solo actualizar campos permitidos
         nombreproducto = request.POST.get('nombreproducto')
@@ -243,8 +399,6 @@ def actualizar_producto(request, pk):
             producto.tipoproducto = tipoproducto
         if categoria:
             producto.categoria = categoria
-        if stock:
-            producto.stock = int(stock)
         
         # ✅ Manejar fecha correctamente
         if fechavencimiento_str:
@@ -257,7 +411,14 @@ def actualizar_producto(request, pk):
         if imagen:
             producto.imagen = imagen
 
-        producto.save()
+        with transaction.atomic():
+            producto.save()
+            # ✅ El stock no se sobrescribe: se registra la diferencia como ajuste
+            if stock:
+                ajustar(producto, stock=int(stock), usuario=request.user)
+            else:
+                producto.stock = producto.stock_actual
+        publicar_cambios_producto([producto])
 
         return Response({
             'id': producto.id,
@@ -272,6 +433,8 @@ def actualizar_producto(request, pk):
 
     except Almacen.DoesNotExist:
         return Response({'error': 'Producto no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
     except Exception as e:
         print("❌ Error en actualizar_producto:", str(e))
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -280,13 +443,29 @@ def actualizar_producto(request, pk):
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
 def actualizar_stock(request, pk):
+    """Recuento {"stock": n} o movimiento {"cantidad": ±n, "tipo": ajuste|importacion|devolucion}"""
     try:
-        producto = Almacen.objects.get(pk=pk)
+        producto = filtrar_por_tienda(Almacen.objects, request).get(pk=pk)
         stock = request.data.get('stock')
-        if stock is None:
-            return Response({'error': 'Campo "stock" requerido'}, status=status.HTTP_400_BAD_REQUEST)
-        producto.stock = int(stock)
-        producto.save()
+        cantidad = request.data.get('cantidad')
+        tipo = request.data.get('tipo', 'ajuste')
+        if stock is None and cantidad is None:
+            return Response({'error': 'Campo "stock" o "cantidad" requerido'}, status=status.HTTP_400_BAD_REQUEST)
+        if tipo not in TIPOS_AJUSTE:
+            return Response(
+                {'error': f"tipo inválido. Use: {', '.join(TIPOS_AJUSTE)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if stock is not None and int(stock) < 0:
+            return Response({'error': 'El stock no puede ser negativo'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # ✅ Se inserta un movimiento; la fila del producto no se reescribe
+        ajustar(
+            producto,
+            stock=int(stock) if stock is not None else None,
+            cantidad=int(cantidad) if stock is None else None,
+            tipo=tipo, usuario=request.user,
+        )
+        publicar_cambios_producto([producto])
         return Response({
             'id': producto.id,
             'nombreproducto': producto.nombreproducto,
@@ -294,6 +473,8 @@ def actualizar_stock(request, pk):
         })
     except Almacen.DoesNotExist:
         return Response({'error': 'Producto no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
     except Exception as e:
         print("❌ Error en actualizar_stock:", str(e))
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -303,12 +484,14 @@ def actualizar_stock(request, pk):
 @permission_classes([IsAdmin])
 def actualizar_precio(request, pk):
     try:
-        producto = Almacen.objects.get(pk=pk)
+        producto = filtrar_por_tienda(Almacen.objects.con_stock(), request).get(pk=pk)
         precio = request.data.get('precio')
         if precio is None:
             return Response({'error': 'Campo "precio" requerido'}, status=status.HTTP_400_BAD_REQUEST)
         producto.precio = float(precio)
-        producto.save()
+        producto.save(update_fields=['precio'])
+        producto.stock = producto.stock_actual
+        publicar_cambios_producto([producto])
         return Response({
             'id': producto.id,
             'nombreproducto': producto.nombreproducto,
@@ -316,6 +499,8 @@ def actualizar_precio(request, pk):
         })
     except Almacen.DoesNotExist:
         return Response({'error': 'Producto no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
     except Exception as e:
         print("❌ Error en actualizar_precio:", str(e))
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -326,52 +511,18 @@ def actualizar_precio(request, pk):
 @permission_classes([IsUsuarioOrAlmaceneroOrAdmin])
 def crear_venta(request):
     try:
-        data = request.data
-        ventas = data.get('ventas', [])
-        
-        if not ventas:
-            return Response({'error': 'No se enviaron productos'}, status=status.HTTP_400_BAD_REQUEST)
-
-        total_venta = 0
-        detalles = []
+        ventas = request.data.get('ventas', [])
+        reserva = request.data.get('reserva')
 
-        for item in ventas:
-            producto_id = item.get('producto_id')
-            cantidad = item.get('cantidad', 1)
+        if not ventas and reserva is None:
+            return Response({'error': 'No se enviaron productos'}, status=status.HTTP_400_BAD_REQUEST)
 
-            try:
-                producto = Almacen.objects.get(id=producto_id)
-            except Almacen.DoesNotExist:
-                return Response({'error': f'Producto no encontrado: {producto_id}'}, status=status.HTTP_404_NOT_FOUND)
-
-            if producto.stock < cantidad:
-                return Response({
-                    'error': f'Stock insuficiente para {producto.nombreproducto}',
-                    'disponible': producto.stock,
-                    'solicitado': cantidad
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            subtotal = float(producto.precio) * cantidad
-            total_venta += subtotal
-
-            # Crear registro
-            venta = ProductosVendidos.objects.create(
-                nombreproducto=producto.nombreproducto,
-                tipoproducto=producto.tipoproducto,
-                categoria=producto.categoria,
-                precio_unitario=float(producto.precio),
-                cantidad=cantidad
-            )
-            detalles.append({
-                'id': venta.id,
-                'producto': producto.nombreproducto,
-                'cantidad': cantidad,
-                'subtotal': subtotal
-            })
-
-            # Actualizar stock
-            producto.stock -= cantidad
-            producto.save()
+        # ✅ Solo productos de la tienda del vendedor. Stock descontado con movimientos
+        # (core/stock.py) o ya apartado por la reserva; las líneas se insertan ya
+        # o por el diario (VENTAS_INGESTA)
+        total_venta, detalles = registrar_venta(
+            filtrar_por_tienda(Almacen.objects, request), ventas, usuario=request.user, reserva=reserva,
+        )
 
         return Response({
             'mensaje': 'Venta registrada exitosamente',
@@ -379,64 +530,308 @@ def crear_venta(request):
             'detalles': detalles
         }, status=status.HTTP_201_CREATED)
 
+    except VentaRechazada as e:
+        return Response({'error': str(e), **e.extra}, status=e.status_code)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
     except Exception as e:
         print("❌ Error en crear_venta:", str(e))
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsUsuarioOrAlmaceneroOrAdmin])
+def crear_reserva(request):
+    """Aparta stock para un carrito: {"ventas": [...], "ttl": segundos}
+
+    Se confirma con POST /api/ventas/ {"reserva": id} antes de que expire.
+    """
+    ventas = request.data.get('ventas')
+    if not isinstance(ventas, list) or not ventas:
+        return Response({'error': 'No se enviaron productos'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        reserva = reservar(
+            filtrar_por_tienda(Almacen.objects, request), ventas, request.user, request.data.get('ttl'),
+        )
+    except VentaRechazada as e:
+        return Response({'error': str(e), **e.extra}, status=e.status_code)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
+
+    return Response({
+        'id': reserva.id,
+        'expira': reserva.expira.isoformat(),
+        'lineas': [{'producto_id': l.producto_id, 'cantidad': l.cantidad} for l in reserva.lineas_apartadas],
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['DELETE'])
+@permission_classes([IsUsuarioOrAlmaceneroOrAdmin])
+def cancelar_reserva(request, pk):
+    """Libera ya el stock de una reserva activa propia"""
+    try:
+        cancelar(pk, request.user)
+    except VentaRechazada as e:
+        return Response({'error': str(e), **e.extra}, status=e.status_code)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+@permission_classes([IsUsuarioOrAlmaceneroOrAdmin])
+def sincronizar_ventas(request):
+    """Cestas vendidas sin conexión: {"cestas": [{"id", "fecha", "ventas": [...]}]}
+
+    Reenviar es seguro: las cestas ya aplicadas vuelven como "duplicada".
+    """
+    cestas = request.data.get('cestas')
+    if not isinstance(cestas, list) or not cestas:
+        return Response({'error': 'cestas debe ser una lista no vacía'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(cestas) > 5000:
+        return Response({'error': 'Máximo 5000 cestas por petición'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        tienda_id = tienda_para_escribir(request)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
+
+    resultados = sincronizar_cestas(tienda_id, cestas)
+    resumen = Counter(r['estado'] for r in resultados)
+    return Response({
+        'aplicadas': resumen['ok'],
+        'duplicadas': resumen['duplicada'],
+        'conflictos': resumen['conflicto'],
+        'invalidas': resumen['invalida'],
+        'errores': resumen['error'],
+        'resultados': resultados,
+    })
+
+
 @api_view(['GET'])
 @permission_classes([IsAdmin])
 def listar_ventas_detalle(request):
     """Listar ventas con detalle de productos para reportes"""
-    fecha = request.GET.get('fecha')
-    
-    # ✅ Consulta SIMPLE (tu modelo no tiene relaciones ForeignKey)
-    ventas = ProductosVendidos.objects.order_by('-fechaventa')
-    
+    try:
+        campos = campos_solicitados(request, CAMPOS_VENTA)
+        fecha = date.fromisoformat(request.GET['fecha']) if request.GET.get('fecha') else None
+        tienda_id = tienda_de(request)
+        # ✅ Filtrado por tienda: usa los índices (tienda, fechaventa)
+        ventas = filtrar_por_tienda(ProductosVendidos.objects.order_by('-fechaventa'), request)
+    except CamposInvalidos as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    except ValueError:
+        return Response({'error': 'fecha debe tener el formato YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
     if fecha:
-        ventas = ventas.filter(fechaventa__date=fecha)
-    
-    data = []
-    for v in ventas:
-        # ✅ Cálculo del precio total (no existe como campo en tu modelo)
-        precio_total = float(v.precio_unitario) * v.cantidad
-        
-        data.append({
-            'id': v.id,
-            'producto': v.id,  # Usamos el ID como identificador
-            'producto_nombre': v.nombreproducto,
-            'categoria': v.categoria,
-            'tipoproducto': v.tipoproducto,
-            'cantidad': v.cantidad,
-            'precio_unitario': float(v.precio_unitario),
-            'precio_total': precio_total,  # Calculado dinámicamente
-            'fecha': v.fechaventa.isoformat(),
-            'usuario': 'Sistema'  # Valor por defecto (tu modelo no tiene usuario)
-        })
-    
+        # fechaventa es DateField: se compara directamente (no admite __date)
+        ventas = ventas.filter(fechaventa=fecha)
+
+    # ✅ Versión de las ventas de la tienda (core/reportes.py): con caché compartida,
+    # la generación que incrementa cada alta, cambio o baja (sin consultar la tabla);
+    # con LocMem, última id y número de filas leídos de la base de datos.
+    # Sin Last-Modified: fechaventa es solo la fecha, no el momento del cambio
+    etag = etiqueta(request, version_ventas(tienda_id))
+
+    # ✅ precio_total se calcula al armar la fila (no existe como campo en tu modelo)
+    return responder(request, etag, None, lambda: Response(filas(ventas, campos, CAMPOS_VENTA)))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def ranking_productos(request):
+    """Top-N por ingresos y clase ABC, por categoría (?global=1 para un único ranking)
+
+    Parámetros: ?periodo=YYYY-MM o ?desde=&hasta=, ?categoria=, ?n= (máx. 1000), ?abc=A|B|C
+    """
+    try:
+        tienda_id = tienda_de(request)
+        desde, hasta = rango_periodo(request.GET)
+        n = max(1, min(int(request.GET.get('n', 50)), 1000))
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    except (ValueError, OverflowError):
+        return Response({'error': 'Parámetros inválidos. Use periodo=YYYY-MM o desde/hasta=YYYY-MM-DD y n entero'}, status=status.HTTP_400_BAD_REQUEST)
+
+    data = ranking(
+        tienda_id, desde, hasta,
+        categoria=request.GET.get('categoria'),
+        por_categoria=not request.GET.get('global'),
+        n=n,
+    )
+    abc = request.GET.get('abc')
+    if abc:
+        data = [fila for fila in data if fila['clase'] == abc.upper()]
     return Response(data)
 
 
+# ========== REPOSICIÓN ==========
+@api_view(['GET'])
+@permission_classes([IsAlmaceneroOrAdmin])
+def listar_reposicion(request):
+    """Sugerencias del último pronóstico, las de menor cobertura primero"""
+    try:
+        limite = min(int(request.GET.get('limit', 200)), 5000)
+        sugerencias = filtrar_por_tienda(SugerenciaReposicion.objects.all(), request)
+    except ValueError:
+        return Response({'error': 'limit debe ser entero'}, status=status.HTTP_400_BAD_REQUEST)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
+
+    if request.GET.get('solo_pedir'):
+        sugerencias = sugerencias.filter(cantidad_sugerida__gt=0)
+
+    sugerencias = sugerencias.order_by(F('dias_cobertura').asc(nulls_last=True))[:limite]
+    data = [{
+        'producto': s['producto_id'],
+        'nombreproducto': s['producto__nombreproducto'],
+        'tienda': s['tienda_id'],
+        'stock': s['stock'],
+        'demanda_diaria': round(s['demanda_diaria'], 3),
+        'dias_cobertura': round(s['dias_cobertura'], 1) if s['dias_cobertura'] is not None else None,
+        'cantidad_sugerida': s['cantidad_sugerida'],
+        'fecha': s['fechacalculo'].isoformat()
+    } for s in sugerencias.values(
+        'producto_id', 'producto__nombreproducto', 'tienda_id', 'stock', 'demanda_diaria',
+        'dias_cobertura', 'cantidad_sugerida', 'fechacalculo'
+    )]
+    return Response(data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def calcular_reposicion(request):
+    """Recalcula el pronóstico de la tienda del admin (o de todas si es global) si ha cambiado algo"""
+    # NumPy solo se importa aquí: el resto de la API no lo necesita
+    from .pronostico import actualizar_sugerencias
+
+    try:
+        total, recalculado = actualizar_sugerencias(tienda_id=tienda_de(request))
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    # ✅ Sin ventas ni movimientos de stock nuevos no se repite el cálculo
+    return Response({'mensaje': 'Pronóstico actualizado', 'productos': total, 'recalculado': recalculado})
+
+
 # ========== USUARIOS ==========
 @api_view(['GET'])
 @permission_classes([IsAdmin])
 def listar_usuarios(request):
-    usuarios = User.objects.all()
-    data = [{
-        'id': u.id,
-        'username': u.username,
-        'email': u.email,
-        'rol': u.rol,
-        'is_active': u.is_active
-    } for u in usuarios]
-    return Response(data)
+    """Usuarios con ?q= (username/email), ?rol= y ?is_active=.
+
+    Con ?after=<id> o ?limit= se pagina por id (limit por defecto 100) y la
+    siguiente página va en la cabecera Link. Sin ellos se devuelve la lista
+    completa, como antes de paginar (clientes antiguos).
+    """
+    paginar = 'after' in request.GET or 'limit' in request.GET
+    try:
+        campos = campos_solicitados(request, CAMPOS_USUARIO)
+        usuarios = filtrar_por_tienda(User.objects.all(), request)
+        after = int(request.GET.get('after', 0))
+        limite = min(int(request.GET.get('limit', 100)), 1000)
+    except CamposInvalidos as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    except ValueError:
+        return Response({'error': 'after y limit deben ser enteros'}, status=status.HTTP_400_BAD_REQUEST)
+    if limite < 1:
+        return Response({'error': 'limit debe ser mayor que 0'}, status=status.HTTP_400_BAD_REQUEST)
+
+    q = request.GET.get('q', '').strip()
+    if q:
+        usuarios = usuarios.filter(Q(username__icontains=q) | Q(email__icontains=q))
+    if request.GET.get('rol'):
+        usuarios = usuarios.filter(rol=request.GET['rol'])
+    if request.GET.get('is_active') not in (None, ''):
+        usuarios = usuarios.filter(is_active=request.GET['is_active'].lower() in ('1', 'true'))
+
+    # ✅ Keyset: WHERE id > after ORDER BY id LIMIT n+1 (sin OFFSET)
+    usuarios = usuarios.filter(id__gt=after).order_by('id')
+    etag, modificado = validador(request, usuarios, 'actualizado', 'actualizado')
+    if not paginar:
+        return responder(request, etag, modificado, lambda: Response(filas(usuarios, campos, CAMPOS_USUARIO)))
+    return responder(request, etag, modificado, lambda: _pagina_usuarios(request, usuarios, campos, limite))
+
+
+def _pagina_usuarios(request, usuarios, campos, limite):
+    con_id = 'id' in campos
+    data = filas(usuarios[:limite + 1], campos if con_id else campos + ['id'], CAMPOS_USUARIO)
+    mas = len(data) > limite
+    data = data[:limite]
+    ultimo = data[-1]['id'] if data else None
+    if not con_id:
+        for fila in data:
+            del fila['id']
+
+    response = Response(data)
+    if mas:
+        params = request.GET.copy()
+        params['after'] = ultimo
+        params['limit'] = limite
+        siguiente = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+        response['Link'] = f'<{siguiente}>; rel="next"'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def actualizar_usuarios_lote(request):
+    """Activa/desactiva o cambia el rol de varios usuarios en un solo UPDATE.
+
+    Body: {"ids": [...], "is_active": bool, "rol": "..."}. Los tokens de los
+    usuarios desactivados o con rol nuevo se revocan (tienen que volver a
+    iniciar sesión).
+    """
+    data = request.data
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids:
+        return Response({'error': 'ids debe ser una lista no vacía'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > 5000:
+        return Response({'error': 'Máximo 5000 usuarios por petición'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        ids = {int(i) for i in ids}
+    except (TypeError, ValueError):
+        return Response({'error': 'ids debe contener enteros'}, status=status.HTTP_400_BAD_REQUEST)
+
+    cambios = {}
+    if 'rol' in data:
+        if data['rol'] not in ['admin', 'almacenero', 'usuario']:
+            return Response({'error': 'Rol inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        cambios['rol'] = data['rol']
+    if 'is_active' in data:
+        if not isinstance(data['is_active'], bool):
+            return Response({'error': 'is_active debe ser booleano'}, status=status.HTTP_400_BAD_REQUEST)
+        cambios['is_active'] = data['is_active']
+    if not cambios:
+        return Response({'error': 'Indica rol y/o is_active'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Un admin no puede desactivarse ni quitarse el rol a sí mismo
+    ids.discard(request.user.id)
+
+    try:
+        usuarios = filtrar_por_tienda(User.objects.filter(id__in=ids), request)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
+
+    with transaction.atomic():
+        encontrados = set(usuarios.values_list('id', flat=True))
+        actualizados = User.objects.filter(id__in=encontrados).update(**cambios, actualizado=timezone.now())
+        revocados = 0
+        if cambios.get('is_active') is False or 'rol' in cambios:
+            revocados, _ = Token.objects.filter(user_id__in=encontrados).delete()
+
+    return Response({
+        'actualizados': actualizados,
+        'tokens_revocados': revocados,
+        'no_encontrados': sorted(ids - encontrados),
+    })
 
 
 @api_view(['PUT'])
 @permission_classes([IsAdmin])
 def actualizar_usuario(request, pk):
     try:
-        usuario = User.objects.get(pk=pk)
+        usuario = filtrar_por_tienda(User.objects, request).get(pk=pk)
         data = request.data
         
         if 'rol' in data:
@@ -447,115 +842,97 @@ def actualizar_usuario(request, pk):
         if 'is_active' in data:
             usuario.is_active = data['is_active']
 
+        if 'tienda' in data:
+            # Solo el admin global reasigna tiendas (vacío = admin global)
+            if not es_admin_global(request.user):
+                return Response({'error': 'Solo el administrador global puede cambiar la tienda'}, status=status.HTTP_403_FORBIDDEN)
+            usuario.tienda_id = validar_tienda(data['tienda']) if data['tienda'] not in (None, '') else None
+
         usuario.save()
         return Response({
             'id': usuario.id,
             'username': usuario.username,
             'email': usuario.email,
             'rol': usuario.rol,
-            'is_active': usuario.is_active
+            'is_active': usuario.is_active,
+            'tienda': usuario.tienda_id
         })
     except User.DoesNotExist:
         return Response({'error': 'Usuario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    except TiendaNoValida as e:
+        return Response({'error': str(e)}, status=e.status_code)
     except Exception as e:
         print("❌ Error en actualizar_usuario:", str(e))
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-    
-# ✅ Generador de tokens personalizado
-class PasswordResetTokenGenerator(PasswordResetTokenGenerator):
-    def _make_hash_value(self, user, timestamp):
-        return str(user.pk) + str(timestamp) + str(user.is_active)
 
-password_reset_token = PasswordResetTokenGenerator()
 
-# ✅ Solicitar recuperación de contraseña
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def password_reset_request(request):
-    email = request.data.get('email')
-    
-    if not email:
-        return Response({'error': 'Email es requerido'}, status=400)
-    
-    try:
-        user = User.objects.get(email=email)
-        
-        # ✅ Generar token único
-        token = password_reset_token.make_token(user)
-        uid = urlsafe_base64_encode(force_bytes(user.pk))
-        
-        # ✅ Construir URL de restablecimiento
-        
-        reset_url = f'http://127.0.0.1:5500/reset-password.html?uidb64={uid}&token={token}'
-
-        # ✅ Enviar email
-        subject = 'Recuperación de contraseña - MultiTiendas'
-        message = f'''
-        Hola {user.username},
-
-        Has solicitado recuperar tu contraseña en MultiTiendas.
-
-        Haz clic en el siguiente enlace para crear una nueva contraseña:
-        {reset_url}
+# ========== PERFILADO ==========
+@api_view(['GET'])
+@permission_classes([IsAdminGlobal])
+def listar_perfiles(request):
+    """Perfiles guardados (más recientes primero). Ver core/perfilado.py"""
+    from .perfilado import listar
+    return Response(listar())
 
-        Este enlace expirará en 1 hora.
 
-        Si no solicitaste este cambio, ignora este email.
+@api_view(['GET'])
+@permission_classes([IsAdminGlobal])
+def detalle_perfil(request, perfil_id):
+    from .perfilado import obtener
+    perfil = obtener(perfil_id)
+    if perfil is None:
+        return Response({'error': 'Perfil no encontrado o expirado'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(perfil)
+
+
+# ========== EVENTOS (SSE) ==========
+async def stream_eventos(request):
+    """Stream de cambios de stock/precio (text/event-stream). Requiere ASGI.
+
+    EventSource no permite cabeceras, así que el token también se acepta
+    como ?token=.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'El stream de eventos requiere servidor ASGI'}, status=501)
+
+    key = request.GET.get('token')
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Token '):
+        key = auth[len('Token '):].strip()
 
-        Gracias,
-        El equipo de MultiTiendas
-        '''
-        
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [email],
-            fail_silently=False,
-        )
-        
-        return Response({'message': 'Se ha enviado un enlace de recuperación a tu email'})
-    
-    except User.DoesNotExist:
-        # ✅ No revelar si el email existe (seguridad)
-        return Response({'message': 'Si el email está registrado, recibirás un enlace de recuperación'})
-    except Exception as e:
-        logger.error(f"Error al enviar email: {str(e)}")
-        return Response({'error': 'Error al procesar la solicitud'}, status=500)
+    try:
+        token = await Token.objects.select_related('user').aget(key=key or '')
+    except Token.DoesNotExist:
+        return JsonResponse({'error': 'No autenticado'}, status=401)
+    if not token.user.is_active:
+        return JsonResponse({'error': 'Usuario desactivado'}, status=403)
+
+    # ✅ Cada caja recibe solo los eventos de su tienda (admin global: todas o ?tienda=)
+    tienda_id = token.user.tienda_id
+    if tienda_id is None:
+        if token.user.rol != 'admin':
+            return JsonResponse({'error': 'Usuario sin tienda asignada'}, status=403)
+        try:
+            tienda_id = int(request.GET['tienda']) if request.GET.get('tienda') else None
+        except ValueError:
+            return JsonResponse({'error': 'Tienda inválida'}, status=400)
 
+    suscripcion = get_broker().suscribir()
 
-# ✅ Verificar token y restablecer contraseña
-@api_view(['GET', 'POST'])
-@permission_classes([AllowAny])
-def password_reset_confirm(request, uidb64, token):
-    try:
-        uid = force_str(urlsafe_base64_decode(uidb64))
-        user = User.objects.get(pk=uid)
-        
-        # Verificar token
-        if not default_token_generator.check_token(user, token):
-            return Response({'error': 'El enlace ha expirado o es inválido'}, status=400)
-        
-        # Si es GET: verificar y mostrar formulario
-        if request.method == 'GET':
-            return Response({
-                'message': 'Token válido. Puedes establecer una nueva contraseña.',
-                'uidb64': uidb64,
-                'token': token
-            })
-        
-        # Si es POST: actualizar contraseña
-        new_password = request.data.get('password')
-        if not new_password or len(new_password) < 6:
-            return Response({'error': 'La contraseña debe tener al menos 6 caracteres'}, status=400)
-        
-        user.set_password(new_password)
-        user.save()
-        
-        return Response({'message': 'Contraseña actualizada correctamente'})
-    
-    except (TypeError, ValueError, OverflowError, User.DoesNotExist):
-        return Response({'error': 'El enlace es inválido'}, status=400)
-    except Exception as e:
-        logger.error(f"Error al restablecer contraseña: {str(e)}")
-        return Response({'error': 'Error al procesar la solicitud'}, status=500)
\ No newline at end of file
+    async def flujo():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                evento = await suscripcion.recibir(timeout=15)
+                if evento is None:
+                    # Comentario SSE como keep-alive para proxies
+                    yield ': ping\n\n'
+                elif tienda_id is None or evento.get('tienda') == tienda_id:
+                    yield formato_sse(evento)
+        finally:
+            suscripcion.cerrar()
+
+    response = StreamingHttpResponse(flujo(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: no bufferizar
+    return response
@@ -3,6 +3,13 @@ ASGI config for ventas project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Servir con un servidor ASGI para habilitar el stream de eventos
+(/api/eventos/), p. ej.:
+
+    uvicorn ventas_backend.asgi:application --workers 4
+
+Con varios workers configurar EVENTOS_BROKER = 'core.eventos.BrokerRedis'.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -11,6 +18,6 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ventas.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ventas_backend.settings')
 
 application = get_asgi_application()
@@ -4,6 +4,7 @@ Minimal version: Token auth + CORS (no JWT, no CSRF, no sessions for API)
 """
 
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from decouple import config
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -32,6 +33,9 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # 👈 primero
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompresionMiddleware',  # gzip (> 200 bytes), excepto el stream SSE
+    'core.middleware.ReplicaMiddleware',  # antes de cualquier lectura de BD
+    'core.middleware.PerfiladoMiddleware',  # solo si PERFILADO_ACTIVO
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     # ⚠️ CSRF desactivado para APIs (no lo usaremos en /api/)
@@ -55,6 +59,26 @@ DATABASES = {
     }
 }
 
+# ---------- Réplica de lectura (core/routers.py) ----------
+# Definir DB_REPLICA_HOST para enviar las lecturas (GET) a la réplica.
+# En local se puede probar con una segunda base cualquiera en DB_REPLICA_NAME.
+DATABASE_REPLICA = 'replica' if config('DB_REPLICA_HOST', default='') else None
+if DATABASE_REPLICA:
+    DATABASES[DATABASE_REPLICA] = {
+        **DATABASES['default'],
+        'NAME': config('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'HOST': config('DB_REPLICA_HOST'),
+        'PORT': config('DB_REPLICA_PORT', default='5432'),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_MAX_RETRASO = config('REPLICA_MAX_RETRASO', default=5, cast=float)  # segundos
+REPLICA_CHEQUEO_SEGUNDOS = 5
+REPLICA_FIJAR_SEGUNDOS = 5  # read-your-writes tras una escritura
+
+# /api/almacen/sync/: espera máxima a que terminen las escrituras en vuelo (core/sync.py)
+SYNC_ESPERA_MAX = config('SYNC_ESPERA_MAX', default=2, cast=float)  # segundos
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -97,6 +121,31 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # ✅ Proxies de confianza delante de Django. Con 0 la IP es REMOTE_ADDR; sin
+    # fijarlo DRF usaría X-Forwarded-For tal cual y el límite por IP se esquivaría
+    # cambiando la cabecera en cada intento. Detrás de un nginx: NUM_PROXIES=1
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+    # Ventana deslizante (core/throttles.py): intentos por periodo
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': config('THROTTLE_LOGIN_IP', default='30/min'),
+        'login_usuario': config('THROTTLE_LOGIN_USUARIO', default='5/min'),
+        'password_reset_ip': config('THROTTLE_RESET_IP', default='10/hour'),
+        'password_reset_email': config('THROTTLE_RESET_EMAIL', default='3/hour'),
+    },
+}
+
+# ---------- Caché (throttles, reportes, ETag de ventas) ----------
+# En producción con varios procesos usar una caché compartida, p. ej.:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://127.0.0.1:6379/1
+# Con LocMem las versiones de ranking y ETag salen de la base de datos (una
+# consulta más por petición) porque el contador de cada proceso no ve las
+# ventas de los demás (core/reportes.py)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='ventas'),
+    }
 }
 
 # ---------- CORS ----------
@@ -106,6 +155,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:8080",
     "http://localhost:8080",
 ]
+CORS_EXPOSE_HEADERS = ['Link', 'ETag', 'Last-Modified', 'X-Perfil-Id']  # paginación, GET condicional, perfilado
+CORS_ALLOW_HEADERS = (*default_headers, 'x-perfilar')
 
 # 👇 IMPORTANTE: Define tu modelo personalizado como usuario por defecto
 AUTH_USER_MODEL = 'core.User'
@@ -121,4 +172,50 @@ EMAIL_HOST_PASSWORD = config('ACCESS_KEY')  # 👈 Contraseña de App (no la de
 DEFAULT_FROM_EMAIL = 'MultiTiendas <no-reply@multitiendas.com>'
 
 # ✅ Tokens expiran en 1 hora
-PASSWORD_RESET_TIMEOUT = 3600  # segundos
\ No newline at end of file
+PASSWORD_RESET_TIMEOUT = 3600  # segundos
+
+# ---------- Eventos en tiempo real (core/eventos.py) ----------
+# Un proceso: BrokerEnMemoria. Varios workers: core.eventos.BrokerRedis (pip install redis)
+EVENTOS_BROKER = config('EVENTOS_BROKER', default='core.eventos.BrokerEnMemoria')
+EVENTOS_BROKER_OPCIONES = (
+    {'url': config('EVENTOS_REDIS_URL')} if EVENTOS_BROKER.endswith('BrokerRedis') else {}
+)
+
+# ---------- Arranque en frío (manage.py perfil_arranque) ----------
+# Presupuesto de django.setup() + carga de URLs; el comando falla si se supera
+ARRANQUE_PRESUPUESTO_MS = config('ARRANQUE_PRESUPUESTO_MS', default=1500, cast=int)
+
+# ---------- Ingesta de ventas (core/ventas.py) ----------
+# 'sincrona': las líneas se insertan en la petición. 'diario': se escriben en
+# un diario local y un hilo las vuelca en lotes (ver manage.py benchmark_ventas)
+VENTAS_INGESTA = config('VENTAS_INGESTA', default='sincrona')
+VENTAS_DIARIO_DIR = config('VENTAS_DIARIO_DIR', default=str(BASE_DIR / 'diario_ventas'))
+VENTAS_DIARIO_FLUSH_MS = config('VENTAS_DIARIO_FLUSH_MS', default=250, cast=int)
+VENTAS_DIARIO_LOTE = config('VENTAS_DIARIO_LOTE', default=1000, cast=int)
+
+# ---------- Cupos de stock (core/stock.py) ----------
+# Partes en que se reparte el stock de cada producto: hasta tantas cajas
+# venden a la vez el mismo producto sin esperarse
+STOCK_PARTICIONES = config('STOCK_PARTICIONES', default=8, cast=int)
+
+# ---------- Reservas de carrito (core/reservas.py) ----------
+# manage.py expirar_reservas --bucle libera las caducadas
+RESERVAS_TTL_SEGUNDOS = config('RESERVAS_TTL_SEGUNDOS', default=600, cast=int)
+RESERVAS_TTL_MAX = 3600
+
+# ---------- Archivo columnar de ventas (core/analitica.py, core/archivo.py) ----------
+# manage.py archivar_ventas exporta aquí los meses cerrados (mensualmente, p. ej. por cron)
+ARCHIVO_VENTAS_DIR = config('ARCHIVO_VENTAS_DIR', default=str(BASE_DIR / 'archivo_ventas'))
+
+# ---------- Admin con tablas grandes (core/admin.py) ----------
+# Por encima de estas filas (estimadas por PostgreSQL) el admin no hace COUNT(*)
+ADMIN_CONTEO_EXACTO_HASTA = 10000
+ADMIN_FILTROS_SEGUNDOS = 3600  # caché de los valores de list_filter
+
+# ---------- Perfilado de peticiones (core/perfilado.py) ----------
+# Desactivado: el middleware no se carga. Activo: cabecera X-Perfilar de un
+# admin global, o una fracción de las peticiones (0.01 = 1 %)
+PERFILADO_ACTIVO = config('PERFILADO_ACTIVO', default=False, cast=bool)
+PERFILADO_MUESTREO = config('PERFILADO_MUESTREO', default=0.0, cast=float)
+PERFILADO_MAX = 100  # perfiles que se conservan
+PERFILADO_SEGUNDOS = 24 * 3600